@@ -0,0 +1,109 @@
+# api/db/archive.py
+"""
+Helpers for the `messages` table: a local archive of the Discord messages in
+channels registered with the bot (or every channel it can see, with
+MESSAGE_ARCHIVE_SCOPE=all), fed from the gateway by src/controller/archive.py.
+
+Rows are keyed by the message id (a Discord snowflake, so ordering by id is
+chronological) and indexed by (channel_id, message_id) for reading a channel's
+history page by page. Edits replace the row and deletes remove it, so the
+archive mirrors Discord rather than keeping what users took back.
+
+Writes go through a write-behind buffer (see api/db/write_behind.py): a burst
+of gateway events becomes one transaction per flush interval.
+"""
+
+import json
+import os
+from typing import Any, Dict, Sequence, Tuple
+
+# Set MESSAGE_ARCHIVE=0 to stop recording messages.
+ENABLED = os.getenv("MESSAGE_ARCHIVE", "1").lower() not in ("0", "false", "no")
+# "registered": only channels registered with the bot; "all": every channel and DM it can see.
+SCOPE = os.getenv("MESSAGE_ARCHIVE_SCOPE", "registered").lower()
+# Page size for history reads.
+DEFAULT_LIMIT = 100
+
+COLUMNS = (
+    "message_id", "channel_id", "guild_id", "author_id", "author_name",
+    "is_bot", "content", "attachments", "reply_to", "created_at", "edited_at",
+)
+
+_ID_COLUMNS = ("message_id", "channel_id", "guild_id", "author_id", "reply_to")
+
+
+def to_row(record: Dict[str, Any]) -> Tuple:
+    """A record (see src/controller/archive.py) as a tuple in COLUMNS order."""
+    attachments = record.get("attachments") or []
+    return (
+        int(record["message_id"]),
+        int(record["channel_id"]),
+        int(record["guild_id"]) if record.get("guild_id") else None,
+        int(record["author_id"]),
+        record["author_name"],
+        int(bool(record.get("is_bot"))),
+        record.get("content") or "",
+        json.dumps(attachments) if attachments else None,
+        int(record["reply_to"]) if record.get("reply_to") else None,
+        int(record["created_at"]),
+        int(record["edited_at"]) if record.get("edited_at") else None,
+    )
+
+
+def from_row(row: Sequence[Any]) -> Dict[str, Any]:
+    """The inverse of to_row, for a row selected as COLUMNS."""
+    record = dict(zip(COLUMNS, row))
+    for column in _ID_COLUMNS:
+        if record[column] is not None:
+            record[column] = str(record[column]) # Snowflakes overflow JSON numbers
+    record["is_bot"] = bool(record["is_bot"])
+    record["attachments"] = json.loads(record["attachments"]) if record["attachments"] else []
+    return record
+
+
+def create_tables(conn):
+    """
+    Creates the archive, its channel index and an external-content FTS5 index
+    over message text, kept in sync by triggers.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id INTEGER PRIMARY KEY, -- the snowflake doubles as the rowid
+            channel_id INTEGER NOT NULL,
+            guild_id INTEGER,
+            author_id INTEGER NOT NULL,
+            author_name TEXT NOT NULL,
+            is_bot INTEGER NOT NULL DEFAULT 0,
+            content TEXT NOT NULL,
+            attachments TEXT,               -- JSON array of URLs
+            reply_to INTEGER,
+            created_at INTEGER NOT NULL,
+            edited_at INTEGER
+        );
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id, message_id);")
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            author_name, content,
+            content='messages', content_rowid='message_id'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, author_name, content) VALUES (new.message_id, new.author_name, new.content);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, author_name, content)
+            VALUES ('delete', old.message_id, old.author_name, old.content);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF author_name, content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, author_name, content)
+            VALUES ('delete', old.message_id, old.author_name, old.content);
+            INSERT INTO messages_fts (rowid, author_name, content) VALUES (new.message_id, new.author_name, new.content);
+        END;
+    """)
+
@@ -0,0 +1,196 @@
+# api/db/async_database.py
+"""
+An awaitable facade over `Database` for code running on an event loop.
+
+Every call is executed on one dedicated database thread, so the Discord gateway
+loop and the FastAPI loop never block on sqlite3 I/O. The facade exposes the same
+methods as `Database` (`await adb.get_channel(...)`), bounds how many calls each
+event loop may have queued, and records queue-wait and run-time latency.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from api.db.storage import Storage
+from api.db.message_context import MessageContext
+from api.db.write_behind import MISSING
+
+# Maximum number of calls a single event loop may have queued or running at once.
+MAX_PENDING = int(os.getenv("DATABASE_ASYNC_MAX_PENDING", "64"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide database thread, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="viel-db")
+        return _executor
+
+
+class AsyncDatabaseStats:
+    """Latency and queue-depth counters for calls made through an AsyncDatabase."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.backpressure_waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def throttled(self):
+        with self._lock:
+            self.backpressure_waits += 1
+
+    def enqueued(self):
+        with self._lock:
+            self.pending += 1
+            self.max_pending_seen = max(self.max_pending_seen, self.pending)
+
+    def finished(self, wait: float, run: float, failed: bool):
+        with self._lock:
+            self.pending -= 1
+            self.calls += 1
+            self.errors += int(failed)
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run
+            self.max_run = max(self.max_run, run)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "pending": self.pending,
+                "max_pending": self.max_pending_seen,
+                "backpressure_waits": self.backpressure_waits,
+                "avg_wait_ms": round(self.total_wait / calls * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / calls * 1000, 3),
+                "max_run_ms": round(self.max_run * 1000, 3),
+            }
+
+
+class AsyncDatabase:
+    """
+    Wraps a Database so that `await adb.<method>(...)` runs `db.<method>(...)`
+    on the shared database thread. Use `AsyncDatabase.wrap(db)` to reuse one
+    facade per Database instance.
+    """
+
+    _wrappers: "weakref.WeakKeyDictionary[Storage, AsyncDatabase]" = weakref.WeakKeyDictionary()
+    _wrappers_lock = threading.Lock()
+
+    def __init__(self, db: Storage, max_pending: int = MAX_PENDING):
+        self.db = db
+        self.max_pending = max_pending
+        self.stats = AsyncDatabaseStats()
+        # asyncio primitives are bound to one loop, so each loop gets its own limit.
+        self._limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def wrap(cls, db: Storage) -> "AsyncDatabase":
+        """Returns the shared facade for `db`, creating it on first use."""
+        with cls._wrappers_lock:
+            adb = cls._wrappers.get(db)
+            if adb is None:
+                adb = cls(db)
+                cls._wrappers[db] = adb
+            return adb
+
+    def _limit(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        limit = self._limits.get(loop)
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_pending)
+            self._limits[loop] = limit
+        return limit
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs any synchronous callable on the database thread and awaits its result."""
+        loop = asyncio.get_running_loop()
+        limit = self._limit(loop)
+        if limit.locked():
+            self.stats.throttled()
+
+        async with limit:
+            submitted = time.monotonic()
+            self.stats.enqueued()
+            timings = {}
+
+            def call():
+                started = time.monotonic()
+                timings["wait"] = started - submitted
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    timings["run"] = time.monotonic() - started
+
+            failed = False
+            try:
+                return await loop.run_in_executor(_get_executor(), call)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self.stats.finished(timings.get("wait", 0.0), timings.get("run", 0.0), failed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns latency and queue counters for this facade."""
+        return self.stats.snapshot()
+
+    # --- Cached lookups ---
+    # Served straight from the entity cache when possible, skipping the hop to
+    # the database thread; only a cache miss is queued like any other call.
+
+    async def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        channel = self.db.peek_channel(channel_id)
+        if channel is MISSING:
+            channel = await self.run(self.db.get_channel, channel_id)
+        return channel
+
+    async def get_character(self, name: str) -> Optional[Dict[str, Any]]:
+        character = self.db.peek_character(name)
+        if character is MISSING:
+            character = await self.run(self.db.get_character, name)
+        return character
+
+    async def get_characters(self, names: List[str]) -> List[Dict[str, Any]]:
+        characters = self.db.peek_characters(names)
+        if characters is MISSING:
+            characters = await self.run(self.db.get_characters, names)
+        return characters
+
+    async def load_message_context(self, channel_id: str, author: Optional[str] = None) -> MessageContext:
+        context = self.db.peek_message_context(channel_id, author)
+        if context is MISSING:
+            context = await self.run(self.db.load_message_context, channel_id, author)
+        return context
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not defined on the facade itself:
+        # expose every public Database method as a coroutine function.
+        attr = getattr(self.db, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
@@ -0,0 +1,212 @@
+# api/db/backup.py
+"""
+Online backups of the bot's database, taken while the bot keeps running.
+
+A backup uses SQLite's online backup API on its own connection and thread:
+- pages are copied DATABASE_BACKUP_STEP_PAGES at a time with a short sleep
+  between steps, so the write lock is never needed and readers are never held up;
+- the source connection holds one read transaction for the whole copy, so the
+  backup is a consistent snapshot and is not restarted by concurrent writes;
+- the copy is written to a `.partial` file, checked with `PRAGMA quick_check`
+  (or a full integrity_check), and only then renamed into place;
+- only the newest DATABASE_BACKUP_KEEP backups are kept.
+
+`BackupScheduler` takes one every DATABASE_BACKUP_INTERVAL_HOURS; POST
+/api/admin/backup takes one on demand. A backup file is a complete, standalone
+database: restore it by stopping the bot and copying it over bot.db.
+
+Only the main file is backed up. The volatile file (VOLATILE_DATABASE_URL) holds
+captions and fetched link text that are regenerated on demand.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Where backups are written (default: a `backups` directory next to the database).
+BACKUP_DIR = os.getenv("DATABASE_BACKUP_DIR", "")
+# Number of backups kept; older ones are deleted after each successful backup.
+BACKUP_KEEP = int(os.getenv("DATABASE_BACKUP_KEEP", "7"))
+# Pages copied per step, and the pause between steps (seconds).
+BACKUP_STEP_PAGES = int(os.getenv("DATABASE_BACKUP_STEP_PAGES", "256"))
+BACKUP_STEP_PAUSE = float(os.getenv("DATABASE_BACKUP_STEP_PAUSE", "0.01"))
+# Hours between scheduled backups (0 disables the schedule).
+BACKUP_INTERVAL_HOURS = float(os.getenv("DATABASE_BACKUP_INTERVAL_HOURS", "24"))
+# "quick" (PRAGMA quick_check) or "full" (PRAGMA integrity_check).
+BACKUP_CHECK = os.getenv("DATABASE_BACKUP_CHECK", "quick")
+
+_PREFIX = "viel-"
+_SUFFIX = ".db"
+
+
+class BackupBusy(RuntimeError):
+    """Raised when a backup is requested while another one is in progress."""
+
+
+class BackupError(RuntimeError):
+    """Raised when a finished backup fails its integrity check."""
+
+
+_running = threading.Lock()
+
+
+def backup_dir(db) -> str:
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(db.db_path)), "backups")
+
+
+def list_backups(db) -> List[Dict[str, Any]]:
+    """Completed backups, newest first."""
+    directory = backup_dir(db)
+    if not os.path.isdir(directory):
+        return []
+    backups = []
+    for name in os.listdir(directory):
+        if not (name.startswith(_PREFIX) and name.endswith(_SUFFIX)):
+            continue
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        backups.append({
+            "name": name,
+            "path": path,
+            "bytes": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+        })
+    backups.sort(key=lambda b: b["name"], reverse=True)
+    return backups
+
+
+def _check(path: str) -> str:
+    pragma = "integrity_check" if BACKUP_CHECK == "full" else "quick_check"
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(f"PRAGMA {pragma}").fetchall()
+    finally:
+        conn.close()
+    return "; ".join(str(row[0]) for row in rows)
+
+
+def _rotate(db, keep: int) -> List[str]:
+    removed = []
+    for old in list_backups(db)[max(keep, 1):]:
+        try:
+            os.remove(old["path"])
+            removed.append(old["name"])
+        except OSError as e:
+            print(f"Could not remove old backup {old['name']}: {e}")
+    return removed
+
+
+def copy_database(source_path: str, dest_path: str, pages: int = BACKUP_STEP_PAGES, pause: float = BACKUP_STEP_PAUSE) -> int:
+    """
+    Copies the database at `source_path` to `dest_path` with the online backup API
+    and returns the number of pages copied.
+    """
+    source = sqlite3.connect(source_path, isolation_level=None)
+    dest = sqlite3.connect(dest_path, isolation_level=None)
+    copied = {"pages": 0}
+
+    def progress(status, remaining, total):
+        copied["pages"] = total - remaining
+
+    try:
+        # One read transaction for the whole copy: a consistent snapshot that
+        # writes from other connections can't invalidate half-way through.
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        source.backup(dest, pages=pages, progress=progress, sleep=pause)
+        source.execute("COMMIT")
+        # A backup is a single self-contained file
+        dest.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dest.close()
+        source.close()
+    return copied["pages"]
+
+
+def create_backup(db, keep: int = BACKUP_KEEP) -> Dict[str, Any]:
+    """
+    Takes a verified backup of `db` and rotates old ones. Returns a report.
+    Raises BackupBusy if a backup is already running, BackupError if the copy
+    fails its integrity check (the copy is then discarded).
+    """
+    if not _running.acquire(blocking=False):
+        raise BackupBusy("A database backup is already running")
+    try:
+        started = time.monotonic()
+        directory = backup_dir(db)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3] # Sorts by time; unique per millisecond
+        name = f"{_PREFIX}{stamp}{_SUFFIX}"
+        path = os.path.join(directory, name)
+        partial = path + ".partial"
+
+        # Enrichments still sitting in the write-behind buffer belong in the backup
+        db.flush()
+        try:
+            pages = copy_database(db.db_path, partial)
+            check = _check(partial)
+            if check != "ok":
+                raise BackupError(f"Backup failed its integrity check: {check}")
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+        report = {
+            "name": name,
+            "path": path,
+            "bytes": os.path.getsize(path),
+            "pages": pages,
+            "check": check,
+            "rotated": _rotate(db, keep),
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        print(f"Database backup {name} written in {report['seconds']}s ({report['bytes']} bytes)")
+        return report
+    finally:
+        _running.release()
+
+
+class BackupScheduler(threading.Thread):
+    """Daemon thread that takes a backup every `interval_hours` until stopped."""
+
+    def __init__(self, db, interval_hours: float = BACKUP_INTERVAL_HOURS):
+        super().__init__(name="viel-db-backup", daemon=True)
+        self._db = db
+        self._interval = interval_hours * 3600
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                create_backup(self._db)
+            except BackupBusy:
+                pass
+            except Exception as e:
+                print(f"Error during scheduled database backup: {e}\n{traceback.format_exc()}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+_scheduler: Optional[BackupScheduler] = None
+
+
+def start_scheduler(db) -> Optional[BackupScheduler]:
+    """Starts (once) the periodic backup thread, unless DATABASE_BACKUP_INTERVAL_HOURS is 0."""
+    global _scheduler
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return None
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = BackupScheduler(db)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_scheduler():
+    if _scheduler is not None:
+        _scheduler.stop()
@@ -0,0 +1,422 @@
+# api/db/bulk.py
+"""
+Streaming bulk export and import of servers, channels, presets and characters.
+
+The interchange format is NDJSON: one JSON object per line, tagged with a "type":
+
+    {"type": "server", "server_id": "...", "server_name": "...", "description": ..., "instruction": ...}
+    {"type": "channel", "channel_id": "...", "server_id": "...", "server_name": "...", "data": {...}}
+    {"type": "preset", "name": "...", "description": "...", "prompt_template": "..."}
+    {"type": "character", "name": "...", "data": {...}, "triggers": [...]}
+
+Export reads each table in keyset-paginated pages, so it never holds more than
+one page in memory. Import buffers records into chunks and writes each chunk in
+one transaction with `executemany`, checking names against the database in bulk.
+
+Command line:
+    python -m api.db.bulk export [-o library.ndjson] [--types character,preset]
+    python -m api.db.bulk import library.ndjson [--on-conflict skip|replace|error]
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.db import events
+from api.db.database import Database, _CHARACTER_SELECT, _MAX_IN_PARAMS, get_database
+
+# Dependency order: channels reference servers.
+RECORD_TYPES = ("server", "channel", "preset", "character")
+CONFLICT_POLICIES = ("skip", "replace", "error")
+# The column each record type is deduped and matched on
+RECORD_KEYS = {"server": "server_id", "channel": "channel_id", "preset": "name", "character": "name"}
+
+EXPORT_PAGE_SIZE = 500
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+class BulkImportError(Exception):
+    """Raised for conflicts when importing with on_conflict="error"."""
+
+
+# ------------------------------------------------------
+# Export
+# ------------------------------------------------------
+
+def _pages(db: Database, sql: str, key: str, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields pages of rows ordered by `key`. Each page is its own query, so the
+    generator can be resumed from any thread (Starlette iterates sync generators
+    in a thread pool).
+    """
+    last = ""
+    while True:
+        with db._get_connection() as conn:
+            rows = [dict(row) for row in conn.execute(sql, (last, page_size)).fetchall()]
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key]
+
+
+def _export_server(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "server", **row}
+
+
+def _export_channel(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "channel", **row, "data": json.loads(row["data"])}
+
+
+def _export_preset(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "preset", **row}
+
+
+def _export_character(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "character", "name": row["name"], "data": json.loads(row["data"]), "triggers": json.loads(row["triggers"])}
+
+
+_EXPORTS: Dict[str, Tuple[str, str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "server": (
+        "SELECT server_id, server_name, description, instruction FROM servers WHERE server_id > ? ORDER BY server_id LIMIT ?",
+        "server_id", _export_server,
+    ),
+    "channel": (
+        "SELECT channel_id, server_id, server_name, data FROM channels WHERE channel_id > ? ORDER BY channel_id LIMIT ?",
+        "channel_id", _export_channel,
+    ),
+    "preset": (
+        "SELECT name, description, prompt_template FROM presets WHERE name > ? ORDER BY name LIMIT ?",
+        "name", _export_preset,
+    ),
+    "character": (
+        f"{_CHARACTER_SELECT} WHERE c.name > ? ORDER BY c.name LIMIT ?",
+        "name", _export_character,
+    ),
+}
+
+
+def iter_export(db: Database, types: Optional[Iterable[str]] = None, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[str]:
+    """Yields NDJSON lines (with trailing newline) for every record of the requested types."""
+    wanted = set(types or RECORD_TYPES)
+    for record_type in RECORD_TYPES:
+        if record_type not in wanted:
+            continue
+        sql, key, to_record = _EXPORTS[record_type]
+        for page in _pages(db, sql, key, page_size):
+            yield "".join(json.dumps(to_record(row), ensure_ascii=False) + "\n" for row in page)
+
+
+# ------------------------------------------------------
+# Import
+# ------------------------------------------------------
+
+@dataclass
+class ImportReport:
+    lines: int = 0
+    created: Dict[str, int] = field(default_factory=lambda: {t: 0 for t in RECORD_TYPES})
+    updated: Dict[str, int] = field(default_factory=lambda: {t: 0 for t in RECORD_TYPES})
+    skipped: Dict[str, int] = field(default_factory=lambda: {t: 0 for t in RECORD_TYPES})
+    chunks: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    error_count: int = 0
+    seconds: float = 0.0
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["seconds"] = round(self.seconds, 3)
+        return data
+
+
+class BulkImporter:
+    """
+    Incremental importer: call `feed()` with lines or records as they arrive and
+    `finish()` at the end. Records are written in chunks of `chunk_size`, one
+    transaction per record type per chunk.
+
+    `card_parser`, if given, converts untyped records (e.g. raw character cards)
+    into a (name, data) pair; otherwise such records are reported as errors.
+    """
+
+    def __init__(self, db: Database, on_conflict: str = "skip", chunk_size: int = IMPORT_CHUNK_SIZE,
+                 progress: Optional[Callable[[ImportReport], None]] = None,
+                 card_parser: Optional[Callable[[Dict[str, Any]], Tuple[str, Dict[str, Any]]]] = None):
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+        self.db = db
+        self.on_conflict = on_conflict
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.card_parser = card_parser
+        self.report = ImportReport()
+        self._pending: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {t: [] for t in RECORD_TYPES}
+        self._buffered = 0
+        self._started = time.monotonic()
+
+    # --- Input ---
+    def feed(self, items: Iterable[Any]):
+        """Accepts NDJSON lines (str/bytes) or already-parsed dicts."""
+        for item in items:
+            self.report.lines += 1
+            line_no = self.report.lines
+            if isinstance(item, (bytes, bytearray)):
+                item = item.decode("utf-8")
+            if isinstance(item, str):
+                if not item.strip():
+                    continue
+                try:
+                    item = json.loads(item)
+                except json.JSONDecodeError as e:
+                    self.report.error(line_no, f"Invalid JSON: {e}")
+                    continue
+            record = self._normalize(line_no, item)
+            if record is None:
+                continue
+            self._pending[record["type"]].append((line_no, record))
+            self._buffered += 1
+            if self._buffered >= self.chunk_size:
+                self.flush()
+
+    def finish(self) -> ImportReport:
+        self.flush()
+        self.report.seconds = time.monotonic() - self._started
+        return self.report
+
+    def _normalize(self, line_no: int, item: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(item, dict):
+            self.report.error(line_no, "Expected a JSON object")
+            return None
+        record_type = item.get("type")
+        if record_type is None and self.card_parser:
+            try:
+                name, data = self.card_parser(item)
+            except Exception as e:
+                self.report.error(line_no, f"Unrecognized card: {getattr(e, 'detail', e)}")
+                return None
+            return {"type": "character", "name": name, "data": data, "triggers": []}
+        required = {
+            "server": ("server_id", "server_name"),
+            "channel": ("channel_id", "server_id", "server_name", "data"),
+            "preset": ("name",),
+            "character": ("name", "data"),
+        }.get(record_type)
+        if required is None:
+            self.report.error(line_no, f"Unknown record type: {record_type!r}")
+            return None
+        missing = [key for key in required if item.get(key) in (None, "")]
+        if missing:
+            self.report.error(line_no, f"Missing {', '.join(missing)} for {record_type}")
+            return None
+        return item
+
+    # --- Writing ---
+    def flush(self):
+        """Writes everything buffered so far."""
+        if not self._buffered:
+            return
+        for record_type in RECORD_TYPES:
+            records = self._pending[record_type]
+            if records:
+                self._pending[record_type] = []
+                write = getattr(self, f"_write_{record_type}s")
+                try:
+                    write(records)
+                except sqlite3.IntegrityError:
+                    # e.g. a channel whose server is neither in the file nor the database:
+                    # the chunk rolled back, so write it again row by row to find the bad ones
+                    latest = self._latest(record_type, records)
+                    self.report.skipped[record_type] += len(records) - len(latest)
+                    for line_no, record in latest:
+                        try:
+                            write([(line_no, record)])
+                        except sqlite3.IntegrityError as e:
+                            self.report.error(line_no, f"{record_type} '{record[RECORD_KEYS[record_type]]}' rejected: {e}")
+        self._buffered = 0
+        self.report.chunks += 1
+        if self.progress:
+            self.progress(self.report)
+
+    def _existing(self, conn, table: str, column: str, keys: List[str]) -> set:
+        found = set()
+        for start in range(0, len(keys), _MAX_IN_PARAMS):
+            chunk = keys[start:start + _MAX_IN_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(row[0] for row in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk))
+        return found
+
+    def _latest(self, record_type: str, records: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Dedupes records within the chunk; the last one wins."""
+        key = RECORD_KEYS[record_type]
+        latest: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for line_no, record in records:
+            latest[record[key]] = (line_no, record)
+        return list(latest.values())
+
+    def _split(self, record_type: str, records: List[Tuple[int, Dict[str, Any]]], existing: set):
+        """
+        Dedupes records within the chunk and splits them into new and conflicting.
+        Also returns how many were skipped, for the caller to count once the write
+        has committed.
+        """
+        key = RECORD_KEYS[record_type]
+        latest = self._latest(record_type, records)
+        skipped = len(records) - len(latest)
+        new, conflicting = [], []
+        for line_no, record in latest:
+            (conflicting if record[key] in existing else new).append(record)
+        if conflicting and self.on_conflict == "error":
+            raise BulkImportError(f"{len(conflicting)} {record_type}(s) already exist, e.g. '{conflicting[0][key]}'")
+        if self.on_conflict == "skip":
+            skipped += len(conflicting)
+            conflicting = []
+        return new, conflicting, skipped
+
+    def _write_servers(self, records):
+        with self.db._write() as conn:
+            existing = self._existing(conn, "servers", "server_id", [r["server_id"] for _, r in records])
+            new, conflicting, skipped = self._split("server", records, existing)
+            rows = [(r["server_id"], r["server_name"], r.get("description"), r.get("instruction")) for r in new + conflicting]
+            # Upsert rather than REPLACE, which would cascade-delete the server's channels
+            conn.executemany("""
+                INSERT INTO servers (server_id, server_name, description, instruction) VALUES (?, ?, ?, ?)
+                ON CONFLICT(server_id) DO UPDATE SET
+                    server_name = excluded.server_name, description = excluded.description, instruction = excluded.instruction
+            """, rows)
+            for r in new + conflicting:
+                self.db._record_change(conn, events.SERVER_UPDATED, r["server_id"])
+        self.report.created["server"] += len(new)
+        self.report.updated["server"] += len(conflicting)
+        self.report.skipped["server"] += skipped
+
+    def _write_channels(self, records):
+        with self.db._write() as conn:
+            existing = self._existing(conn, "channels", "channel_id", [r["channel_id"] for _, r in records])
+            new, conflicting, skipped = self._split("channel", records, existing)
+            rows = [(r["channel_id"], r["server_id"], r["server_name"], json.dumps(r["data"])) for r in new + conflicting]
+            conn.executemany("""
+                INSERT INTO channels (channel_id, server_id, server_name, data) VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    server_id = excluded.server_id, server_name = excluded.server_name, data = excluded.data
+            """, rows)
+            for r in new + conflicting:
+                self.db._record_change(conn, events.CHANNEL_UPDATED, r["channel_id"])
+                self.db._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, r["channel_id"])
+        self.report.created["channel"] += len(new)
+        self.report.updated["channel"] += len(conflicting)
+        self.report.skipped["channel"] += skipped
+
+    def _write_presets(self, records):
+        with self.db._write() as conn:
+            existing = self._existing(conn, "presets", "name", [r["name"] for _, r in records])
+            new, conflicting, skipped = self._split("preset", records, existing)
+            rows = [(r["name"], r.get("description"), r.get("prompt_template")) for r in new + conflicting]
+            conn.executemany("""
+                INSERT INTO presets (name, description, prompt_template) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    description = excluded.description, prompt_template = excluded.prompt_template
+            """, rows)
+            for r in new + conflicting:
+                self.db._record_change(conn, events.PRESET_UPDATED, r["name"])
+        self.report.created["preset"] += len(new)
+        self.report.updated["preset"] += len(conflicting)
+        self.report.skipped["preset"] += skipped
+
+    def _write_characters(self, records):
+        with self.db._write() as conn:
+            existing = self._existing(conn, "characters", "name", [r["name"] for _, r in records])
+            new, conflicting, skipped = self._split("character", records, existing)
+            conn.executemany("INSERT INTO characters (name, data) VALUES (?, ?)",
+                             [(r["name"], json.dumps(r["data"])) for r in new])
+            conn.executemany("UPDATE characters SET data = ? WHERE name = ?",
+                             [(json.dumps(r["data"]), r["name"]) for r in conflicting])
+            written = new + conflicting
+            ids = {}
+            names = [r["name"] for r in written]
+            for start in range(0, len(names), _MAX_IN_PARAMS):
+                chunk = names[start:start + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                ids.update((row["name"], row["id"]) for row in conn.execute(f"SELECT id, name FROM characters WHERE name IN ({placeholders})", chunk))
+            if conflicting:
+                conn.executemany("DELETE FROM character_triggers WHERE character_id = ?", [(ids[r["name"]],) for r in conflicting])
+            conn.executemany("INSERT INTO character_triggers (character_id, trigger) VALUES (?, ?)",
+                             [(ids[r["name"]], trigger) for r in written for trigger in (r.get("triggers") or [])])
+            for r in written:
+                self.db._record_change(conn, events.CHARACTER_UPDATED, r["name"])
+        self.report.created["character"] += len(new)
+        self.report.updated["character"] += len(conflicting)
+        self.report.skipped["character"] += skipped
+
+
+def import_records(db: Database, items: Iterable[Any], on_conflict: str = "skip", chunk_size: int = IMPORT_CHUNK_SIZE,
+                   progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """Imports NDJSON lines or dicts from any iterable (e.g. an open file)."""
+    importer = BulkImporter(db, on_conflict=on_conflict, chunk_size=chunk_size, progress=progress)
+    importer.feed(items)
+    return importer.finish()
+
+
+# ------------------------------------------------------
+# Command line
+# ------------------------------------------------------
+
+def _print_progress(report: ImportReport):
+    created = sum(report.created.values())
+    updated = sum(report.updated.values())
+    skipped = sum(report.skipped.values())
+    print(f"... {report.lines} lines: {created} created, {updated} updated, {skipped} skipped, {report.error_count} errors", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk export/import of Viel characters, presets and channels (NDJSON)")
+    parser.add_argument("--db", default=None, help="Database file (defaults to DATABASE_URL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Write every record as NDJSON")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export_parser.add_argument("--types", default=",".join(RECORD_TYPES), help="Comma-separated record types")
+
+    import_parser = sub.add_parser("import", help="Load records from an NDJSON file")
+    import_parser.add_argument("input", help="Input file ('-' for stdin)")
+    import_parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES, default="skip")
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    args = parser.parse_args(argv)
+    # Keep migration messages out of an export written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        db = get_database(args.db) if args.db else get_database()
+    try:
+        if args.command == "export":
+            types = [t.strip() for t in args.types.split(",") if t.strip()]
+            out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            try:
+                for chunk in iter_export(db, types):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+        else:
+            source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+            try:
+                report = import_records(db, source, on_conflict=args.on_conflict, chunk_size=args.chunk_size, progress=_print_progress)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(json.dumps(report.to_dict(), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,145 @@
 import sqlite3
 import json
+import base64
 from typing import Any, Optional, Dict, List, Tuple
 import os
+import threading
+import time
+from contextlib import contextmanager
 
+from api.db import archive, enrichments, events, search
+from api.db.entity_cache import caches_for
+from api.db.events import ORIGIN, ChangeEvent, ChangeFeedWatcher, bus
+from api.db.migrations import VOLATILE_MIGRATIONS, migrate_once
+from api.db.pool import ConnectionPool
+from api.db.storage import Storage, StorageBase, is_postgres_url
+from api.db.write_behind import MISSING, WriteBehindBuffer
+
+# A SQLite file path, or a postgres:// URL for the PostgreSQL backend (api/db/postgres.py).
 DB_PATH = os.getenv("DATABASE_URL", "bot.db")
+# Set DATABASE_POOL=0 to go back to one short-lived connection per query.
+POOL_ENABLED = os.getenv("DATABASE_POOL", "1").lower() not in ("0", "false", "no")
+# Set DATABASE_WRITE_BEHIND=0 to write enrichments straight through, one commit each.
+WRITE_BEHIND_ENABLED = os.getenv("DATABASE_WRITE_BEHIND", "1").lower() not in ("0", "false", "no")
+# Optional second file for high-churn data (enrichments). It has its own connections
+# and write lock, so caption bursts never hold up config or whitelist writes, and it
+# can be vacuumed (or deleted while the bot is stopped) on its own. Empty = one file.
+VOLATILE_DB_PATH = os.getenv("VOLATILE_DATABASE_URL", "")
+
+# Keeps IN (...) lists under SQLite's host-parameter limit on older builds.
+_MAX_IN_PARAMS = 500
+
+# Loads a character together with its triggers (as a JSON array) in a single statement.
+_CHARACTER_SELECT = """
+    SELECT c.id, c.name, c.data,
+           (SELECT json_group_array(t.trigger)
+              FROM (SELECT trigger FROM character_triggers
+                     WHERE character_id = c.id ORDER BY id) AS t) AS triggers
+      FROM characters AS c
+"""
+
+# Lightweight character listing: only the fields the admin grid shows, read with JSON1.
+_CHARACTER_SUMMARY_SELECT = """
+    SELECT name,
+           COALESCE(json_extract(data, '$.avatar'), '') AS avatar,
+           COALESCE(json_extract(data, '$.info'), '') AS info
+      FROM characters
+"""
+
+# Stored channel columns. SELECT * would also return generated columns (is_system_channel).
+_CHANNEL_COLUMNS = "channel_id, server_id, server_name, data"
+
+# Sort key for channels; matches idx_channels_server_name so pages come off the index.
+_CHANNEL_NAME = "COALESCE(json_extract(data, '$.name'), '')"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque pagination cursor for the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: int) -> List[Any]:
+    """
+    Inverse of encode_cursor for a sort key of `columns` columns; raises ValueError
+    unless the cursor holds one scalar (string, number or null) per column.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != columns:
+        raise ValueError("Invalid cursor")
+    for value in values:
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+            raise ValueError("Invalid cursor")
+    return values
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with `prefix` (binary collation)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+_instances: Dict[str, Storage] = {}
+_instances_lock = threading.Lock()
+
+
+def get_database(path: str = DB_PATH) -> Storage:
+    """
+    Returns the process-wide database for `path`, creating it on first use: a
+    SQLite `Database` for a file path, a `PostgresDatabase` for a postgres:// URL.
+    Routers, the bot and plugins should share this instance instead of each
+    building their own.
+    """
+    key = path if is_postgres_url(path) else os.path.abspath(path)
+    with _instances_lock:
+        db = _instances.get(key)
+        if db is None:
+            if is_postgres_url(path):
+                from api.db.postgres import PostgresDatabase # Optional dependency (asyncpg)
+                db = PostgresDatabase(path)
+            else:
+                db = Database(path)
+            _instances[key] = db
+        return db
 
 
-class Database:
+def close_databases():
+    """Closes the pooled connections of every shared Database (call on shutdown)."""
+    with _instances_lock:
+        instances = list(_instances.values())
+    for db in instances:
+        db.close()
+
+
+class Database(StorageBase):
     """A class to manage all CRUD operations for the bot's SQLite database."""
 
-    def __init__(self, path: str = DB_PATH):
-        """Initializes the Database manager."""
+    def __init__(self, path: str = DB_PATH, pooled: bool = POOL_ENABLED, write_behind: bool = WRITE_BEHIND_ENABLED,
+                 volatile_path: Optional[str] = VOLATILE_DB_PATH):
+        """
+        Initializes the Database manager.
+        In pooled mode each thread reuses one persistent WAL-mode connection.
+        With a `volatile_path`, enrichments live in that file instead.
+        """
         self.db_path = path
+        self.volatile_path = volatile_path or None
+        self._cache_key = os.path.abspath(path)
+        self.pooled = pooled
+        self._pool = ConnectionPool(path)
+        self._volatile_pool = ConnectionPool(self.volatile_path) if self.volatile_path else None
+        self._local = threading.local()
+        # Channel and character records for the message hot path (see entity_cache.py)
+        self._entities = caches_for(self._cache_key)
+        self._feed_lock = threading.Lock()
+        self._feed_watcher: Optional[ChangeFeedWatcher] = None
         self._init_db()
+        self._feed_cursor = self.latest_change_id()
+        # Captions and link content are written in bursts while history is backfilled
+        self._last_enrichment_prune = time.monotonic()
+        self._enrichment_buffer = WriteBehindBuffer("enrichments", self._flush_enrichments) if write_behind else None
+        # Archived gateway messages, edits and deletes are batched here
+        self._message_buffer = WriteBehindBuffer("messages", self._flush_messages) if write_behind else None
 
     def _parse_json_value(self, value: Any) -> Any:
         """
@@ -29,84 +156,233 @@ class Database:
         return value
 
     def _get_connection(self):
-        """Returns a new database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA foreign_keys = ON;") # Ensure foreign key constraints are enforced
-        conn.row_factory = sqlite3.Row
-        return conn
+        """
+        Returns the calling thread's pooled connection, or a new one when pooling is off.
+        Used as `with self._get_connection() as conn:`, which commits or rolls back
+        on exit but keeps a pooled connection open for the next query.
+        """
+        unit = getattr(self._local, "unit_conn", None)
+        if unit is not None:
+            return unit # Inside transaction(): everything shares its connection
+        if self.pooled:
+            return self._pool.get()
+        return self._pool._connect()
+
+    def _volatile_connection(self):
+        """Connection for enrichment tables: the volatile file's, or the main one without it."""
+        if self._volatile_pool is None:
+            return self._get_connection()
+        if self.pooled:
+            return self._volatile_pool.get()
+        return self._volatile_pool._connect()
+
+    def database_files(self) -> List[Tuple[str, str, sqlite3.Connection]]:
+        """(label, path, connection for this thread) of every file, for maintenance and stats."""
+        files = [("main", self.db_path, self._get_connection())]
+        if self._volatile_pool is not None:
+            files.append(("volatile", self.volatile_path, self._volatile_connection()))
+        return files
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Returns connection and lock-contention counters for this database."""
+        stats = self._pool.stats.snapshot()
+        if self._volatile_pool is not None:
+            stats["volatile"] = self._volatile_pool.stats.snapshot()
+        if self._enrichment_buffer is not None:
+            stats["enrichment_buffer"] = self._enrichment_buffer.get_stats()
+        if self._message_buffer is not None:
+            stats["message_buffer"] = self._message_buffer.get_stats()
+        return stats
+
+    def _in_unit(self) -> bool:
+        # Reads inside transaction() may see uncommitted writes, so they bypass the caches
+        return getattr(self._local, "unit_conn", None) is not None
+
+    @contextmanager
+    def _read_snapshot(self):
+        with self._get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN") # One snapshot for every read below
+            yield conn
+
+    def flush(self):
+        """Writes any buffered enrichments and archived messages now."""
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.flush()
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+
+    def close(self):
+        """Flushes buffered writes and closes every pooled connection (call on shutdown)."""
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.close()
+        if self._message_buffer is not None:
+            self._message_buffer.close()
+        self._pool.close_all()
+        if self._volatile_pool is not None:
+            self._volatile_pool.close_all()
 
     def _init_db(self):
-        """Initializes the database and creates tables if they don't exist."""
+        """Brings the schema up to date (once per database file per process)."""
+        migrate_once(self.db_path, self._get_connection())
+        if self._volatile_pool is not None:
+            migrate_once(self.volatile_path, self._volatile_connection(), VOLATILE_MIGRATIONS)
+            self._move_enrichments_to_volatile()
+
+    def _move_enrichments_to_volatile(self):
+        """Moves enrichments stored in the main file (before the split) into the volatile file."""
         with self._get_connection() as conn:
-            # Config
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS config (
-                    key TEXT PRIMARY KEY,
-                    value JSON NOT NULL
-                );
-            """)
-            # Captions
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS captions (
-                    message_id TEXT PRIMARY KEY,
-                    caption TEXT NOT NULL
-                );
-            """)
+            if not conn.execute("SELECT 1 FROM enrichments LIMIT 1").fetchone():
+                return
+        # A throwaway connection: ATTACH makes BEGIN IMMEDIATE lock both files,
+        # which is fine for this one-off move but not for the pooled connections.
+        conn = self._pool._connect()
+        try:
+            conn.execute("ATTACH DATABASE ? AS volatile", (self.volatile_path,))
+            with conn:
+                moved = conn.execute("INSERT OR IGNORE INTO volatile.enrichments SELECT * FROM main.enrichments").rowcount
+                conn.execute("DELETE FROM main.enrichments")
+                conn.execute("INSERT INTO main.enrichments_fts (enrichments_fts) VALUES ('delete-all')")
+            conn.execute("DETACH DATABASE volatile")
+        finally:
+            conn.close()
+        self.rebuild_enrichment_search()
+        print(f"Moved {moved} enrichments to the volatile database {self.volatile_path}")
+
+    # ------------------------------------------------------
+    # Change notifications
+    # ------------------------------------------------------
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: `with db.transaction() as tx:` runs every write made through
+        `tx` (or this Database, on the same thread) in one IMMEDIATE transaction that
+        commits once on exit, or rolls back entirely if the block raises. Change
+        events are published after the commit. Nested calls join the outer unit.
+        """
+        conn = self._get_connection()
+        if conn.unit_depth:
+            conn.unit_depth += 1
+            try:
+                yield self
+            finally:
+                conn.unit_depth -= 1
+            return
+
+        if conn.in_transaction:
+            conn.commit() # Don't fold stray implicit transactions into this unit
+        conn.execute("BEGIN IMMEDIATE")
+        conn.unit_depth = 1
+        self._local.unit_conn = conn
+        self._local.pending_events = []
+        try:
+            yield self
+            conn.unit_depth = 0
             conn.commit()
-            # Servers
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS servers (
-                    server_id TEXT PRIMARY KEY,
-                    server_name TEXT NOT NULL,
-                    description TEXT,
-                    instruction TEXT
-                );
-            """)
-            # Channels
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS channels (
-                    channel_id TEXT PRIMARY KEY,
-                    server_id TEXT NOT NULL,
-                    server_name TEXT NOT NULL,
-                    data JSON NOT NULL,
-                    FOREIGN KEY (server_id) REFERENCES servers(server_id) ON DELETE CASCADE
-                );
-            """)
-            # Characters
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS characters (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    data JSON NOT NULL
-                );
-            """)
-            # Character Triggers
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS character_triggers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    character_id INTEGER NOT NULL,
-                    trigger TEXT NOT NULL,
-                    FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
-                );
-            """)
-            # Presets
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS presets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    description TEXT,
-                    prompt_template TEXT
-                );
-            """)
+        except BaseException:
+            conn.unit_depth = 0
+            conn.rollback()
+            self._local.pending_events = []
+            raise
+        finally:
+            self._local.unit_conn = None
+        pending, self._local.pending_events = self._local.pending_events, []
+        bus.publish_all(pending)
+
+    @contextmanager
+    def _write(self):
+        """
+        Connection for a write. Changes recorded with _record_change are written to
+        the `changes` feed in the same transaction and published on the event bus
+        after the commit; they are dropped if the write fails.
+        """
+        conn = self._get_connection()
+        if conn.unit_depth:
+            # Part of a transaction(): its commit writes and publishes everything
+            yield conn
+            return
+        self._local.pending_events = []
+        try:
+            with conn:
+                yield conn
+        except BaseException:
+            self._local.pending_events = []
+            raise
+        pending, self._local.pending_events = self._local.pending_events, []
+        bus.publish_all(pending)
+
+    def _record_change(self, conn: sqlite3.Connection, topic: str, key: Optional[str] = None):
+        """Appends a change to the feed; only valid inside a `with self._write()` block."""
+        cur = conn.execute("INSERT INTO changes (topic, key, origin) VALUES (?, ?, ?)", (topic, key, ORIGIN))
+        self._local.pending_events.append(ChangeEvent(topic, key, self._cache_key, cur.lastrowid))
+
+    def latest_change_id(self) -> int:
+        """Returns the id of the newest row in the change feed (0 if empty)."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT MAX(id) FROM changes").fetchone()
+            return row[0] or 0
+
+    def list_changes(self, after_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Reads the change feed, oldest first, for listeners outside this process."""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT id, topic, key, origin, created_at FROM changes WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def prune_changes(self, max_age_days: float) -> int:
+        """Deletes change-feed rows older than `max_age_days` (watchers only ever read recent ones)."""
+        with self._get_connection() as conn:
+            deleted = conn.execute(
+                "DELETE FROM changes WHERE created_at < datetime('now', ?)", (f"-{max_age_days} days",)
+            ).rowcount
             conn.commit()
+            return deleted
+
+    # ------------------------------------------------------
+    # Helper for keyset pagination
+    # ------------------------------------------------------
+    def _page(self, select: str, order: List[Tuple[str, str]], where: Optional[List[str]] = None, params: Optional[List[Any]] = None,
+              limit: Optional[int] = None, cursor: Optional[str] = None,
+              prefix: Optional[str] = None, prefix_expr: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Runs `select` ordered by `order` (a list of (SQL expression, result column) pairs
+        that together are unique) and returns (rows, next_cursor). Rows come after
+        `cursor`, optionally restricted to `prefix_expr` starting with `prefix`; the
+        range test lets SQLite use an index on that expression.
+        """
+        where = list(where or [])
+        params = list(params or [])
+        if cursor:
+            values = decode_cursor(cursor, len(order))
+            where.append(f"({', '.join(expr for expr, _ in order)}) > ({', '.join('?' * len(order))})")
+            params.extend(values)
+        if prefix:
+            where.append(f"{prefix_expr} >= ? AND {prefix_expr} < ?")
+            params.extend([prefix, _prefix_upper_bound(prefix)])
+        sql = select
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(expr for expr, _ in order)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1) # One extra row tells us whether there is a next page
+        with self._get_connection() as conn:
+            rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][column] for _, column in order])
+        return rows, next_cursor
 
     # ------------------------------------------------------
     # Helper for dynamic updates
     # ------------------------------------------------------
-    def _update_record(self, table_name: str, identifier_col: str, identifier_val: Any, **kwargs):
-        """Generic helper to update any record in any table."""
+    def _update_record(self, conn: sqlite3.Connection, table_name: str, identifier_col: str, identifier_val: Any, **kwargs) -> int:
+        """Generic helper to update any record in any table. Returns the number of rows changed."""
         if not kwargs:
-            return # Nothing to update
+            return 0 # Nothing to update
         
         # JSON fields need to be dumped to string
         for key, value in kwargs.items():
@@ -116,19 +392,23 @@ class Database:
         fields = ", ".join([f"{key} = ?" for key in kwargs.keys()])
         values = tuple(kwargs.values()) + (identifier_val,)
         
-        with self._get_connection() as conn:
-            query = f"UPDATE {table_name} SET {fields} WHERE {identifier_col} = ?"
-            conn.execute(query, values)
-            conn.commit()
+        query = f"UPDATE {table_name} SET {fields} WHERE {identifier_col} = ?"
+        return conn.execute(query, values).rowcount
 
     # ------------------------------------------------------
     # Config (Key-Value Store)
     # ------------------------------------------------------
     def set_config(self, key: str, value: Any):
         """Create or update a configuration key-value pair."""
-        with self._get_connection() as conn:
-            # No change here, this was always correct.
-            conn.execute("REPLACE INTO config (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+        encoded = json.dumps(value)
+        with self._write() as conn:
+            row = conn.execute("SELECT value FROM config WHERE key = ?", (key,)).fetchone()
+            # JSON column affinity stores numbers as numbers, so compare parsed values
+            stored = self._parse_json_value(row["value"]) if row else None
+            if row and type(stored) is type(value) and stored == value:
+                return # Unchanged, keep the cached snapshot
+            conn.execute("REPLACE INTO config (key, value) VALUES (?, ?)", (key, encoded))
+            self._record_change(conn, events.CONFIG_CHANGED, key)
             conn.commit()
 
     def get_config(self, key: str) -> Optional[Any]:
@@ -146,9 +426,10 @@ class Database:
             return {row["key"]: self._parse_json_value(row["value"]) for row in rows}
 
     def delete_config(self, key: str):
-        # ... (this is the same) ...
-        with self._get_connection() as conn:
-            conn.execute("DELETE FROM config WHERE key = ?", (key,))
+        """Delete a configuration key."""
+        with self._write() as conn:
+            if conn.execute("DELETE FROM config WHERE key = ?", (key,)).rowcount:
+                self._record_change(conn, events.CONFIG_CHANGED, key)
             conn.commit()
 
     # ------------------------------------------------------
@@ -156,9 +437,10 @@ class Database:
     # ------------------------------------------------------
     def create_server(self, server_id: str, server_name: str, description: Optional[str] = None, instruction: Optional[str] = None):
         """Create a new server record."""
-        with self._get_connection() as conn:
+        with self._write() as conn:
             conn.execute("INSERT INTO servers (server_id, server_name, description, instruction) VALUES (?, ?, ?, ?)",
                          (server_id, server_name, description, instruction))
+            self._record_change(conn, events.SERVER_UPDATED, server_id)
             conn.commit()
 
     def get_server(self, server_id: str) -> Optional[Dict[str, Any]]:
@@ -169,12 +451,19 @@ class Database:
             
     def update_server(self, server_id: str, **kwargs):
         """Update a server's data (e.g., server_name, description)."""
-        self._update_record("servers", "server_id", server_id, **kwargs)
+        with self._write() as conn:
+            if self._update_record(conn, "servers", "server_id", server_id, **kwargs):
+                self._record_change(conn, events.SERVER_UPDATED, server_id)
 
     def delete_server(self, server_id: str):
         """Delete a server and its associated channels."""
-        with self._get_connection() as conn:
-            conn.execute("DELETE FROM servers WHERE server_id = ?", (server_id,))
+        with self._write() as conn:
+            channel_ids = [row["channel_id"] for row in conn.execute("SELECT channel_id FROM channels WHERE server_id = ?", (server_id,))]
+            if conn.execute("DELETE FROM servers WHERE server_id = ?", (server_id,)).rowcount:
+                self._record_change(conn, events.SERVER_DELETED, server_id)
+                # The channels went with it through ON DELETE CASCADE
+                for channel_id in channel_ids:
+                    self._record_change(conn, events.CHANNEL_DELETED, channel_id)
             conn.commit()
 
     def list_servers(self) -> List[Dict[str, Any]]:
@@ -183,40 +472,64 @@ class Database:
             rows = conn.execute("SELECT * FROM servers").fetchall()
             return [dict(row) for row in rows]
 
+    def page_servers(self, limit: Optional[int] = None, cursor: Optional[str] = None, prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Servers ordered by name, one page at a time; `prefix` filters on server_name."""
+        return self._page(
+            "SELECT server_id, server_name, description, instruction FROM servers",
+            [("server_name", "server_name"), ("server_id", "server_id")],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr="server_name"
+        )
+
     # ------------------------------------------------------
     # Channels
     # ------------------------------------------------------
     def create_channel(self, channel_id: str, server_id: str, server_name: str, data: Dict[str, Any]):
         """Create a new channel record."""
-        with self._get_connection() as conn:
+        with self._write() as conn:
             conn.execute("INSERT INTO channels (channel_id, server_id, server_name, data) VALUES (?, ?, ?, ?)",
                          (channel_id, server_id, server_name, json.dumps(data)))
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            if data.get("whitelist"):
+                self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
             conn.commit()
     
-    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
-        """Read a channel's data by its ID."""
-        with self._get_connection() as conn:
-            row = conn.execute("SELECT * FROM channels WHERE channel_id = ?", (channel_id,)).fetchone()
-            if not row:
-                return None
-            channel = dict(row)
-            channel['data'] = json.loads(channel['data'])
-            return channel
-            
+    def _read_channel(self, channel_id: str, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+        if conn is None:
+            with self._get_connection() as conn:
+                return self._read_channel(channel_id, conn)
+        row = conn.execute(f"SELECT {_CHANNEL_COLUMNS} FROM channels WHERE channel_id = ?", (channel_id,)).fetchone()
+        if not row:
+            return None
+        channel = dict(row)
+        channel['data'] = json.loads(channel['data'])
+        return channel
+
     def update_channel(self, channel_id: str, **kwargs):
         """Update a channel's data (e.g., server_name, data)."""
-        self._update_record("channels", "channel_id", channel_id, **kwargs)
+        with self._write() as conn:
+            old = conn.execute("SELECT data FROM channels WHERE channel_id = ?", (channel_id,)).fetchone()
+            if not self._update_record(conn, "channels", "channel_id", channel_id, **kwargs):
+                return
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            if "data" in kwargs:
+                new_data = kwargs["data"]
+                if isinstance(new_data, str):
+                    new_data = json.loads(new_data)
+                old_whitelist = json.loads(old["data"]).get("whitelist") or []
+                if old_whitelist != ((new_data or {}).get("whitelist") or []):
+                    self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
 
     def delete_channel(self, channel_id: str):
         """Delete a channel record."""
-        with self._get_connection() as conn:
-            conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+        with self._write() as conn:
+            if conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,)).rowcount:
+                self._record_change(conn, events.CHANNEL_DELETED, channel_id)
             conn.commit()
 
     def list_channels(self) -> List[Dict[str, Any]]:
         """List all channels across all servers."""
         with self._get_connection() as conn:
-            rows = conn.execute("SELECT * FROM channels").fetchall()
+            rows = conn.execute(f"SELECT {_CHANNEL_COLUMNS} FROM channels").fetchall()
             channels = []
             for row in rows:
                 channel = dict(row)
@@ -228,7 +541,7 @@ class Database:
         """List all channels for a specific server by its ID."""
         with self._get_connection() as conn:
             # Use a WHERE clause to filter by server_id
-            rows = conn.execute("SELECT * FROM channels WHERE server_id = ?", (server_id,)).fetchall()
+            rows = conn.execute(f"SELECT {_CHANNEL_COLUMNS} FROM channels WHERE server_id = ?", (server_id,)).fetchall()
             channels = []
             for row in rows:
                 channel = dict(row)
@@ -237,57 +550,133 @@ class Database:
                 channels.append(channel)
             return channels
 
+    def find_system_channel_id(self) -> Optional[str]:
+        """Returns the ID of the channel flagged as the system channel (indexed lookup)."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT channel_id FROM channels WHERE is_system_channel = 1 LIMIT 1").fetchone()
+            return row["channel_id"] if row else None
+
+    def list_channels_whitelisting(self, character_name: str) -> List[str]:
+        """Returns the IDs of every channel whose whitelist contains `character_name`."""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT channel_id FROM channel_whitelist WHERE character_name = ? ORDER BY channel_id", (character_name,)
+            ).fetchall()
+            return [row["channel_id"] for row in rows]
+
+    def page_channels_for_server(self, server_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """A server's channels ordered by channel name, one page at a time; `prefix` filters on the name."""
+        rows, next_cursor = self._page(
+            f"SELECT {_CHANNEL_COLUMNS}, {_CHANNEL_NAME} AS sort_name FROM channels",
+            [(_CHANNEL_NAME, "sort_name"), ("channel_id", "channel_id")],
+            where=["server_id = ?"], params=[server_id],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr=_CHANNEL_NAME
+        )
+        for row in rows:
+            del row["sort_name"]
+            row["data"] = json.loads(row["data"])
+        return rows, next_cursor
+
     # ------------------------------------------------------
     # Characters & Triggers
     # ------------------------------------------------------
     def create_character(self, name: str, data: Dict[str, Any], triggers: Optional[List[str]] = None) -> int:
         """Create a new character and optionally add its trigger words."""
-        with self._get_connection() as conn:
+        with self._write() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO characters (name, data) VALUES (?, ?)", (name, json.dumps(data)))
             char_id = cur.lastrowid
             if triggers:
                 trigger_data = [(char_id, trigger) for trigger in triggers]
                 cur.executemany("INSERT INTO character_triggers (character_id, trigger) VALUES (?, ?)", trigger_data)
+            self._record_change(conn, events.CHARACTER_UPDATED, name)
             conn.commit()
             return char_id
 
-    def get_character(self, name: str) -> Optional[Dict[str, Any]]:
-        """Read a character's data and triggers by name."""
+    def _read_character(self, name: str) -> Optional[Dict[str, Any]]:
         with self._get_connection() as conn:
-            row = conn.execute("SELECT id, data FROM characters WHERE name = ?", (name,)).fetchone()
-            if not row: return None
-            
-            char_id = row["id"]
-            triggers = [r["trigger"] for r in conn.execute("SELECT trigger FROM character_triggers WHERE character_id = ?", (char_id,)).fetchall()]
-            return {"id": char_id, "name": name, "data": json.loads(row["data"]), "triggers": triggers}
+            row = conn.execute(f"{_CHARACTER_SELECT} WHERE c.name = ?", (name,)).fetchone()
+            return self._character_from_row(row) if row else None
+
+    def _read_characters(self, names: List[str], conn: Optional[sqlite3.Connection] = None) -> Dict[str, Dict[str, Any]]:
+        if conn is None:
+            with self._get_connection() as conn:
+                return self._read_characters(names, conn)
+        found = {}
+        for start in range(0, len(names), _MAX_IN_PARAMS):
+            chunk = names[start:start + _MAX_IN_PARAMS]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = conn.execute(f"{_CHARACTER_SELECT} WHERE c.name IN ({placeholders})", chunk).fetchall()
+            for row in rows:
+                found[row["name"]] = self._character_from_row(row)
+        return found
 
     def update_character(self, name: str, **kwargs):
         """Update a character's data (e.g., data)."""
-        self._update_record("characters", "name", name, **kwargs)
+        with self._write() as conn:
+            if self._update_record(conn, "characters", "name", name, **kwargs):
+                self._record_change(conn, events.CHARACTER_UPDATED, name)
+
+    def rename_character(self, name: str, new_name: str):
+        """Rename a character; channel whitelists naming it are updated too."""
+        with self._write() as conn:
+            affected = self._whitelisting_channel_ids(conn, name)
+            if conn.execute("UPDATE characters SET name = ? WHERE name = ?", (new_name, name)).rowcount:
+                self._record_change(conn, events.CHARACTER_DELETED, name)
+                self._record_change(conn, events.CHARACTER_UPDATED, new_name)
+                self._record_whitelist_changes(conn, affected)
 
     def delete_character(self, name: str):
-        """Delete a character and its associated triggers."""
-        with self._get_connection() as conn:
-            conn.execute("DELETE FROM characters WHERE name = ?", (name,))
+        """Delete a character and its associated triggers (and remove it from channel whitelists)."""
+        with self._write() as conn:
+            affected = self._whitelisting_channel_ids(conn, name)
+            if conn.execute("DELETE FROM characters WHERE name = ?", (name,)).rowcount:
+                self._record_change(conn, events.CHARACTER_DELETED, name)
+                self._record_whitelist_changes(conn, affected)
             conn.commit()
 
+    def _whitelisting_channel_ids(self, conn: sqlite3.Connection, name: str) -> List[str]:
+        return [row[0] for row in conn.execute("SELECT channel_id FROM channel_whitelist WHERE character_name = ?", (name,))]
+
+    def _record_whitelist_changes(self, conn: sqlite3.Connection, channel_ids: List[str]):
+        # The whitelists were rewritten by the characters_*_whitelist triggers
+        for channel_id in channel_ids:
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
+
     def list_characters(self) -> List[Dict[str, Any]]:
         """List all characters with their data and triggers."""
         with self._get_connection() as conn:
-            chars = [dict(row) for row in conn.execute("SELECT id, name, data FROM characters").fetchall()]
-            for char in chars:
-                char['data'] = json.loads(char['data'])
-                triggers = [r["trigger"] for r in conn.execute("SELECT trigger FROM character_triggers WHERE character_id = ?", (char["id"],)).fetchall()]
-                char['triggers'] = triggers
-        return chars
+            rows = conn.execute(_CHARACTER_SELECT).fetchall()
+            return [self._character_from_row(row) for row in rows]
+
+    def page_character_summaries(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Name, avatar and info of characters ordered by name, one page at a time.
+        Reads only those fields (via json_extract), never the full persona or triggers.
+        """
+        return self._page(
+            _CHARACTER_SUMMARY_SELECT, [("name", "name")],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr="name"
+        )
+
+    def _character_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Builds a character dict from a row produced by _CHARACTER_SELECT."""
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "data": json.loads(row["data"]),
+            "triggers": json.loads(row["triggers"]),
+        }
     
     def update_character_triggers(self, character_id: int, triggers: List[str]):
         """
         Replaces all triggers for a given character.
         Deletes existing triggers and inserts the new list.
         """
-        with self._get_connection() as conn:
+        with self._write() as conn:
             cur = conn.cursor()
             # Delete old triggers first
             cur.execute("DELETE FROM character_triggers WHERE character_id = ?", (character_id,))
@@ -295,6 +684,9 @@ class Database:
             if triggers:
                 trigger_data = [(character_id, trigger) for trigger in triggers]
                 cur.executemany("INSERT INTO character_triggers (character_id, trigger) VALUES (?, ?)", trigger_data)
+            row = conn.execute("SELECT name FROM characters WHERE id = ?", (character_id,)).fetchone()
+            if row:
+                self._record_change(conn, events.CHARACTER_UPDATED, row["name"])
             conn.commit()
 
     # ------------------------------------------------------
@@ -302,26 +694,31 @@ class Database:
     # ------------------------------------------------------
     def create_preset(self, name: str, description: str, prompt_template: str) -> int:
         """Create a new preset."""
-        with self._get_connection() as conn:
+        with self._write() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO presets (name, description, prompt_template) VALUES (?, ?, ?)", (name, description, prompt_template))
+            self._record_change(conn, events.PRESET_UPDATED, name)
             conn.commit()
             return cur.lastrowid
 
-    def get_preset(self, name: str) -> Optional[Dict[str, Any]]:
-        """Read a preset by its unique name."""
-        with self._get_connection() as conn:
-            row = conn.execute("SELECT * FROM presets WHERE name = ?", (name,)).fetchone()
-            return dict(row) if row else None
+    def _read_preset(self, name: str, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+        if conn is None:
+            with self._get_connection() as conn:
+                return self._read_preset(name, conn)
+        row = conn.execute("SELECT * FROM presets WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
             
     def update_preset(self, name: str, **kwargs):
         """Update a preset's data (e.g., description, prompt_template)."""
-        self._update_record("presets", "name", name, **kwargs)
+        with self._write() as conn:
+            if self._update_record(conn, "presets", "name", name, **kwargs):
+                self._record_change(conn, events.PRESET_UPDATED, kwargs.get("name", name))
 
     def delete_preset(self, name: str):
         """Delete a preset by its name."""
-        with self._get_connection() as conn:
-            conn.execute("DELETE FROM presets WHERE name = ?", (name,))
+        with self._write() as conn:
+            if conn.execute("DELETE FROM presets WHERE name = ?", (name,)).rowcount:
+                self._record_change(conn, events.PRESET_DELETED, name)
             conn.commit()
 
     def list_presets(self) -> List[Dict[str, Any]]:
@@ -330,20 +727,280 @@ class Database:
             rows = conn.execute("SELECT * FROM presets").fetchall()
             return [dict(row) for row in rows]
         
-    def get_caption(self, message_id: str) -> Optional[str]:
-        """Read a caption for a given message ID."""
+    # ------------------------------------------------------
+    # Full-text search
+    # ------------------------------------------------------
+    def search(self, text: str, types: Optional[List[str]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ranked full-text search over characters, presets and captions. Each hit is
+        {type, key, title, snippet, rank}; lower rank is better (FTS5 bm25).
+        """
+        query = search.fts_query(text)
+        if not query:
+            return []
+        types = types or list(search.SEARCH_TYPES)
+        marks = (search.HIGHLIGHT_START, search.HIGHLIGHT_END, search.ELLIPSIS, search.SNIPPET_TOKENS)
+        hits = []
         with self._get_connection() as conn:
-            row = conn.execute("SELECT caption FROM captions WHERE message_id = ?", (message_id,)).fetchone()
-            return row['caption'] if row else None
+            if "character" in types:
+                rows = conn.execute("""
+                    SELECT c.name AS key, c.name AS title,
+                           snippet(characters_fts, -1, ?, ?, ?, ?) AS snippet,
+                           bm25(characters_fts, 10.0, 2.0, 1.0, 1.0, 1.0) AS rank
+                      FROM characters_fts JOIN characters AS c ON c.id = characters_fts.rowid
+                     WHERE characters_fts MATCH ? ORDER BY rank LIMIT ?
+                """, (*marks, query, limit)).fetchall()
+                hits += [{"type": "character", **dict(row)} for row in rows]
+            if "preset" in types:
+                rows = conn.execute("""
+                    SELECT p.name AS key, p.name AS title,
+                           snippet(presets_fts, -1, ?, ?, ?, ?) AS snippet,
+                           bm25(presets_fts, 10.0, 2.0, 1.0) AS rank
+                      FROM presets_fts JOIN presets AS p ON p.id = presets_fts.rowid
+                     WHERE presets_fts MATCH ? ORDER BY rank LIMIT ?
+                """, (*marks, query, limit)).fetchall()
+                hits += [{"type": "preset", **dict(row)} for row in rows]
+        if "caption" in types:
+            with self._volatile_connection() as conn:
+                # The caption index is contentless, so snippets are cut from the decompressed payload
+                rows = conn.execute("""
+                    SELECT s.message_id, s.kind, e.payload, e.compressed, bm25(enrichments_fts) AS rank
+                      FROM enrichments_fts
+                      JOIN enrichment_search AS s ON s.id = enrichments_fts.rowid
+                      JOIN enrichments AS e
+                        ON e.message_id = s.message_id AND e.kind = s.kind AND e.source_hash = s.source_hash
+                     WHERE enrichments_fts MATCH ? ORDER BY rank LIMIT ?
+                """, (query, limit)).fetchall()
+                words = search.query_words(text)
+                hits += [{
+                    "type": "caption",
+                    "key": str(row["message_id"]),
+                    "title": row["kind"],
+                    "snippet": search.make_snippet(enrichments.decode_payload(row["payload"], row["compressed"]), words),
+                    "rank": row["rank"],
+                } for row in rows]
+        hits.sort(key=lambda hit: hit["rank"])
+        return hits[:limit]
+
+    # ------------------------------------------------------
+    # Enrichments (image captions, link content)
+    # ------------------------------------------------------
+    def get_enrichment(self, message_id: int, kind: str, source: Optional[str] = None) -> Optional[str]:
+        """
+        Read the enrichment of `kind` for a message. With a `source`, an entry derived
+        from that exact source is preferred, falling back to one stored without a source.
+        """
+        message_id = int(message_id)
+        key_hash = enrichments.source_hash(source)
+        for candidate in dict.fromkeys((key_hash, 0)):
+            if self._enrichment_buffer is not None:
+                pending = self._enrichment_buffer.get((message_id, kind, candidate))
+                if pending is not MISSING:
+                    if pending:
+                        return pending[0]
+                    continue # Deleted, not yet flushed
+            with self._volatile_connection() as conn:
+                row = conn.execute(
+                    "SELECT payload, compressed FROM enrichments WHERE message_id = ? AND kind = ? AND source_hash = ?",
+                    (message_id, kind, candidate)
+                ).fetchone()
+            if row:
+                return enrichments.decode_payload(row["payload"], row["compressed"])
+        return None
+
+    def set_enrichment(self, message_id: int, kind: str, text: str, source: Optional[str] = None):
+        """Create or update an enrichment (written behind, in batches)."""
+        key = (int(message_id), kind, enrichments.source_hash(source))
+        value = (text, int(time.time()))
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.put(key, value)
+            return
+        self._flush_enrichments([(key, value)], [])
+
+    def delete_enrichment(self, message_id: int, kind: str, source: Optional[str] = None):
+        """Delete one enrichment."""
+        key = (int(message_id), kind, enrichments.source_hash(source))
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.delete(key)
+            return
+        self._flush_enrichments([], [key])
+
+    def _flush_enrichments(self, upserts: List[Tuple[Tuple[int, str, int], Tuple[str, int]]], deletes: List[Tuple[int, str, int]]):
+        """Writes a batch of enrichment changes in one transaction."""
+        rows = []
+        for (message_id, kind, key_hash), (text, created_at) in upserts:
+            payload, compressed, size = enrichments.encode_payload(text)
+            rows.append((message_id, kind, key_hash, payload, compressed, size, created_at))
+        with self._volatile_connection() as conn:
+            if rows:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO enrichments (message_id, kind, source_hash, payload, compressed, size, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+            if deletes:
+                conn.executemany("DELETE FROM enrichments WHERE message_id = ? AND kind = ? AND source_hash = ?", deletes)
+            enrichments.index_for_search(conn, [(key, text) for key, (text, _) in upserts])
+            conn.commit()
+        self._maybe_prune_enrichments()
+
+    def _maybe_prune_enrichments(self):
+        """Applies the retention policy at most once per PRUNE_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if now - self._last_enrichment_prune < enrichments.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_enrichment_prune = now
+        self.prune_enrichments()
+
+    def prune_enrichments(self, max_age_days: float = enrichments.MAX_AGE_DAYS, max_bytes: int = enrichments.MAX_BYTES) -> Dict[str, int]:
+        """
+        Deletes enrichments older than `max_age_days`, then the oldest ones until the
+        stored payloads fit in `max_bytes`. Returns how many rows each rule removed.
+        """
+        cutoff = int(time.time() - max_age_days * 86400)
+        with self._volatile_connection() as conn:
+            expired = conn.execute("DELETE FROM enrichments WHERE created_at < ?", (cutoff,)).rowcount
+            over_budget = conn.execute("""
+                DELETE FROM enrichments WHERE (message_id, kind, source_hash) IN (
+                    SELECT message_id, kind, source_hash FROM (
+                        SELECT message_id, kind, source_hash,
+                               SUM(length(payload)) OVER (ORDER BY created_at DESC, message_id DESC
+                                                          ROWS UNBOUNDED PRECEDING) AS running_bytes
+                        FROM enrichments
+                    ) WHERE running_bytes > ?
+                )
+            """, (max_bytes,)).rowcount
+            conn.commit()
+        if expired or over_budget:
+            print(f"Pruned enrichments: {expired} expired, {over_budget} over the size budget")
+        return {"expired": expired, "over_budget": over_budget}
 
-    def set_caption(self, message_id: str, caption: str):
-        """Create or update a caption for a message ID."""
+    def get_enrichment_stats(self) -> Dict[str, Any]:
+        """Row counts and stored/uncompressed bytes per kind."""
+        with self._volatile_connection() as conn:
+            rows = conn.execute("""
+                SELECT kind, COUNT(*) AS count, SUM(length(payload)) AS stored_bytes, SUM(size) AS raw_bytes
+                FROM enrichments GROUP BY kind
+            """).fetchall()
+            return {row["kind"]: {"count": row["count"], "stored_bytes": row["stored_bytes"], "raw_bytes": row["raw_bytes"]} for row in rows}
+
+    def rebuild_enrichment_search(self) -> int:
+        """Re-indexes every enrichment, dropping orphaned search entries. Returns the number indexed."""
+        with self._volatile_connection() as conn:
+            conn.execute("INSERT INTO enrichments_fts (enrichments_fts) VALUES ('delete-all')")
+            conn.execute("DELETE FROM enrichment_search")
+            rows = conn.execute("SELECT message_id, kind, source_hash, payload, compressed FROM enrichments")
+            count = 0
+            while True:
+                batch = rows.fetchmany(500)
+                if not batch:
+                    break
+                enrichments.index_for_search(conn, [
+                    ((row["message_id"], row["kind"], row["source_hash"]), enrichments.decode_payload(row["payload"], row["compressed"]))
+                    for row in batch
+                ])
+                count += len(batch)
+            conn.commit()
+            return count
+
+    # ------------------------------------------------------
+    # Message archive
+    # ------------------------------------------------------
+    def archive_message(self, record: Dict[str, Any]):
+        """Store (or, for an edit, replace) a message record (written behind, in batches)."""
+        row = archive.to_row(record)
+        if self._message_buffer is not None:
+            self._message_buffer.put(row[0], row)
+            return
+        self._flush_messages([(row[0], row)], [])
+
+    def delete_archived_messages(self, message_ids: List[int]):
+        """Remove deleted messages from the archive."""
+        message_ids = [int(message_id) for message_id in message_ids]
+        if self._message_buffer is not None:
+            for message_id in message_ids:
+                self._message_buffer.delete(message_id)
+            return
+        self._flush_messages([], message_ids)
+
+    def _flush_messages(self, upserts: List[Tuple[int, Tuple]], deletes: List[int]):
+        """Writes a batch of archive changes in one transaction."""
+        columns = ", ".join(archive.COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in archive.COLUMNS[1:])
         with self._get_connection() as conn:
-            conn.execute("REPLACE INTO captions (message_id, caption) VALUES (?, ?)", (message_id, caption))
+            if upserts:
+                # An upsert (not INSERT OR REPLACE) so the FTS update trigger fires
+                conn.executemany(f"""
+                    INSERT INTO messages ({columns}) VALUES ({", ".join("?" * len(archive.COLUMNS))})
+                    ON CONFLICT(message_id) DO UPDATE SET {updates}
+                """, [row for _, row in upserts])
+            if deletes:
+                conn.executemany("DELETE FROM messages WHERE message_id = ?", [(message_id,) for message_id in deletes])
             conn.commit()
 
-    def delete_caption(self, message_id: str):
-        """Delete a caption for a message ID."""
+    def get_archived_message(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """One archived message, or None."""
+        message_id = int(message_id)
+        if self._message_buffer is not None:
+            pending = self._message_buffer.get(message_id)
+            if pending is not MISSING:
+                return archive.from_row(pending) if pending else None
+        with self._get_connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(archive.COLUMNS)} FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        return archive.from_row(row) if row else None
+
+    def get_archived_messages(self, channel_id: int, limit: int = archive.DEFAULT_LIMIT,
+                              before: Optional[int] = None, after: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` messages of a channel, oldest first: the newest ones before
+        message id `before` (or the newest overall), or the oldest ones after `after`.
+        """
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+        where, params = ["channel_id = ?"], [int(channel_id)]
+        if before is not None:
+            where.append("message_id < ?")
+            params.append(int(before))
+        if after is not None:
+            where.append("message_id > ?")
+            params.append(int(after))
+        # Walking backwards from `before` reads the newest page; forwards from `after`, the oldest
+        direction = "ASC" if after is not None and before is None else "DESC"
+        with self._get_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT {', '.join(archive.COLUMNS)} FROM messages
+                 WHERE {' AND '.join(where)} ORDER BY message_id {direction} LIMIT ?
+            """, (*params, limit)).fetchall()
+        records = [archive.from_row(row) for row in rows]
+        return records if direction == "ASC" else records[::-1]
+
+    def search_messages(self, text: str, channel_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ranked full-text search over archived messages, optionally within one channel."""
+        query = search.fts_query(text)
+        if not query:
+            return []
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+        where, params = ["messages_fts MATCH ?"], [query]
+        if channel_id is not None:
+            where.append("m.channel_id = ?")
+            params.append(int(channel_id))
+        marks = (search.HIGHLIGHT_START, search.HIGHLIGHT_END, search.ELLIPSIS, search.SNIPPET_TOKENS)
+        with self._get_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT {', '.join('m.' + column for column in archive.COLUMNS)},
+                       snippet(messages_fts, 1, ?, ?, ?, ?) AS snippet,
+                       bm25(messages_fts, 2.0, 1.0) AS rank
+                  FROM messages_fts JOIN messages AS m ON m.message_id = messages_fts.rowid
+                 WHERE {' AND '.join(where)} ORDER BY rank LIMIT ?
+            """, (*marks, *params, limit)).fetchall()
+        return [{**archive.from_row(tuple(row)[:len(archive.COLUMNS)]), "snippet": row["snippet"], "rank": row["rank"]} for row in rows]
+
+    def get_archive_stats(self) -> Dict[str, Any]:
+        """Archived message count, channel count and time span."""
         with self._get_connection() as conn:
-            conn.execute("DELETE FROM captions WHERE message_id = ?", (message_id,))
-            conn.commit()
\ No newline at end of file
+            row = conn.execute("""
+                SELECT COUNT(*) AS messages, COUNT(DISTINCT channel_id) AS channels,
+                       MIN(created_at) AS oldest, MAX(created_at) AS newest
+                  FROM messages
+            """).fetchone()
+        return dict(row)
@@ -0,0 +1,104 @@
+# api/db/enrichments.py
+"""
+Helpers for the `enrichments` table: text derived from a Discord message
+(image descriptions, fetched link content) that is expensive to regenerate.
+
+Rows are keyed by (message_id, kind, source_hash). `source_hash` identifies what
+the text was derived from (e.g. the set of links in the message), so an edited
+message gets a fresh entry instead of a stale one; 0 means "no particular
+source". Large payloads are zlib-compressed.
+"""
+
+import hashlib
+import os
+import zlib
+from typing import Iterable, Optional, Tuple
+
+# --- Kinds ---
+IMAGE = "image"
+LINK = "link"
+
+# Payloads at least this large (in UTF-8 bytes) are stored compressed.
+COMPRESS_MIN_BYTES = int(os.getenv("ENRICHMENT_COMPRESS_MIN_BYTES", "512"))
+# Retention policy, applied by Database.prune_enrichments().
+MAX_AGE_DAYS = float(os.getenv("ENRICHMENT_MAX_AGE_DAYS", "90"))
+MAX_BYTES = int(os.getenv("ENRICHMENT_MAX_BYTES", str(256 * 1024 * 1024)))
+# How often flushes re-apply the retention policy.
+PRUNE_INTERVAL_SECONDS = float(os.getenv("ENRICHMENT_PRUNE_INTERVAL", "3600"))
+
+
+def source_hash(source: Optional[str]) -> int:
+    """A stable signed 64-bit hash of `source` (0 for no source), stored as an INTEGER."""
+    if not source:
+        return 0
+    digest = hashlib.blake2b(source.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True) or 1
+
+
+def encode_payload(text: str) -> Tuple[bytes, int, int]:
+    """Returns (payload, compressed flag, uncompressed size) for storage."""
+    raw = text.encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return packed, 1, len(raw)
+    return raw, 0, len(raw)
+
+
+def decode_payload(payload: bytes, compressed: int) -> str:
+    if compressed:
+        payload = zlib.decompress(payload)
+    return bytes(payload).decode("utf-8")
+
+
+def create_table(conn, schema: str = "main"):
+    """Creates the enrichments table and its retention index in `schema`."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.enrichments (
+            message_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            source_hash INTEGER NOT NULL DEFAULT 0,
+            payload BLOB NOT NULL,
+            compressed INTEGER NOT NULL DEFAULT 0,
+            size INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            PRIMARY KEY (message_id, kind, source_hash)
+        ) WITHOUT ROWID;
+    """)
+    # Retention deletes oldest-first
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_enrichments_created_at ON enrichments(created_at);")
+
+
+def create_search_tables(conn, schema: str = "main"):
+    """
+    Creates the contentless FTS index over enrichment text and the table mapping
+    its rowids back to enrichment keys (see api/db/search.py).
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.enrichment_search (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- never reused, so orphaned FTS rows stay orphaned
+            message_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            source_hash INTEGER NOT NULL,
+            UNIQUE (message_id, kind, source_hash)
+        );
+    """)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.enrichments_fts USING fts5(body, content='');")
+    # Pruned or deleted enrichments drop out of search results immediately
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.enrichments_search_delete AFTER DELETE ON enrichments BEGIN
+            DELETE FROM enrichment_search
+             WHERE message_id = old.message_id AND kind = old.kind AND source_hash = old.source_hash;
+        END;
+    """)
+
+
+def index_for_search(conn, entries: Iterable[Tuple[Tuple[int, str, int], str]], schema: str = "main"):
+    """
+    Adds (key, text) pairs to the enrichment search index. A re-indexed key gets
+    a new rowid; its old FTS entry is orphaned until the next rebuild.
+    """
+    for key, text in entries:
+        conn.execute(f"DELETE FROM {schema}.enrichment_search WHERE message_id = ? AND kind = ? AND source_hash = ?", key)
+        cur = conn.execute(f"INSERT INTO {schema}.enrichment_search (message_id, kind, source_hash) VALUES (?, ?, ?)", key)
+        conn.execute(f"INSERT INTO {schema}.enrichments_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, text))
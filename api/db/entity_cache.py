@@ -0,0 +1,163 @@
+# api/db/entity_cache.py
+"""
+Bounded in-memory caches of channel, character and preset records.
+
+Every incoming Discord message looks up its channel and the channel's
+whitelisted characters, usually several times (observer, pipeline, messenger,
+generation), and then the prompt preset. These caches serve those lookups
+without touching the database.
+
+- One cache per record type and database file, shared by every `Database`
+  instance on that file (like the BotConfig snapshot).
+- Entries are evicted least-recently-used once a cache holds `max_entries`.
+- Lookups that found nothing are cached too, so unregistered channels are free.
+- Writes invalidate exactly the keys they touched through the event bus
+  (`channel.*`, `character.*` and `preset.*` topics); changes made by other processes arrive
+  the same way once `Database.watch_changes()` is running.
+- A fill is versioned: it is dropped if any invalidation happened while the
+  record was being read, so a slow read can never re-cache stale data.
+
+Records are handed out as deep copies, so callers may modify what they get.
+"""
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from api.db import events
+from api.db.events import bus
+from api.db.write_behind import MISSING
+
+# Maximum number of records kept per cache (0 disables caching).
+MAX_ENTRIES = int(os.getenv("DATABASE_ENTITY_CACHE_SIZE", "2048"))
+
+
+class EntityCache:
+    """A thread-safe LRU map of key -> record (or None for "no such record")."""
+
+    def __init__(self, name: str, max_entries: int = MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Bumped by every invalidation; fills that started before a bump are discarded.
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.stale_fills = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self) -> int:
+        """Take this before reading a record from the database, then pass it to store()."""
+        return self._version
+
+    def get(self, key: Hashable, count_miss: bool = True) -> Any:
+        """
+        Returns a copy of the cached record, None for a cached miss, or MISSING.
+        Pass count_miss=False for a peek that is followed by a real lookup on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += int(count_miss)
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key]
+        return copy.deepcopy(value)
+
+    def store(self, key: Hashable, value: Any, version: int):
+        """Caches `value` unless an invalidation happened since `version` was taken."""
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if version != self._version:
+                self.stale_fills += 1
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self.fills += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable = None):
+        """Drops one key, or everything when `key` is None."""
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "fills": self.fills,
+                "stale_fills": self.stale_fills,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class EntityCaches:
+    """The channel, character and preset caches of one database file."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.channels = EntityCache("channels", max_entries)
+        self.characters = EntityCache("characters", max_entries)
+        self.presets = EntityCache("presets", max_entries)
+
+    def for_topic(self, topic: str) -> Optional[EntityCache]:
+        return {
+            "channel": self.channels,
+            "character": self.characters,
+            "preset": self.presets,
+        }.get(topic.split(".", 1)[0])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {cache.name: cache.get_stats() for cache in (self.channels, self.characters, self.presets)}
+
+
+_caches: Dict[str, EntityCaches] = {}
+_caches_lock = threading.Lock()
+
+
+def caches_for(path: str) -> EntityCaches:
+    """Returns the caches for the database at absolute path `path`."""
+    with _caches_lock:
+        caches = _caches.get(path)
+        if caches is None:
+            caches = EntityCaches()
+            _caches[path] = caches
+        return caches
+
+
+def _on_change(event: events.ChangeEvent):
+    with _caches_lock:
+        caches = _caches.get(event.source)
+    cache = caches.for_topic(event.topic) if caches is not None else None
+    if cache is not None:
+        cache.invalidate(event.key)
+
+
+bus.subscribe("channel.*", _on_change)
+bus.subscribe("character.*", _on_change)
+bus.subscribe("preset.*", _on_change)
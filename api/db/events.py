@@ -0,0 +1,158 @@
+# api/db/events.py
+"""
+In-process change notifications for database writes.
+
+`Database` publishes a `ChangeEvent` on the process-wide `bus` after every
+committed write to characters, channels, servers, presets or config, so caches
+anywhere in the app can subscribe and invalidate exactly what changed instead
+of re-reading the database on every message.
+
+Each event is also appended to the `changes` table in the same transaction as
+the write. Other processes sharing the database file pick those rows up with
+`Database.poll_changes()` (or a `ChangeFeedWatcher`) and re-publish them on
+their own bus.
+"""
+
+import os
+import socket
+import threading
+import traceback
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# --- Topics ---
+CONFIG_CHANGED = "config.changed"
+CHARACTER_UPDATED = "character.updated"
+CHARACTER_DELETED = "character.deleted"
+CHANNEL_UPDATED = "channel.updated"
+CHANNEL_WHITELIST_CHANGED = "channel.whitelist_changed"
+CHANNEL_DELETED = "channel.deleted"
+SERVER_UPDATED = "server.updated"
+SERVER_DELETED = "server.deleted"
+PRESET_UPDATED = "preset.updated"
+PRESET_DELETED = "preset.deleted"
+
+# Identifies this process in the `changes` table, so it can skip its own rows.
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A committed change. `key` is the character/preset name, channel/server id or config key."""
+    topic: str
+    key: Optional[str]
+    source: str                      # absolute path of the database that changed
+    change_id: Optional[int] = None  # row id in the `changes` table
+    origin: str = ORIGIN
+
+    @property
+    def is_local(self) -> bool:
+        return self.origin == ORIGIN
+
+
+Subscriber = Callable[[ChangeEvent], None]
+BatchSubscriber = Callable[[List[ChangeEvent]], None]
+
+
+class EventBus:
+    """
+    A minimal synchronous pub/sub hub.
+
+    Topics are matched exactly, by prefix (`"character.*"`), or with `"*"` for
+    everything. Subscribers run in the publishing thread and must be quick and
+    thread-safe; an exception in one subscriber is logged and does not stop the
+    others.
+
+    Writes commit several events at once (a transaction, a change-feed poll) and
+    hand them to `publish_all`. Batch subscribers get those once, as a list, so
+    work that only depends on *whether* something changed runs once per commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._batch_subscribers: Dict[str, List[BatchSubscriber]] = {}
+
+    def subscribe(self, pattern: str, callback: Subscriber) -> Callable[[], None]:
+        """Registers `callback` for `pattern` and returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.setdefault(pattern, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._subscribers.get(pattern, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+        return unsubscribe
+
+    def subscribe_batch(self, pattern: str, callback: BatchSubscriber) -> Callable[[], None]:
+        """
+        Registers `callback` to get the events matching `pattern` once per publish,
+        as a list, and returns a function that unsubscribes it.
+        """
+        with self._lock:
+            self._batch_subscribers.setdefault(pattern, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._batch_subscribers.get(pattern, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+        return unsubscribe
+
+    @staticmethod
+    def _patterns(topic: str) -> List[str]:
+        return [topic, topic.split(".", 1)[0] + ".*", "*"]
+
+    def _matching(self, topic: str) -> List[Subscriber]:
+        with self._lock:
+            return [callback for pattern in self._patterns(topic) for callback in self._subscribers.get(pattern, [])]
+
+    def publish(self, event: ChangeEvent):
+        self.publish_all([event])
+
+    def publish_all(self, events: List[ChangeEvent]):
+        """Publishes events committed together, in order; batch subscribers run once, after all of them."""
+        for event in events:
+            for callback in self._matching(event.topic):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Error in change subscriber for '{event.topic}': {e}\n{traceback.format_exc()}")
+
+        with self._lock:
+            batch_subscribers = [(pattern, list(callbacks)) for pattern, callbacks in self._batch_subscribers.items() if callbacks]
+        for pattern, callbacks in batch_subscribers:
+            matching = [event for event in events if pattern in self._patterns(event.topic)]
+            if not matching:
+                continue
+            for callback in callbacks:
+                try:
+                    callback(matching)
+                except Exception as e:
+                    print(f"Error in change subscriber for '{pattern}': {e}\n{traceback.format_exc()}")
+
+
+# The process-wide bus every Database publishes to.
+bus = EventBus()
+
+
+class ChangeFeedWatcher(threading.Thread):
+    """Daemon thread that calls `poll()` every `interval` seconds until stopped."""
+
+    def __init__(self, poll: Callable[[], object], interval: float = 2.0):
+        super().__init__(name="viel-change-feed", daemon=True)
+        self._poll = poll
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._poll()
+            except Exception as e:
+                print(f"Error polling the change feed: {e}")
+
+    def stop(self):
+        self._stopped.set()
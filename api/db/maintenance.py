@@ -0,0 +1,274 @@
+# api/db/maintenance.py
+"""
+Periodic housekeeping that keeps the database file small and its queries fast.
+
+One maintenance run:
+1. flushes buffered enrichments, then applies the enrichment retention policy
+   (age and total bytes, see api/db/enrichments.py);
+2. trims the change feed;
+3. rebuilds the caption search index when pruning has orphaned enough of it;
+4. returns free pages to the filesystem with `PRAGMA incremental_vacuum`, a few
+   pages per short transaction so message handling never waits long;
+5. runs `PRAGMA optimize` and truncates the WAL.
+
+Vacuum, optimize and the size reports cover every file of the database, so the
+volatile file (VOLATILE_DATABASE_URL) is compacted on its own.
+
+`MaintenanceScheduler` does this once a day at DATABASE_MAINTENANCE_HOUR (local
+time); POST /api/admin/maintenance runs it on demand.
+
+Files created before incremental auto-vacuum was enabled only pick it up after
+one full VACUUM, which rewrites the whole file: run with `full_vacuum=True`
+once, at a quiet moment.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from api.db import enrichments
+
+# Local hour of day for the scheduled run (-1 disables the schedule).
+MAINTENANCE_HOUR = int(os.getenv("DATABASE_MAINTENANCE_HOUR", "4"))
+# Change-feed rows older than this are deleted.
+CHANGES_MAX_AGE_DAYS = float(os.getenv("DATABASE_CHANGES_MAX_AGE_DAYS", "7"))
+# incremental_vacuum frees this many pages per transaction, then pauses.
+VACUUM_STEP_PAGES = int(os.getenv("DATABASE_VACUUM_STEP_PAGES", "512"))
+VACUUM_STEP_PAUSE = float(os.getenv("DATABASE_VACUUM_STEP_PAUSE", "0.05"))
+# The caption search index is rebuilt once orphaned entries reach this share of it.
+SEARCH_REBUILD_RATIO = float(os.getenv("DATABASE_SEARCH_REBUILD_RATIO", "0.2"))
+
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class MaintenanceBusy(RuntimeError):
+    """Raised when a maintenance run is requested while another one is in progress."""
+
+
+_running = threading.Lock()
+_last_report: Optional[Dict[str, Any]] = None
+
+
+def last_report() -> Optional[Dict[str, Any]]:
+    """The report of the most recent maintenance run in this process, if any."""
+    return _last_report
+
+
+# ------------------------------------------------------
+# Size reporting
+# ------------------------------------------------------
+
+def file_sizes(db) -> Dict[str, Dict[str, int]]:
+    """Bytes on disk of each database file and its WAL."""
+    sizes = {}
+    for label, path, _ in db.database_files():
+        sizes[label] = {}
+        for suffix, part in (("", "database"), ("-wal", "wal")):
+            try:
+                sizes[label][part] = os.path.getsize(path + suffix)
+            except OSError:
+                sizes[label][part] = 0
+    return sizes
+
+
+def _total_bytes(sizes: Dict[str, Dict[str, int]]) -> int:
+    return sum(sum(parts.values()) for parts in sizes.values())
+
+
+def page_stats(db) -> Dict[str, Dict[str, Any]]:
+    """Page size, page count, free pages and auto-vacuum mode of each file."""
+    stats = {}
+    for label, _, conn in db.database_files():
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        stats[label] = {
+            "page_size": page_size,
+            "page_count": page_count,
+            "free_pages": freelist,
+            "free_bytes": freelist * page_size,
+            "auto_vacuum": _AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        }
+    return stats
+
+
+def table_sizes(db) -> List[Dict[str, Any]]:
+    """
+    Bytes used by each table (including its indexes), largest first, from the
+    `dbstat` virtual table (empty if SQLite was built without it).
+    """
+    tables = []
+    for label, _, conn in db.database_files():
+        try:
+            rows = conn.execute("""
+                SELECT COALESCE(m.tbl_name, s.name) AS table_name,
+                       SUM(CASE WHEN m.type = 'index' THEN 0 ELSE s.pgsize END) AS table_bytes,
+                       SUM(CASE WHEN m.type = 'index' THEN s.pgsize ELSE 0 END) AS index_bytes,
+                       SUM(CASE WHEN m.type != 'index' AND s.pagetype = 'leaf' THEN s.ncell ELSE 0 END) AS leaf_cells
+                  FROM dbstat AS s LEFT JOIN sqlite_master AS m ON m.name = s.name
+                 GROUP BY table_name
+            """).fetchall()
+        except sqlite3.OperationalError:
+            continue
+        tables += [{
+            "file": label,
+            "table": row["table_name"],
+            "bytes": row["table_bytes"] + row["index_bytes"],
+            "table_bytes": row["table_bytes"],
+            "index_bytes": row["index_bytes"],
+            "approx_rows": row["leaf_cells"],
+        } for row in rows]
+    tables.sort(key=lambda t: t["bytes"], reverse=True)
+    return tables
+
+
+def get_stats(db) -> Dict[str, Any]:
+    """Everything the admin dashboard shows about storage."""
+    return {
+        "files": file_sizes(db),
+        "pages": page_stats(db),
+        "tables": table_sizes(db),
+        "enrichments": db.get_enrichment_stats(),
+        "last_maintenance": _last_report,
+    }
+
+
+# ------------------------------------------------------
+# Maintenance steps
+# ------------------------------------------------------
+
+def _orphaned_search_ratio(db) -> float:
+    """Share of caption search entries whose enrichment no longer exists."""
+    with db._volatile_connection() as conn:
+        indexed = conn.execute("SELECT COUNT(*) FROM enrichments_fts_docsize").fetchone()[0]
+        mapped = conn.execute("SELECT COUNT(*) FROM enrichment_search").fetchone()[0]
+    return (indexed - mapped) / indexed if indexed else 0.0
+
+
+def incremental_vacuum(conn: sqlite3.Connection, max_pages: Optional[int] = None) -> int:
+    """
+    Returns free pages to the filesystem in steps of VACUUM_STEP_PAGES, pausing
+    between steps so other writers get the lock. Returns the number of pages freed.
+    Does nothing unless the file uses incremental auto-vacuum.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    while max_pages is None or freed < max_pages:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            break
+        step = min(free, VACUUM_STEP_PAGES, (max_pages - freed) if max_pages is not None else free)
+        # executescript steps the pragma to completion (execute() would free a single page)
+        conn.executescript(f"PRAGMA incremental_vacuum({step});")
+        freed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(VACUUM_STEP_PAUSE)
+    return freed
+
+
+def full_vacuum(conn: sqlite3.Connection):
+    """Rewrites the whole file (switching it to incremental auto-vacuum). Blocks writers while it runs."""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.executescript("VACUUM;")
+
+
+def run_maintenance(db, vacuum: bool = True, full: bool = False) -> Dict[str, Any]:
+    """
+    Runs every maintenance step on `db` and returns a report. Raises
+    MaintenanceBusy if a run is already in progress in this process.
+    """
+    global _last_report
+    if not _running.acquire(blocking=False):
+        raise MaintenanceBusy("Database maintenance is already running")
+    try:
+        started = time.monotonic()
+        before = file_sizes(db)
+        report: Dict[str, Any] = {"started_at": datetime.now().isoformat(timespec="seconds")}
+
+        db.flush()
+        report["enrichments_pruned"] = db.prune_enrichments(enrichments.MAX_AGE_DAYS, enrichments.MAX_BYTES)
+        report["changes_pruned"] = db.prune_changes(CHANGES_MAX_AGE_DAYS)
+
+        ratio = _orphaned_search_ratio(db)
+        report["search_reindexed"] = db.rebuild_enrichment_search() if ratio >= SEARCH_REBUILD_RATIO else 0
+
+        report["full_vacuum"] = full
+        report["pages_freed"] = {}
+        for label, _, conn in db.database_files():
+            if full:
+                full_vacuum(conn)
+            elif vacuum:
+                report["pages_freed"][label] = incremental_vacuum(conn)
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        report["bytes_before"] = before
+        report["bytes_after"] = file_sizes(db)
+        report["seconds"] = round(time.monotonic() - started, 3)
+        _last_report = report
+        reclaimed = _total_bytes(before) - _total_bytes(report["bytes_after"])
+        print(f"Database maintenance finished in {report['seconds']}s, reclaimed {reclaimed} bytes")
+        return report
+    finally:
+        _running.release()
+
+
+# ------------------------------------------------------
+# Scheduling
+# ------------------------------------------------------
+
+def seconds_until(hour: int, now: Optional[datetime] = None) -> float:
+    """Seconds from `now` until the next time the local clock reads `hour`:00."""
+    now = now or datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class MaintenanceScheduler(threading.Thread):
+    """Daemon thread that runs maintenance once a day at `hour` until stopped."""
+
+    def __init__(self, db, hour: int = MAINTENANCE_HOUR):
+        super().__init__(name="viel-db-maintenance", daemon=True)
+        self._db = db
+        self._hour = hour
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(seconds_until(self._hour)):
+            try:
+                run_maintenance(self._db)
+            except MaintenanceBusy:
+                pass
+            except Exception as e:
+                print(f"Error during scheduled database maintenance: {e}\n{traceback.format_exc()}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+_scheduler: Optional[MaintenanceScheduler] = None
+
+
+def start_scheduler(db) -> Optional[MaintenanceScheduler]:
+    """Starts (once) the daily maintenance thread, unless DATABASE_MAINTENANCE_HOUR is -1."""
+    global _scheduler
+    if MAINTENANCE_HOUR < 0:
+        return None
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = MaintenanceScheduler(db)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_scheduler():
+    if _scheduler is not None:
+        _scheduler.stop()
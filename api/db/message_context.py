@@ -0,0 +1,49 @@
+# api/db/message_context.py
+"""
+Everything the pipeline reads from the database to answer one Discord message,
+loaded together by `Database.load_message_context()`.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from api.models.models import BotConfig
+
+DEFAULT_PRESET_NAME = "Default"
+
+
+@dataclass(frozen=True)
+class MessageContext:
+    """
+    An immutable snapshot of the channel, its whitelisted characters, the default
+    character, the prompt preset and the config, as they were when the message
+    was picked up. Records have the same shape as `get_channel()`,
+    `get_character()` and `get_preset()` return.
+    """
+    channel_id: str
+    author: Optional[str]
+    config: BotConfig
+    channel: Optional[Dict[str, Any]]         # None if the channel is not registered
+    characters: Tuple[Dict[str, Any], ...]    # whitelisted characters with triggers, in whitelist order
+    default_character: Optional[Dict[str, Any]]
+    preset: Optional[Dict[str, Any]]          # the Default preset, None if it was never created
+
+    @property
+    def whitelist(self) -> Tuple[str, ...]:
+        if not self.channel:
+            return ()
+        return tuple(self.channel.get("data", {}).get("whitelist") or [])
+
+    @property
+    def dm_allowed(self) -> bool:
+        """Whether `author` (a Discord username) may talk to the bot in DMs."""
+        return self.author in (self.config.dm_list or [])
+
+    def character(self, name: str) -> Optional[Dict[str, Any]]:
+        """The whitelisted (or default) character called `name`, if loaded."""
+        for record in self.characters:
+            if record["name"] == name:
+                return record
+        if self.default_character and self.default_character["name"] == name:
+            return self.default_character
+        return None
@@ -0,0 +1,400 @@
+# api/db/migrations.py
+"""
+Versioned schema migrations for the bot's SQLite database.
+
+Each migration has a unique, increasing version number and is applied at most
+once per database file; applied versions are recorded in the `schema_version`
+table. Migrations must be idempotent (use IF NOT EXISTS and friends) so that a
+database created by older releases, which never had a `schema_version` table,
+upgrades cleanly.
+
+To change the schema, append a new migration at the bottom of this file.
+Never edit a migration that has already shipped.
+
+The optional volatile database (VOLATILE_DATABASE_URL, see api/db/database.py)
+has its own track, VOLATILE_MIGRATIONS, with its own version numbers.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+from api.db import archive, enrichments
+
+MigrationFunc = Callable[[sqlite3.Connection], None]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: MigrationFunc
+
+
+MIGRATIONS: List[Migration] = []
+VOLATILE_MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, track: List[Migration] = MIGRATIONS):
+    """Decorator registering a function as the migration for `version` of `track`."""
+    def register(func: MigrationFunc) -> MigrationFunc:
+        if any(m.version == version for m in track):
+            raise ValueError(f"Duplicate migration version {version}")
+        track.append(Migration(version, name, func))
+        track.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+# ------------------------------------------------------
+# Migrations
+# ------------------------------------------------------
+
+@migration(1, "initial schema")
+def _initial_schema(conn: sqlite3.Connection):
+    # Config
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value JSON NOT NULL
+        );
+    """)
+    # Captions
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS captions (
+            message_id TEXT PRIMARY KEY,
+            caption TEXT NOT NULL
+        );
+    """)
+    # Servers
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS servers (
+            server_id TEXT PRIMARY KEY,
+            server_name TEXT NOT NULL,
+            description TEXT,
+            instruction TEXT
+        );
+    """)
+    # Channels
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id TEXT PRIMARY KEY,
+            server_id TEXT NOT NULL,
+            server_name TEXT NOT NULL,
+            data JSON NOT NULL,
+            FOREIGN KEY (server_id) REFERENCES servers(server_id) ON DELETE CASCADE
+        );
+    """)
+    # Characters
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            data JSON NOT NULL
+        );
+    """)
+    # Character Triggers
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS character_triggers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            character_id INTEGER NOT NULL,
+            trigger TEXT NOT NULL,
+            FOREIGN KEY (character_id) REFERENCES characters(id) ON DELETE CASCADE
+        );
+    """)
+    # Presets
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS presets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            prompt_template TEXT
+        );
+    """)
+
+
+@migration(2, "indexes for trigger and channel lookups")
+def _lookup_indexes(conn: sqlite3.Connection):
+    # Trigger lookups (and the ON DELETE CASCADE from characters) filter by character_id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_character_triggers_character_id ON character_triggers(character_id);")
+    # list_channels_for_server and the ON DELETE CASCADE from servers filter by server_id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_channels_server_id ON channels(server_id);")
+
+
+@migration(3, "change feed")
+def _change_feed(conn: sqlite3.Connection):
+    # One row per committed change, read by other processes (see api/db/events.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            key TEXT,
+            origin TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+@migration(4, "typed enrichment store")
+def _enrichment_store(conn: sqlite3.Connection):
+    # Replaces the flat `captions` table: integer message ids, one row per kind and
+    # source, compressed payloads. Existing captions are carried over.
+    enrichments.create_table(conn)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'captions'").fetchone():
+        return
+    now = int(time.time())
+    rows = []
+    for row in conn.execute("SELECT message_id, caption FROM captions"):
+        message_id, caption = row[0], row[1]
+        if not str(message_id).isdigit() or not caption:
+            continue
+        kind = enrichments.LINK if caption.startswith("<site_content>") else enrichments.IMAGE
+        payload, compressed, size = enrichments.encode_payload(caption)
+        rows.append((int(message_id), kind, payload, compressed, size, now))
+    conn.executemany("""
+        INSERT OR REPLACE INTO enrichments (message_id, kind, source_hash, payload, compressed, size, created_at)
+        VALUES (?, ?, 0, ?, ?, ?, ?)
+    """, rows)
+    conn.execute("DROP TABLE captions")
+
+
+@migration(5, "indexes for paginated listings")
+def _listing_indexes(conn: sqlite3.Connection):
+    # GET /api/servers pages by (server_name, server_id)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_servers_name ON servers(server_name, server_id);")
+    # GET /api/servers/{id}/channels pages by channel name within a server; the
+    # expression must stay identical to _CHANNEL_NAME in database.py
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_channels_server_name
+        ON channels(server_id, COALESCE(json_extract(data, '$.name'), ''), channel_id);
+    """)
+
+
+# The columns of characters_fts, pulled out of the character JSON. The delete
+# triggers must produce exactly what was indexed, so they reuse these expressions.
+# Examples are indexed as their JSON array text: the tokenizer skips the brackets
+# and quotes, and FTS5 cannot read an external-content view that uses json_each.
+_CHARACTER_SEARCH_COLUMNS = """
+    COALESCE(json_extract({data}, '$.persona'), ''),
+    COALESCE(json_extract({data}, '$.info'), ''),
+    COALESCE(json_extract({data}, '$.instructions'), ''),
+    COALESCE(json_extract({data}, '$.examples'), '')
+"""
+
+
+@migration(6, "full-text search")
+def _full_text_search(conn: sqlite3.Connection):
+    # --- Characters: external content read through a view ---
+    conn.execute(f"""
+        CREATE VIEW IF NOT EXISTS character_search_source (id, name, persona, info, instructions, examples) AS
+        SELECT id, name, {_CHARACTER_SEARCH_COLUMNS.format(data="data")} FROM characters;
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS characters_fts USING fts5(
+            name, persona, info, instructions, examples,
+            content='character_search_source', content_rowid='id'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS characters_fts_insert AFTER INSERT ON characters BEGIN
+            INSERT INTO characters_fts (rowid, name, persona, info, instructions, examples)
+            SELECT id, name, persona, info, instructions, examples FROM character_search_source WHERE id = new.id;
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS characters_fts_delete AFTER DELETE ON characters BEGIN
+            INSERT INTO characters_fts (characters_fts, rowid, name, persona, info, instructions, examples)
+            VALUES ('delete', old.id, old.name, {_CHARACTER_SEARCH_COLUMNS.format(data="old.data")});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS characters_fts_update AFTER UPDATE ON characters BEGIN
+            INSERT INTO characters_fts (characters_fts, rowid, name, persona, info, instructions, examples)
+            VALUES ('delete', old.id, old.name, {_CHARACTER_SEARCH_COLUMNS.format(data="old.data")});
+            INSERT INTO characters_fts (rowid, name, persona, info, instructions, examples)
+            SELECT id, name, persona, info, instructions, examples FROM character_search_source WHERE id = new.id;
+        END;
+    """)
+    conn.execute("INSERT INTO characters_fts (characters_fts) VALUES ('rebuild');")
+
+    # --- Presets: external content on the table itself ---
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS presets_fts USING fts5(
+            name, description, prompt_template,
+            content='presets', content_rowid='id'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS presets_fts_insert AFTER INSERT ON presets BEGIN
+            INSERT INTO presets_fts (rowid, name, description, prompt_template)
+            VALUES (new.id, new.name, new.description, new.prompt_template);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS presets_fts_delete AFTER DELETE ON presets BEGIN
+            INSERT INTO presets_fts (presets_fts, rowid, name, description, prompt_template)
+            VALUES ('delete', old.id, old.name, old.description, old.prompt_template);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS presets_fts_update AFTER UPDATE ON presets BEGIN
+            INSERT INTO presets_fts (presets_fts, rowid, name, description, prompt_template)
+            VALUES ('delete', old.id, old.name, old.description, old.prompt_template);
+            INSERT INTO presets_fts (rowid, name, description, prompt_template)
+            VALUES (new.id, new.name, new.description, new.prompt_template);
+        END;
+    """)
+    conn.execute("INSERT INTO presets_fts (presets_fts) VALUES ('rebuild');")
+
+    # --- Enrichments: contentless, indexed from Python (payloads are compressed) ---
+    enrichments.create_search_tables(conn)
+    rows = conn.execute("SELECT message_id, kind, source_hash, payload, compressed FROM enrichments").fetchall()
+    enrichments.index_for_search(conn, [
+        ((row[0], row[1], row[2]), enrichments.decode_payload(row[3], row[4])) for row in rows
+    ])
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set:
+    # table_xinfo (unlike table_info) also lists generated columns
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+
+@migration(7, "normalized channel attributes")
+def _channel_attributes(conn: sqlite3.Connection):
+    # `channels.data` stays the source of truth (ActiveChannel reads and writes it);
+    # these are indexed projections of it, maintained by SQLite itself.
+
+    # --- System-channel flag as an indexed generated column ---
+    if "is_system_channel" not in _column_names(conn, "channels"):
+        conn.execute("""
+            ALTER TABLE channels ADD COLUMN is_system_channel INTEGER
+            GENERATED ALWAYS AS (COALESCE(json_extract(data, '$.is_system_channel'), 0)) VIRTUAL;
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_channels_is_system_channel ON channels(is_system_channel);")
+
+    # --- Whitelist as a join table ---
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_whitelist (
+            channel_id TEXT NOT NULL,
+            character_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (channel_id, character_name),
+            FOREIGN KEY (channel_id) REFERENCES channels(channel_id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_channel_whitelist_character ON channel_whitelist(character_name);")
+    for event in ("INSERT", "UPDATE OF data"):
+        name = "channel_whitelist_sync_" + event.split()[0].lower()
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON channels BEGIN
+                DELETE FROM channel_whitelist WHERE channel_id = new.channel_id;
+                INSERT OR IGNORE INTO channel_whitelist (channel_id, character_name, position)
+                SELECT new.channel_id, value, key FROM json_each(new.data, '$.whitelist') WHERE type = 'text';
+            END;
+        """)
+    conn.execute("DELETE FROM channel_whitelist;")
+    conn.execute("""
+        INSERT OR IGNORE INTO channel_whitelist (channel_id, character_name, position)
+        SELECT c.channel_id, w.value, w.key FROM channels AS c, json_each(c.data, '$.whitelist') AS w
+         WHERE w.type = 'text';
+    """)
+
+    # --- Character renames and deletes cascade into channel whitelists ---
+    # (The channel update then refreshes channel_whitelist through the trigger above.)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS characters_rename_whitelist AFTER UPDATE OF name ON characters
+        WHEN old.name != new.name BEGIN
+            UPDATE channels SET data = json_set(data, '$.whitelist', json((
+                SELECT json_group_array(CASE WHEN value = old.name THEN new.name ELSE value END)
+                  FROM json_each(channels.data, '$.whitelist')
+            )))
+             WHERE channel_id IN (SELECT channel_id FROM channel_whitelist WHERE character_name = old.name);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS characters_delete_whitelist AFTER DELETE ON characters BEGIN
+            UPDATE channels SET data = json_set(data, '$.whitelist', json((
+                SELECT json_group_array(value) FROM json_each(channels.data, '$.whitelist') WHERE value != old.name
+            )))
+             WHERE channel_id IN (SELECT channel_id FROM channel_whitelist WHERE character_name = old.name);
+        END;
+    """)
+
+
+@migration(8, "message archive")
+def _message_archive(conn: sqlite3.Connection):
+    # Archived Discord messages, with a full-text index (see api/db/archive.py).
+    # Kept in the main file: unlike enrichments it cannot be regenerated.
+    archive.create_tables(conn)
+
+
+# ------------------------------------------------------
+# Volatile database migrations
+# ------------------------------------------------------
+
+@migration(1, "enrichment store", track=VOLATILE_MIGRATIONS)
+def _volatile_enrichments(conn: sqlite3.Connection):
+    enrichments.create_table(conn)
+    enrichments.create_search_tables(conn)
+
+
+# ------------------------------------------------------
+# Runner
+# ------------------------------------------------------
+
+_migrated_paths = set()
+_migrated_lock = threading.Lock()
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Returns the highest applied migration version (0 for a fresh database)."""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """
+    Applies every pending migration, each in its own IMMEDIATE transaction.
+    Safe to run from several processes at once: the version is re-checked
+    after the write lock is taken. Returns the versions that were applied.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.commit()
+
+    applied = []
+    for m in migrations:
+        if m.version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if m.version <= current_version(conn):
+                conn.rollback() # Another process got here first
+                continue
+            m.apply(conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (m.version, m.name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {m.version}: {m.name}")
+        applied.append(m.version)
+    return applied
+
+
+def migrate_once(path: str, conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> None:
+    """Runs apply_migrations for `path` the first time it is called in this process."""
+    key = os.path.abspath(path)
+    with _migrated_lock:
+        if key in _migrated_paths:
+            return
+        apply_migrations(conn, migrations)
+        _migrated_paths.add(key)
@@ -0,0 +1,207 @@
+# api/db/pool.py
+"""
+Connection pooling for the bot's SQLite database.
+
+Every thread (the Discord bot thread, the FastAPI event loop, the FastAPI
+threadpool workers) gets one long-lived connection per database file instead of
+opening a fresh connection for every query. Connections start in WAL mode with
+tuned pragmas, keep their prepared-statement cache warm, and retry on
+SQLITE_BUSY while counting how often they had to wait for a lock.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+
+# --- Tunables (overridable through the environment) ---
+JOURNAL_MODE = os.getenv("DATABASE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")
+BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", "250"))
+CACHE_SIZE_KIB = int(os.getenv("DATABASE_CACHE_SIZE_KIB", "16384"))       # 16 MiB page cache per connection
+MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(64 * 1024 * 1024)))   # 64 MiB memory-mapped I/O
+STATEMENT_CACHE_SIZE = int(os.getenv("DATABASE_STATEMENT_CACHE", "256"))
+# Only takes effect on a new file (or after a full VACUUM); lets maintenance
+# hand free pages back to the filesystem with incremental_vacuum.
+AUTO_VACUUM = os.getenv("DATABASE_AUTO_VACUUM", "INCREMENTAL")
+
+# How long a statement keeps retrying on SQLITE_BUSY before giving up.
+# Each attempt already waits up to BUSY_TIMEOUT_MS inside SQLite itself.
+MAX_BUSY_WAIT_SECONDS = float(os.getenv("DATABASE_MAX_BUSY_WAIT", "10"))
+
+
+@dataclass
+class PoolStats:
+    """Counters describing how the pooled connections have behaved so far."""
+    connections_opened: int = 0
+    connections_closed: int = 0
+    statements: int = 0
+    lock_waits: int = 0          # statements that hit SQLITE_BUSY at least once
+    busy_retries: int = 0        # individual retry attempts after SQLITE_BUSY
+    busy_failures: int = 0       # statements that gave up after MAX_BUSY_WAIT_SECONDS
+    lock_wait_seconds: float = 0.0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, **deltas: Any):
+        with self._lock:
+            for key, delta in deltas.items():
+                setattr(self, key, getattr(self, key) + delta)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = asdict(self)
+        data["lock_wait_seconds"] = round(data["lock_wait_seconds"], 4)
+        return data
+
+
+def _is_busy_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _run_with_retry(stats: PoolStats, func, *args):
+    """Runs a sqlite3 call, retrying with backoff while the database is busy."""
+    stats.add(statements=1)
+    started = None
+    delay = 0.005
+    while True:
+        try:
+            result = func(*args)
+            if started is not None:
+                stats.add(lock_wait_seconds=time.monotonic() - started)
+            return result
+        except sqlite3.OperationalError as e:
+            if not _is_busy_error(e):
+                raise
+            now = time.monotonic()
+            if started is None:
+                started = now
+                stats.add(lock_waits=1)
+            if now - started >= MAX_BUSY_WAIT_SECONDS:
+                stats.add(busy_failures=1, lock_wait_seconds=now - started)
+                raise
+            stats.add(busy_retries=1)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+class PooledCursor(sqlite3.Cursor):
+    """Cursor whose execute calls retry on SQLITE_BUSY and feed the pool stats."""
+
+    def execute(self, sql, parameters=()):
+        return _run_with_retry(self.connection.stats, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _run_with_retry(self.connection.stats, super().executemany, sql, seq_of_parameters)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A long-lived connection that retries on SQLITE_BUSY and counts lock waits.
+
+    While `unit_depth` is non-zero (inside Database.transaction()), commit() and
+    the `with conn:` exit are no-ops, so helper methods that commit their own
+    work join the surrounding unit of work instead of ending it early.
+    """
+    stats: PoolStats
+    unit_depth: int = 0
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.unit_depth:
+            return False # The unit of work commits or rolls back as a whole
+        return super().__exit__(exc_type, exc_value, traceback)
+
+    def cursor(self, factory=PooledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return _run_with_retry(self.stats, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return _run_with_retry(self.stats, super().executemany, sql, seq_of_parameters)
+
+    def commit(self):
+        if self.unit_depth:
+            return
+        return _run_with_retry(self.stats, super().commit)
+
+
+class ConnectionPool:
+    """
+    Hands out one persistent connection per thread for a single database file.
+
+    sqlite3 connections are not meant to be shared between threads while in use,
+    so rather than a checkout/return pool each thread keeps its own connection
+    for its whole lifetime. `close_all()` closes every connection the pool has
+    ever handed out (used on shutdown).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = PoolStats()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[PooledConnection] = []
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.path,
+            factory=PooledConnection,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            # Each connection is still only used by the thread that opened it;
+            # this only allows close_all() to close it from another thread.
+            check_same_thread=False,
+            # Writes take the write lock up front, so a reader that later wants to
+            # write can never deadlock against another writer in WAL mode.
+            isolation_level="IMMEDIATE",
+        )
+        conn.stats = self.stats
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+        conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM};") # Must precede the first write to a new file
+        conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE};")
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS};")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB};")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        conn.execute("PRAGMA foreign_keys = ON;") # Ensure foreign key constraints are enforced
+        return conn
+
+    def get(self) -> PooledConnection:
+        """Returns the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+            self.stats.add(connections_opened=1)
+        return conn
+
+    def close(self):
+        """Closes the calling thread's connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+        self.stats.add(connections_closed=1)
+
+    def close_all(self):
+        """Closes every connection handed out by this pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+                self.stats.add(connections_closed=1)
+            except sqlite3.ProgrammingError:
+                pass
+        self._local = threading.local()
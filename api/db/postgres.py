@@ -0,0 +1,1020 @@
+# api/db/postgres.py
+"""
+PostgreSQL storage backend, for running several bot and API replicas against
+one shared datastore. Selected by `get_database()` when DATABASE_URL is a
+postgres:// or postgresql:// URL; needs asyncpg (`pip install viel-ai[postgres]`).
+
+`PostgresDatabase` implements the same `Storage` interface as the SQLite
+`Database`, so routers, the bot, `AsyncDatabase` and the entity caches work
+unchanged:
+- The asyncpg pool lives on a private event loop thread; the synchronous
+  methods submit their queries to it and wait. Callers on an event loop keep
+  going through `AsyncDatabase`, exactly as with SQLite.
+- JSON columns are JSONB; the whitelist is queried with `@>` through a GIN index
+  instead of SQLite's `channel_whitelist` table, and character renames and
+  deletes rewrite the whitelists in the same transaction.
+- Every write appends to the same `changes` feed. Ids are handed out before
+  commit, so a later id can become visible first; each row therefore also
+  records its transaction id, and replicas poll by transaction id, only up to
+  the oldest transaction still running. Everything below that watermark has
+  committed or rolled back for good, so no change is skipped, and writers never
+  wait on each other to append.
+- Full-text search uses tsvector expression indexes; enrichments keep their
+  compressed payload plus a tsvector of the text, archived messages a generated
+  tsvector column.
+
+Maintenance, backups, bulk import and the volatile file are SQLite-only: on
+PostgreSQL those are the server's job (autovacuum, pg_dump, COPY).
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import asyncpg
+except ImportError: # Optional dependency, only needed for postgres:// URLs
+    asyncpg = None
+
+from api.db import archive, enrichments, events, search
+from api.db.database import decode_cursor, encode_cursor, _prefix_upper_bound
+from api.db.entity_cache import caches_for
+from api.db.events import ORIGIN, ChangeEvent, ChangeFeedWatcher, bus
+from api.db.storage import StorageBase
+from api.db.write_behind import MISSING, WriteBehindBuffer
+
+POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+WRITE_BEHIND_ENABLED = os.getenv("DATABASE_WRITE_BEHIND", "1").lower() not in ("0", "false", "no")
+
+# Advisory lock key (arbitrary, but fixed across replicas)
+_MIGRATION_LOCK = 0x7669656C01
+
+_TS_CONFIG = "simple"
+
+_CHARACTER_SELECT = """
+    SELECT c.id, c.name, c.data,
+           COALESCE((SELECT array_agg(t.trigger ORDER BY t.id)
+                       FROM character_triggers AS t WHERE t.character_id = c.id), '{}') AS triggers
+      FROM characters AS c
+"""
+
+_CHARACTER_SUMMARY_SELECT = """
+    SELECT name,
+           COALESCE(data->>'avatar', '') AS avatar,
+           COALESCE(data->>'info', '') AS info
+      FROM characters
+"""
+
+_CHANNEL_COLUMNS = "channel_id, server_id, server_name, data"
+_CHANNEL_NAME = "(COALESCE(data->>'name', '') COLLATE \"C\")"
+_IS_SYSTEM_CHANNEL = "data->>'is_system_channel' IN ('true', '1')"
+
+# Search documents; the same expressions back the GIN indexes, so they must match exactly.
+_CHARACTER_DOCUMENT = f"""(
+    setweight(to_tsvector('{_TS_CONFIG}', name), 'A') ||
+    setweight(to_tsvector('{_TS_CONFIG}', COALESCE(data->>'persona', '')), 'B') ||
+    to_tsvector('{_TS_CONFIG}', COALESCE(data->>'info', '') || ' ' || COALESCE(data->>'instructions', '')
+                                || ' ' || COALESCE(data->>'examples', ''))
+)"""
+_PRESET_DOCUMENT = f"""(
+    setweight(to_tsvector('{_TS_CONFIG}', name), 'A') ||
+    setweight(to_tsvector('{_TS_CONFIG}', COALESCE(description, '')), 'B') ||
+    to_tsvector('{_TS_CONFIG}', COALESCE(prompt_template, ''))
+)"""
+_HEADLINE_OPTIONS = (
+    f"StartSel={search.HIGHLIGHT_START}, StopSel={search.HIGHLIGHT_END}, "
+    f"MaxWords={search.SNIPPET_TOKENS}, MinWords={search.SNIPPET_TOKENS // 2}"
+)
+
+# Channel whitelists follow character renames and deletes (SQLite does this with triggers).
+_RENAME_IN_WHITELISTS = """
+    UPDATE channels SET data = jsonb_set(data, '{whitelist}', (
+        SELECT COALESCE(jsonb_agg(CASE WHEN w.value = $1 THEN $2::text ELSE w.value END ORDER BY w.position), '[]'::jsonb)
+          FROM jsonb_array_elements_text(data->'whitelist') WITH ORDINALITY AS w(value, position)
+    ))
+     WHERE data->'whitelist' @> jsonb_build_array($1::text)
+    RETURNING channel_id
+"""
+_REMOVE_FROM_WHITELISTS = """
+    UPDATE channels SET data = jsonb_set(data, '{whitelist}', (
+        SELECT COALESCE(jsonb_agg(w.value ORDER BY w.position), '[]'::jsonb)
+          FROM jsonb_array_elements_text(data->'whitelist') WITH ORDINALITY AS w(value, position)
+         WHERE w.value <> $1
+    ))
+     WHERE data->'whitelist' @> jsonb_build_array($1::text)
+    RETURNING channel_id
+"""
+
+# (version, name, statements). Append only; never edit a migration that has shipped.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "initial schema", [
+        """CREATE TABLE IF NOT EXISTS config (
+               key TEXT PRIMARY KEY,
+               value JSONB NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS servers (
+               server_id TEXT PRIMARY KEY,
+               server_name TEXT NOT NULL,
+               description TEXT,
+               instruction TEXT
+           )""",
+        'CREATE INDEX IF NOT EXISTS idx_servers_name ON servers ((server_name COLLATE "C"), server_id)',
+        """CREATE TABLE IF NOT EXISTS channels (
+               channel_id TEXT PRIMARY KEY,
+               server_id TEXT NOT NULL REFERENCES servers(server_id) ON DELETE CASCADE,
+               server_name TEXT NOT NULL,
+               data JSONB NOT NULL
+           )""",
+        f"CREATE INDEX IF NOT EXISTS idx_channels_server_name ON channels (server_id, {_CHANNEL_NAME}, channel_id)",
+        f"CREATE INDEX IF NOT EXISTS idx_channels_is_system_channel ON channels (channel_id) WHERE {_IS_SYSTEM_CHANNEL}",
+        "CREATE INDEX IF NOT EXISTS idx_channels_whitelist ON channels USING GIN ((data->'whitelist'))",
+        """CREATE TABLE IF NOT EXISTS characters (
+               id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+               name TEXT UNIQUE NOT NULL,
+               data JSONB NOT NULL
+           )""",
+        'CREATE INDEX IF NOT EXISTS idx_characters_name ON characters ((name COLLATE "C"))',
+        f"CREATE INDEX IF NOT EXISTS idx_characters_search ON characters USING GIN ({_CHARACTER_DOCUMENT})",
+        """CREATE TABLE IF NOT EXISTS character_triggers (
+               id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+               character_id BIGINT NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+               trigger TEXT NOT NULL
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_character_triggers_character_id ON character_triggers(character_id)",
+        """CREATE TABLE IF NOT EXISTS presets (
+               id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+               name TEXT UNIQUE NOT NULL,
+               description TEXT,
+               prompt_template TEXT
+           )""",
+        f"CREATE INDEX IF NOT EXISTS idx_presets_search ON presets USING GIN ({_PRESET_DOCUMENT})",
+        """CREATE TABLE IF NOT EXISTS changes (
+               id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+               topic TEXT NOT NULL,
+               key TEXT,
+               origin TEXT NOT NULL,
+               created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_changes_created_at ON changes(created_at)",
+        """CREATE TABLE IF NOT EXISTS enrichments (
+               message_id BIGINT NOT NULL,
+               kind TEXT NOT NULL,
+               source_hash BIGINT NOT NULL DEFAULT 0,
+               payload BYTEA NOT NULL,
+               compressed SMALLINT NOT NULL DEFAULT 0,
+               size INTEGER NOT NULL,
+               created_at BIGINT NOT NULL,
+               body TSVECTOR,
+               PRIMARY KEY (message_id, kind, source_hash)
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_enrichments_created_at ON enrichments(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_enrichments_body ON enrichments USING GIN (body)",
+    ]),
+    (2, "message archive", [
+        f"""CREATE TABLE IF NOT EXISTS messages (
+               message_id BIGINT PRIMARY KEY,
+               channel_id BIGINT NOT NULL,
+               guild_id BIGINT,
+               author_id BIGINT NOT NULL,
+               author_name TEXT NOT NULL,
+               is_bot SMALLINT NOT NULL DEFAULT 0,
+               content TEXT NOT NULL,
+               attachments TEXT,
+               reply_to BIGINT,
+               created_at BIGINT NOT NULL,
+               edited_at BIGINT,
+               body TSVECTOR GENERATED ALWAYS AS (
+                   setweight(to_tsvector('{_TS_CONFIG}', author_name), 'A') || to_tsvector('{_TS_CONFIG}', content)
+               ) STORED
+           )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel_id, message_id)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_body ON messages USING GIN (body)",
+    ]),
+    (3, "change feed transaction ids", [
+        # The writing transaction's id, filled in by the default (see poll_changes)
+        "ALTER TABLE changes ADD COLUMN IF NOT EXISTS xid BIGINT NOT NULL DEFAULT (pg_current_xact_id()::text::bigint)",
+        "CREATE INDEX IF NOT EXISTS idx_changes_xid ON changes(xid, id)",
+    ]),
+]
+
+# Transaction ids below this are finished: committed or rolled back, never in flight.
+_FEED_WATERMARK = "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+def redact_url(url: str) -> str:
+    """The URL without credentials, used as the cache key and in log lines."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    port = f":{parts.port}" if parts.port else ""
+    return f"{parts.scheme}://{host}{port}{parts.path}"
+
+
+def tsquery(text: str) -> Optional[str]:
+    """
+    Turns free text into a safe to_tsquery() expression: every word is a quoted
+    lexeme and all must match; a trailing `*` keeps prefix matching (the
+    counterpart of search.fts_query). None when there is nothing to search for.
+    """
+    terms = []
+    for raw in text.split():
+        words = search.query_words(raw)
+        terms += [f"'{word}'" for word in words]
+        if raw.endswith("*") and words:
+            terms[-1] += ":*"
+    return " & ".join(terms) or None
+
+
+def _rowcount(status: str) -> int:
+    """Rows affected, from an asyncpg command status such as 'DELETE 3'."""
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (ValueError, AttributeError):
+        return 0
+
+
+async def _init_connection(conn):
+    # JSONB in and out as Python objects
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class PostgresDatabase(StorageBase):
+    """A class to manage all CRUD operations for the bot's PostgreSQL database."""
+
+    def __init__(self, url: str, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 write_behind: bool = WRITE_BEHIND_ENABLED):
+        """Connects the pool (on its own event loop thread) and brings the schema up to date."""
+        if asyncpg is None:
+            raise RuntimeError("The PostgreSQL backend needs asyncpg: pip install 'viel-ai[postgres]'")
+        self.url = url
+        self._cache_key = redact_url(url)
+        self._local = threading.local()
+        self._entities = caches_for(self._cache_key)
+        self._feed_lock = threading.Lock()
+        self._feed_watcher: Optional[ChangeFeedWatcher] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="viel-postgres", daemon=True)
+        self._loop_thread.start()
+        self._pool = self._run(self._create_pool(min_size, max_size))
+        self._run(self._migrate())
+        # (xid, id) of the last change read; starts at the current watermark
+        self._feed_cursor = (self._fetchval(_FEED_WATERMARK), 0)
+
+        self._last_enrichment_prune = time.monotonic()
+        self._enrichment_buffer = WriteBehindBuffer("enrichments", self._flush_enrichments) if write_behind else None
+        self._message_buffer = WriteBehindBuffer("messages", self._flush_messages) if write_behind else None
+        print(f"Connected to PostgreSQL at {self._cache_key}")
+
+    # ------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------
+    def _run(self, awaitable):
+        """Awaits `awaitable` on the pool's event loop and returns its result."""
+        async def wait():
+            return await awaitable
+        return asyncio.run_coroutine_threadsafe(wait(), self._loop).result()
+
+    async def _create_pool(self, min_size: int, max_size: int):
+        # Created on the loop thread, so the pool is bound to that loop
+        return await asyncpg.create_pool(self.url, min_size=min_size, max_size=max_size, init=_init_connection)
+
+    def _target(self, conn):
+        # Inside transaction() every query shares the unit's connection
+        if conn is None:
+            conn = getattr(self._local, "unit_conn", None)
+        return self._pool if conn is None else conn
+
+    def _fetch(self, sql: str, *args, conn=None) -> List[Any]:
+        return self._run(self._target(conn).fetch(sql, *args))
+
+    def _fetchrow(self, sql: str, *args, conn=None) -> Optional[Any]:
+        return self._run(self._target(conn).fetchrow(sql, *args))
+
+    def _fetchval(self, sql: str, *args, conn=None) -> Any:
+        return self._run(self._target(conn).fetchval(sql, *args))
+
+    def _execute(self, sql: str, *args, conn=None) -> int:
+        """Runs a statement and returns the number of rows it affected."""
+        return _rowcount(self._run(self._target(conn).execute(sql, *args)))
+
+    def _executemany(self, sql: str, rows: List[Tuple], conn=None):
+        self._run(self._target(conn).executemany(sql, rows))
+
+    @contextmanager
+    def _acquire(self, **options):
+        """A pooled connection in a transaction that commits on exit, or rolls back if the block raises."""
+        conn = self._run(self._pool.acquire())
+        try:
+            tx = conn.transaction(**options)
+            self._run(tx.start())
+            try:
+                yield conn
+            except BaseException:
+                self._run(tx.rollback())
+                raise
+            self._run(tx.commit())
+        finally:
+            self._run(self._pool.release(conn))
+
+    def _in_unit(self) -> bool:
+        return getattr(self._local, "unit_conn", None) is not None
+
+    @contextmanager
+    def _read_snapshot(self):
+        unit = getattr(self._local, "unit_conn", None)
+        if unit is not None:
+            yield unit
+            return
+        with self._acquire(isolation="repeatable_read", readonly=True) as conn:
+            yield conn
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Returns connection counters for the asyncpg pool."""
+        stats = {
+            "backend": "postgres",
+            "size": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+        }
+        if self._enrichment_buffer is not None:
+            stats["enrichment_buffer"] = self._enrichment_buffer.get_stats()
+        if self._message_buffer is not None:
+            stats["message_buffer"] = self._message_buffer.get_stats()
+        return stats
+
+    def flush(self):
+        """Writes any buffered enrichments and archived messages now."""
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.flush()
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+
+    def close(self):
+        """Flushes buffered writes, closes the pool and stops its event loop (call on shutdown)."""
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.close()
+        if self._message_buffer is not None:
+            self._message_buffer.close()
+        self._run(self._pool.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _migrate(self):
+        """Applies pending MIGRATIONS in one transaction; replicas starting together wait on an advisory lock."""
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", _MIGRATION_LOCK)
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """)
+                current = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                for version, name, statements in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    for statement in statements:
+                        await conn.execute(statement)
+                    await conn.execute("INSERT INTO schema_version (version, name) VALUES ($1, $2)", version, name)
+                    print(f"Applied PostgreSQL migration {version}: {name}")
+
+    # ------------------------------------------------------
+    # Change notifications
+    # ------------------------------------------------------
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: `with db.transaction() as tx:` runs every write made through
+        `tx` (or this database, on the same thread) in one transaction that commits
+        once on exit, or rolls back entirely if the block raises. Change events are
+        published after the commit. Nested calls join the outer unit.
+        """
+        if self._in_unit():
+            yield self
+            return
+        self._local.pending_events = []
+        try:
+            with self._acquire() as conn:
+                self._local.unit_conn = conn
+                try:
+                    yield self
+                finally:
+                    self._local.unit_conn = None
+        except BaseException:
+            self._local.pending_events = []
+            raise
+        self._publish_pending()
+
+    @contextmanager
+    def _write(self):
+        """
+        Connection for a write, in its own transaction unless inside transaction().
+        Changes recorded with _record_change are published after the commit.
+        """
+        unit = getattr(self._local, "unit_conn", None)
+        if unit is not None:
+            yield unit
+            return
+        self._local.pending_events = []
+        try:
+            with self._acquire() as conn:
+                yield conn
+        except BaseException:
+            self._local.pending_events = []
+            raise
+        self._publish_pending()
+
+    def _publish_pending(self):
+        pending, self._local.pending_events = self._local.pending_events, []
+        bus.publish_all(pending)
+
+    def _record_change(self, conn, topic: str, key: Optional[str] = None):
+        """Appends a change to the feed; only valid inside a `with self._write()` block."""
+        change_id = self._fetchval("INSERT INTO changes (topic, key, origin) VALUES ($1, $2, $3) RETURNING id",
+                                   topic, key, ORIGIN, conn=conn)
+        self._local.pending_events.append(ChangeEvent(topic, key, self._cache_key, change_id))
+
+    def latest_change_id(self) -> int:
+        """Returns the id of the newest row in the change feed (0 if empty)."""
+        return self._fetchval("SELECT COALESCE(MAX(id), 0) FROM changes")
+
+    def list_changes(self, after_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Reads the change feed in id order, for display. Ids are not commit order
+        here, so a row may still appear below `after_id`; poll_changes() follows
+        the feed without gaps.
+        """
+        rows = self._fetch("""
+            SELECT id, topic, key, origin, to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS') AS created_at
+              FROM changes WHERE id > $1 ORDER BY id LIMIT $2
+        """, after_id, limit)
+        return [dict(row) for row in rows]
+
+    def _read_changes(self, cursor: Tuple[int, int]) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+        """
+        Changes of finished transactions after `cursor`, the (xid, id) of the last
+        one read. Transactions below the watermark can no longer add rows, so once
+        a page comes back short, the cursor jumps to the watermark.
+        """
+        watermark = max(self._fetchval(_FEED_WATERMARK), cursor[0])
+        rows = self._fetch("""
+            SELECT id, topic, key, origin, xid FROM changes
+             WHERE (xid, id) > ($1, $2) AND xid < $3
+             ORDER BY xid, id LIMIT 1000
+        """, cursor[0], cursor[1], watermark)
+        if len(rows) == 1000:
+            return [dict(row) for row in rows], (rows[-1]["xid"], rows[-1]["id"])
+        return [dict(row) for row in rows], (watermark, 0)
+
+    def prune_changes(self, max_age_days: float) -> int:
+        """Deletes change-feed rows older than `max_age_days`."""
+        return self._execute("DELETE FROM changes WHERE created_at < now() - make_interval(secs => $1)",
+                             max_age_days * 86400)
+
+    # ------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------
+    def _page(self, select: str, order: List[Tuple[str, str]], where: Optional[List[str]] = None, params: Optional[List[Any]] = None,
+              limit: Optional[int] = None, cursor: Optional[str] = None,
+              prefix: Optional[str] = None, prefix_expr: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Keyset pagination, as Database._page (with $n placeholders in `where`)."""
+        where = list(where or [])
+        params = list(params or [])
+
+        def placeholder(value: Any) -> str:
+            params.append(value)
+            return f"${len(params)}"
+
+        if cursor:
+            values = decode_cursor(cursor, len(order))
+            where.append(f"({', '.join(expr for expr, _ in order)}) > ({', '.join(placeholder(v) for v in values)})")
+        if prefix:
+            where.append(f"{prefix_expr} >= {placeholder(prefix)} AND {prefix_expr} < {placeholder(_prefix_upper_bound(prefix))}")
+        sql = select
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(expr for expr, _ in order)
+        if limit is not None:
+            sql += f" LIMIT {placeholder(limit + 1)}" # One extra row tells us whether there is a next page
+        rows = [dict(row) for row in self._fetch(sql, *params)]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][column] for _, column in order])
+        return rows, next_cursor
+
+    def _update_record(self, conn, table_name: str, identifier_col: str, identifier_val: Any, **kwargs) -> int:
+        """Generic helper to update any record in any table. Returns the number of rows changed."""
+        if not kwargs:
+            return 0
+        if isinstance(kwargs.get("data"), str):
+            kwargs["data"] = json.loads(kwargs["data"]) # JSONB columns take Python objects
+        fields = ", ".join(f"{key} = ${i}" for i, key in enumerate(kwargs, start=1))
+        query = f"UPDATE {table_name} SET {fields} WHERE {identifier_col} = ${len(kwargs) + 1}"
+        return self._execute(query, *kwargs.values(), identifier_val, conn=conn)
+
+    # ------------------------------------------------------
+    # Config (Key-Value Store)
+    # ------------------------------------------------------
+    def set_config(self, key: str, value: Any):
+        """Create or update a configuration key-value pair."""
+        with self._write() as conn:
+            row = self._fetchrow("SELECT value FROM config WHERE key = $1 FOR UPDATE", key, conn=conn)
+            if row and type(row["value"]) is type(value) and row["value"] == value:
+                return # Unchanged, keep the cached snapshot
+            self._execute("""
+                INSERT INTO config (key, value) VALUES ($1, $2)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            """, key, value, conn=conn)
+            self._record_change(conn, events.CONFIG_CHANGED, key)
+
+    def get_config(self, key: str) -> Optional[Any]:
+        """Read a configuration value by its key."""
+        return self._fetchval("SELECT value FROM config WHERE key = $1", key)
+
+    def list_configs(self) -> Dict[str, Any]:
+        """List all configuration key-value pairs."""
+        return {row["key"]: row["value"] for row in self._fetch("SELECT key, value FROM config")}
+
+    def delete_config(self, key: str):
+        """Delete a configuration key."""
+        with self._write() as conn:
+            if self._execute("DELETE FROM config WHERE key = $1", key, conn=conn):
+                self._record_change(conn, events.CONFIG_CHANGED, key)
+
+    # ------------------------------------------------------
+    # Servers
+    # ------------------------------------------------------
+    def create_server(self, server_id: str, server_name: str, description: Optional[str] = None, instruction: Optional[str] = None):
+        """Create a new server record."""
+        with self._write() as conn:
+            self._execute("INSERT INTO servers (server_id, server_name, description, instruction) VALUES ($1, $2, $3, $4)",
+                          server_id, server_name, description, instruction, conn=conn)
+            self._record_change(conn, events.SERVER_UPDATED, server_id)
+
+    def get_server(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Read a server's data by its ID."""
+        row = self._fetchrow("SELECT * FROM servers WHERE server_id = $1", server_id)
+        return dict(row) if row else None
+
+    def update_server(self, server_id: str, **kwargs):
+        """Update a server's data (e.g., server_name, description)."""
+        with self._write() as conn:
+            if self._update_record(conn, "servers", "server_id", server_id, **kwargs):
+                self._record_change(conn, events.SERVER_UPDATED, server_id)
+
+    def delete_server(self, server_id: str):
+        """Delete a server and its associated channels."""
+        with self._write() as conn:
+            channel_ids = [row["channel_id"] for row in self._fetch("SELECT channel_id FROM channels WHERE server_id = $1", server_id, conn=conn)]
+            if self._execute("DELETE FROM servers WHERE server_id = $1", server_id, conn=conn):
+                self._record_change(conn, events.SERVER_DELETED, server_id)
+                # The channels went with it through ON DELETE CASCADE
+                for channel_id in channel_ids:
+                    self._record_change(conn, events.CHANNEL_DELETED, channel_id)
+
+    def list_servers(self) -> List[Dict[str, Any]]:
+        """List all servers."""
+        return [dict(row) for row in self._fetch("SELECT * FROM servers")]
+
+    def page_servers(self, limit: Optional[int] = None, cursor: Optional[str] = None, prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Servers ordered by name, one page at a time; `prefix` filters on server_name."""
+        name = '(server_name COLLATE "C")'
+        return self._page(
+            "SELECT server_id, server_name, description, instruction FROM servers",
+            [(name, "server_name"), ("server_id", "server_id")],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr=name
+        )
+
+    # ------------------------------------------------------
+    # Channels
+    # ------------------------------------------------------
+    def create_channel(self, channel_id: str, server_id: str, server_name: str, data: Dict[str, Any]):
+        """Create a new channel record."""
+        with self._write() as conn:
+            self._execute("INSERT INTO channels (channel_id, server_id, server_name, data) VALUES ($1, $2, $3, $4)",
+                          channel_id, server_id, server_name, data, conn=conn)
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            if data.get("whitelist"):
+                self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
+
+    def _read_channel(self, channel_id: str, conn=None) -> Optional[Dict[str, Any]]:
+        row = self._fetchrow(f"SELECT {_CHANNEL_COLUMNS} FROM channels WHERE channel_id = $1", channel_id, conn=conn)
+        return dict(row) if row else None
+
+    def update_channel(self, channel_id: str, **kwargs):
+        """Update a channel's data (e.g., server_name, data)."""
+        with self._write() as conn:
+            old = self._fetchval("SELECT data FROM channels WHERE channel_id = $1 FOR UPDATE", channel_id, conn=conn)
+            if not self._update_record(conn, "channels", "channel_id", channel_id, **kwargs):
+                return
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            if "data" in kwargs:
+                new_data = kwargs["data"]
+                if isinstance(new_data, str):
+                    new_data = json.loads(new_data)
+                if (old.get("whitelist") or []) != ((new_data or {}).get("whitelist") or []):
+                    self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
+
+    def delete_channel(self, channel_id: str):
+        """Delete a channel record."""
+        with self._write() as conn:
+            if self._execute("DELETE FROM channels WHERE channel_id = $1", channel_id, conn=conn):
+                self._record_change(conn, events.CHANNEL_DELETED, channel_id)
+
+    def list_channels(self) -> List[Dict[str, Any]]:
+        """List all channels across all servers."""
+        return [dict(row) for row in self._fetch(f"SELECT {_CHANNEL_COLUMNS} FROM channels")]
+
+    def list_channels_for_server(self, server_id: str) -> List[Dict[str, Any]]:
+        """List all channels for a specific server by its ID."""
+        return [dict(row) for row in self._fetch(f"SELECT {_CHANNEL_COLUMNS} FROM channels WHERE server_id = $1", server_id)]
+
+    def find_system_channel_id(self) -> Optional[str]:
+        """Returns the ID of the channel flagged as the system channel (partial-index lookup)."""
+        return self._fetchval(f"SELECT channel_id FROM channels WHERE {_IS_SYSTEM_CHANNEL} LIMIT 1")
+
+    def list_channels_whitelisting(self, character_name: str) -> List[str]:
+        """Returns the IDs of every channel whose whitelist contains `character_name`."""
+        rows = self._fetch(
+            "SELECT channel_id FROM channels WHERE data->'whitelist' @> jsonb_build_array($1::text) ORDER BY channel_id",
+            character_name
+        )
+        return [row["channel_id"] for row in rows]
+
+    def page_channels_for_server(self, server_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """A server's channels ordered by channel name, one page at a time; `prefix` filters on the name."""
+        rows, next_cursor = self._page(
+            f"SELECT {_CHANNEL_COLUMNS}, {_CHANNEL_NAME} AS sort_name FROM channels",
+            [(_CHANNEL_NAME, "sort_name"), ("channel_id", "channel_id")],
+            where=["server_id = $1"], params=[server_id],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr=_CHANNEL_NAME
+        )
+        for row in rows:
+            del row["sort_name"]
+        return rows, next_cursor
+
+    # ------------------------------------------------------
+    # Characters & Triggers
+    # ------------------------------------------------------
+    def create_character(self, name: str, data: Dict[str, Any], triggers: Optional[List[str]] = None) -> int:
+        """Create a new character and optionally add its trigger words."""
+        with self._write() as conn:
+            char_id = self._fetchval("INSERT INTO characters (name, data) VALUES ($1, $2) RETURNING id", name, data, conn=conn)
+            if triggers:
+                self._executemany("INSERT INTO character_triggers (character_id, trigger) VALUES ($1, $2)",
+                                  [(char_id, trigger) for trigger in triggers], conn=conn)
+            self._record_change(conn, events.CHARACTER_UPDATED, name)
+            return char_id
+
+    def _read_character(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._fetchrow(f"{_CHARACTER_SELECT} WHERE c.name = $1", name)
+        return self._character_from_row(row) if row else None
+
+    def _read_characters(self, names: List[str], conn=None) -> Dict[str, Dict[str, Any]]:
+        if not names:
+            return {}
+        rows = self._fetch(f"{_CHARACTER_SELECT} WHERE c.name = ANY($1::text[])", names, conn=conn)
+        return {row["name"]: self._character_from_row(row) for row in rows}
+
+    def update_character(self, name: str, **kwargs):
+        """Update a character's data (e.g., data)."""
+        with self._write() as conn:
+            if self._update_record(conn, "characters", "name", name, **kwargs):
+                self._record_change(conn, events.CHARACTER_UPDATED, name)
+
+    def rename_character(self, name: str, new_name: str):
+        """Rename a character; channel whitelists naming it are updated too."""
+        with self._write() as conn:
+            if self._execute("UPDATE characters SET name = $1 WHERE name = $2", new_name, name, conn=conn):
+                self._record_change(conn, events.CHARACTER_DELETED, name)
+                self._record_change(conn, events.CHARACTER_UPDATED, new_name)
+                affected = self._fetch(_RENAME_IN_WHITELISTS, name, new_name, conn=conn)
+                self._record_whitelist_changes(conn, [row["channel_id"] for row in affected])
+
+    def delete_character(self, name: str):
+        """Delete a character and its associated triggers (and remove it from channel whitelists)."""
+        with self._write() as conn:
+            if self._execute("DELETE FROM characters WHERE name = $1", name, conn=conn):
+                self._record_change(conn, events.CHARACTER_DELETED, name)
+                affected = self._fetch(_REMOVE_FROM_WHITELISTS, name, conn=conn)
+                self._record_whitelist_changes(conn, [row["channel_id"] for row in affected])
+
+    def _record_whitelist_changes(self, conn, channel_ids: List[str]):
+        for channel_id in channel_ids:
+            self._record_change(conn, events.CHANNEL_UPDATED, channel_id)
+            self._record_change(conn, events.CHANNEL_WHITELIST_CHANGED, channel_id)
+
+    def list_characters(self) -> List[Dict[str, Any]]:
+        """List all characters with their data and triggers."""
+        return [self._character_from_row(row) for row in self._fetch(_CHARACTER_SELECT)]
+
+    def page_character_summaries(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Name, avatar and info of characters ordered by name, one page at a time."""
+        name = '(name COLLATE "C")'
+        return self._page(
+            _CHARACTER_SUMMARY_SELECT, [(name, "name")],
+            limit=limit, cursor=cursor, prefix=prefix, prefix_expr=name
+        )
+
+    def _character_from_row(self, row) -> Dict[str, Any]:
+        """Builds a character dict from a row produced by _CHARACTER_SELECT."""
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "data": row["data"],
+            "triggers": list(row["triggers"]),
+        }
+
+    def update_character_triggers(self, character_id: int, triggers: List[str]):
+        """Replaces all triggers for a given character."""
+        with self._write() as conn:
+            self._execute("DELETE FROM character_triggers WHERE character_id = $1", character_id, conn=conn)
+            if triggers:
+                self._executemany("INSERT INTO character_triggers (character_id, trigger) VALUES ($1, $2)",
+                                  [(character_id, trigger) for trigger in triggers], conn=conn)
+            name = self._fetchval("SELECT name FROM characters WHERE id = $1", character_id, conn=conn)
+            if name:
+                self._record_change(conn, events.CHARACTER_UPDATED, name)
+
+    # ------------------------------------------------------
+    # Presets
+    # ------------------------------------------------------
+    def create_preset(self, name: str, description: str, prompt_template: str) -> int:
+        """Create a new preset."""
+        with self._write() as conn:
+            preset_id = self._fetchval("INSERT INTO presets (name, description, prompt_template) VALUES ($1, $2, $3) RETURNING id",
+                                       name, description, prompt_template, conn=conn)
+            self._record_change(conn, events.PRESET_UPDATED, name)
+            return preset_id
+
+    def _read_preset(self, name: str, conn=None) -> Optional[Dict[str, Any]]:
+        row = self._fetchrow("SELECT * FROM presets WHERE name = $1", name, conn=conn)
+        return dict(row) if row else None
+
+    def update_preset(self, name: str, **kwargs):
+        """Update a preset's data (e.g., description, prompt_template)."""
+        with self._write() as conn:
+            if self._update_record(conn, "presets", "name", name, **kwargs):
+                self._record_change(conn, events.PRESET_UPDATED, kwargs.get("name", name))
+
+    def delete_preset(self, name: str):
+        """Delete a preset by its name."""
+        with self._write() as conn:
+            if self._execute("DELETE FROM presets WHERE name = $1", name, conn=conn):
+                self._record_change(conn, events.PRESET_DELETED, name)
+
+    def list_presets(self) -> List[Dict[str, Any]]:
+        """List all available presets."""
+        return [dict(row) for row in self._fetch("SELECT * FROM presets")]
+
+    # ------------------------------------------------------
+    # Full-text search
+    # ------------------------------------------------------
+    def search(self, text: str, types: Optional[List[str]] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Ranked full-text search over characters, presets and captions, with the same
+        hit shape as Database.search(); lower rank is better (negated ts_rank_cd).
+        """
+        query = tsquery(text)
+        if not query:
+            return []
+        types = types or list(search.SEARCH_TYPES)
+        hits = []
+        if "character" in types:
+            rows = self._fetch(f"""
+                SELECT name AS key, name AS title,
+                       ts_headline('{_TS_CONFIG}', COALESCE(data->>'persona', '') || ' ' || COALESCE(data->>'info', ''), q, $3) AS snippet,
+                       -ts_rank_cd({_CHARACTER_DOCUMENT}, q) AS rank
+                  FROM characters, to_tsquery('{_TS_CONFIG}', $1) AS q
+                 WHERE {_CHARACTER_DOCUMENT} @@ q ORDER BY rank LIMIT $2
+            """, query, limit, _HEADLINE_OPTIONS)
+            hits += [{"type": "character", **dict(row)} for row in rows]
+        if "preset" in types:
+            rows = self._fetch(f"""
+                SELECT name AS key, name AS title,
+                       ts_headline('{_TS_CONFIG}', COALESCE(description, '') || ' ' || COALESCE(prompt_template, ''), q, $3) AS snippet,
+                       -ts_rank_cd({_PRESET_DOCUMENT}, q) AS rank
+                  FROM presets, to_tsquery('{_TS_CONFIG}', $1) AS q
+                 WHERE {_PRESET_DOCUMENT} @@ q ORDER BY rank LIMIT $2
+            """, query, limit, _HEADLINE_OPTIONS)
+            hits += [{"type": "preset", **dict(row)} for row in rows]
+        if "caption" in types:
+            rows = self._fetch(f"""
+                SELECT message_id, kind, payload, compressed, -ts_rank_cd(body, q) AS rank
+                  FROM enrichments, to_tsquery('{_TS_CONFIG}', $1) AS q
+                 WHERE body @@ q ORDER BY rank LIMIT $2
+            """, query, limit)
+            words = search.query_words(text)
+            hits += [{
+                "type": "caption",
+                "key": str(row["message_id"]),
+                "title": row["kind"],
+                "snippet": search.make_snippet(enrichments.decode_payload(row["payload"], row["compressed"]), words),
+                "rank": row["rank"],
+            } for row in rows]
+        hits.sort(key=lambda hit: hit["rank"])
+        return hits[:limit]
+
+    # ------------------------------------------------------
+    # Enrichments (image captions, link content)
+    # ------------------------------------------------------
+    def get_enrichment(self, message_id: int, kind: str, source: Optional[str] = None) -> Optional[str]:
+        """Read the enrichment of `kind` for a message (see Database.get_enrichment)."""
+        message_id = int(message_id)
+        key_hash = enrichments.source_hash(source)
+        for candidate in dict.fromkeys((key_hash, 0)):
+            if self._enrichment_buffer is not None:
+                pending = self._enrichment_buffer.get((message_id, kind, candidate))
+                if pending is not MISSING:
+                    if pending:
+                        return pending[0]
+                    continue # Deleted, not yet flushed
+            row = self._fetchrow(
+                "SELECT payload, compressed FROM enrichments WHERE message_id = $1 AND kind = $2 AND source_hash = $3",
+                message_id, kind, candidate
+            )
+            if row:
+                return enrichments.decode_payload(row["payload"], row["compressed"])
+        return None
+
+    def set_enrichment(self, message_id: int, kind: str, text: str, source: Optional[str] = None):
+        """Create or update an enrichment (written behind, in batches)."""
+        key = (int(message_id), kind, enrichments.source_hash(source))
+        value = (text, int(time.time()))
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.put(key, value)
+            return
+        self._flush_enrichments([(key, value)], [])
+
+    def delete_enrichment(self, message_id: int, kind: str, source: Optional[str] = None):
+        """Delete one enrichment."""
+        key = (int(message_id), kind, enrichments.source_hash(source))
+        if self._enrichment_buffer is not None:
+            self._enrichment_buffer.delete(key)
+            return
+        self._flush_enrichments([], [key])
+
+    def _flush_enrichments(self, upserts: List[Tuple[Tuple[int, str, int], Tuple[str, int]]], deletes: List[Tuple[int, str, int]]):
+        """Writes a batch of enrichment changes in one transaction."""
+        rows = []
+        for (message_id, kind, key_hash), (text, created_at) in upserts:
+            payload, compressed, size = enrichments.encode_payload(text)
+            rows.append((message_id, kind, key_hash, payload, compressed, size, created_at, text))
+        with self._acquire() as conn:
+            if rows:
+                self._executemany(f"""
+                    INSERT INTO enrichments (message_id, kind, source_hash, payload, compressed, size, created_at, body)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, to_tsvector('{_TS_CONFIG}', $8))
+                    ON CONFLICT (message_id, kind, source_hash) DO UPDATE
+                       SET payload = excluded.payload, compressed = excluded.compressed, size = excluded.size,
+                           created_at = excluded.created_at, body = excluded.body
+                """, rows, conn=conn)
+            if deletes:
+                self._executemany("DELETE FROM enrichments WHERE message_id = $1 AND kind = $2 AND source_hash = $3", deletes, conn=conn)
+        self._maybe_prune_enrichments()
+
+    def _maybe_prune_enrichments(self):
+        """Applies the retention policy at most once per PRUNE_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if now - self._last_enrichment_prune < enrichments.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_enrichment_prune = now
+        self.prune_enrichments()
+
+    def prune_enrichments(self, max_age_days: float = enrichments.MAX_AGE_DAYS, max_bytes: int = enrichments.MAX_BYTES) -> Dict[str, int]:
+        """
+        Deletes enrichments older than `max_age_days`, then the oldest ones until the
+        stored payloads fit in `max_bytes`. Returns how many rows each rule removed.
+        """
+        cutoff = int(time.time() - max_age_days * 86400)
+        with self._acquire() as conn:
+            expired = self._execute("DELETE FROM enrichments WHERE created_at < $1", cutoff, conn=conn)
+            over_budget = self._execute("""
+                DELETE FROM enrichments WHERE (message_id, kind, source_hash) IN (
+                    SELECT message_id, kind, source_hash FROM (
+                        SELECT message_id, kind, source_hash,
+                               SUM(octet_length(payload)) OVER (ORDER BY created_at DESC, message_id DESC
+                                                                ROWS UNBOUNDED PRECEDING) AS running_bytes
+                          FROM enrichments
+                    ) AS ranked WHERE running_bytes > $1
+                )
+            """, max_bytes, conn=conn)
+        if expired or over_budget:
+            print(f"Pruned enrichments: {expired} expired, {over_budget} over the size budget")
+        return {"expired": expired, "over_budget": over_budget}
+
+    def get_enrichment_stats(self) -> Dict[str, Any]:
+        """Row counts and stored/uncompressed bytes per kind."""
+        rows = self._fetch("""
+            SELECT kind, COUNT(*) AS count, SUM(octet_length(payload)) AS stored_bytes, SUM(size) AS raw_bytes
+              FROM enrichments GROUP BY kind
+        """)
+        return {row["kind"]: {"count": row["count"], "stored_bytes": row["stored_bytes"], "raw_bytes": row["raw_bytes"]} for row in rows}
+
+    def rebuild_enrichment_search(self) -> int:
+        """Nothing to rebuild: each row carries its own tsvector. Returns 0."""
+        return 0
+
+    # ------------------------------------------------------
+    # Message archive
+    # ------------------------------------------------------
+    def archive_message(self, record: Dict[str, Any]):
+        """Store (or, for an edit, replace) a message record (written behind, in batches)."""
+        row = archive.to_row(record)
+        if self._message_buffer is not None:
+            self._message_buffer.put(row[0], row)
+            return
+        self._flush_messages([(row[0], row)], [])
+
+    def delete_archived_messages(self, message_ids: List[int]):
+        """Remove deleted messages from the archive."""
+        message_ids = [int(message_id) for message_id in message_ids]
+        if self._message_buffer is not None:
+            for message_id in message_ids:
+                self._message_buffer.delete(message_id)
+            return
+        self._flush_messages([], message_ids)
+
+    def _flush_messages(self, upserts: List[Tuple[int, Tuple]], deletes: List[int]):
+        """Writes a batch of archive changes in one transaction."""
+        columns = ", ".join(archive.COLUMNS)
+        values = ", ".join(f"${i}" for i in range(1, len(archive.COLUMNS) + 1))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in archive.COLUMNS[1:])
+        with self._acquire() as conn:
+            if upserts:
+                self._executemany(f"""
+                    INSERT INTO messages ({columns}) VALUES ({values})
+                    ON CONFLICT (message_id) DO UPDATE SET {updates}
+                """, [row for _, row in upserts], conn=conn)
+            if deletes:
+                self._execute("DELETE FROM messages WHERE message_id = ANY($1::bigint[])", deletes, conn=conn)
+
+    def get_archived_message(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """One archived message, or None."""
+        message_id = int(message_id)
+        if self._message_buffer is not None:
+            pending = self._message_buffer.get(message_id)
+            if pending is not MISSING:
+                return archive.from_row(pending) if pending else None
+        row = self._fetchrow(f"SELECT {', '.join(archive.COLUMNS)} FROM messages WHERE message_id = $1", message_id)
+        return archive.from_row(tuple(row)) if row else None
+
+    def get_archived_messages(self, channel_id: int, limit: int = archive.DEFAULT_LIMIT,
+                              before: Optional[int] = None, after: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` messages of a channel, oldest first (see Database.get_archived_messages)."""
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+        where, params = ["channel_id = $1"], [int(channel_id)]
+        if before is not None:
+            params.append(int(before))
+            where.append(f"message_id < ${len(params)}")
+        if after is not None:
+            params.append(int(after))
+            where.append(f"message_id > ${len(params)}")
+        direction = "ASC" if after is not None and before is None else "DESC"
+        rows = self._fetch(f"""
+            SELECT {', '.join(archive.COLUMNS)} FROM messages
+             WHERE {' AND '.join(where)} ORDER BY message_id {direction} LIMIT ${len(params) + 1}
+        """, *params, limit)
+        records = [archive.from_row(tuple(row)) for row in rows]
+        return records if direction == "ASC" else records[::-1]
+
+    def search_messages(self, text: str, channel_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ranked full-text search over archived messages, optionally within one channel."""
+        query = tsquery(text)
+        if not query:
+            return []
+        if self._message_buffer is not None:
+            self._message_buffer.flush()
+        where, params = ["body @@ q"], [query, limit, _HEADLINE_OPTIONS]
+        if channel_id is not None:
+            params.append(int(channel_id))
+            where.append(f"channel_id = ${len(params)}")
+        rows = self._fetch(f"""
+            SELECT {', '.join(archive.COLUMNS)},
+                   ts_headline('{_TS_CONFIG}', content, q, $3) AS snippet,
+                   -ts_rank_cd(body, q) AS rank
+              FROM messages, to_tsquery('{_TS_CONFIG}', $1) AS q
+             WHERE {' AND '.join(where)} ORDER BY rank LIMIT $2
+        """, *params)
+        return [{**archive.from_row(tuple(row)[:len(archive.COLUMNS)]), "snippet": row["snippet"], "rank": row["rank"]} for row in rows]
+
+    def get_archive_stats(self) -> Dict[str, Any]:
+        """Archived message count, channel count and time span."""
+        row = self._fetchrow("""
+            SELECT COUNT(*) AS messages, COUNT(DISTINCT channel_id) AS channels,
+                   MIN(created_at) AS oldest, MAX(created_at) AS newest
+              FROM messages
+        """)
+        return dict(row)
@@ -0,0 +1,77 @@
+# api/db/search.py
+"""
+Full-text search helpers (SQLite FTS5).
+
+Three indexes back `Database.search()`:
+- characters_fts: external-content index over the `character_search_source`
+  view (name, persona, info, instructions, examples pulled out of the JSON).
+- presets_fts: external-content index over `presets`.
+- enrichments_fts: contentless index over caption and link text. Payloads are
+  stored compressed, so the text is indexed from Python when enrichments are
+  written; `enrichment_search` maps FTS rowids back to enrichment keys, and
+  entries whose enrichment is gone are skipped by the join and dropped by
+  `Database.rebuild_enrichment_search()`.
+
+The character and preset indexes are kept in sync by triggers (migration 6).
+"""
+
+import re
+from typing import List, Optional
+
+SEARCH_TYPES = ("character", "preset", "caption")
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+ELLIPSIS = "…"
+SNIPPET_TOKENS = 12
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turns free text into a safe FTS5 MATCH expression: every word becomes a quoted
+    term (so operators and punctuation in user input are never interpreted) and all
+    terms must match. A trailing `*` on a word keeps prefix matching.
+    Returns None when there is nothing to search for.
+    """
+    terms = []
+    for raw in text.split():
+        prefix = raw.endswith("*")
+        for word in _TOKEN.findall(raw):
+            terms.append(f'"{word}"')
+        if prefix and terms:
+            terms[-1] += "*"
+    return " ".join(terms) or None
+
+
+def query_words(text: str) -> List[str]:
+    return [word.lower() for word in _TOKEN.findall(text)]
+
+
+def make_snippet(text: str, words: List[str], tokens: int = SNIPPET_TOKENS) -> str:
+    """
+    Python counterpart of FTS5's snippet() for the contentless caption index:
+    a window of roughly `tokens` words around the first match, matches highlighted.
+    """
+    matches = list(_TOKEN.finditer(text))
+    if not matches:
+        return text[:200]
+    hit = next((i for i, m in enumerate(matches) if any(m.group().lower().startswith(w) for w in words)), 0)
+    first = max(0, hit - tokens // 2)
+    last = min(len(matches), first + tokens) - 1
+    pieces = []
+    position = matches[first].start()
+    for m in matches[first:last + 1]:
+        pieces.append(text[position:m.start()])
+        if any(m.group().lower().startswith(w) for w in words):
+            pieces.append(f"{HIGHLIGHT_START}{m.group()}{HIGHLIGHT_END}")
+        else:
+            pieces.append(m.group())
+        position = m.end()
+    snippet = "".join(pieces).strip()
+    if first > 0:
+        snippet = ELLIPSIS + snippet
+    if last < len(matches) - 1:
+        snippet += ELLIPSIS
+    return snippet
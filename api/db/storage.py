@@ -0,0 +1,462 @@
+# api/db/storage.py
+"""
+The storage interface the routers, the bot and the plugins program against.
+
+Two backends implement it:
+- `api.db.database.Database`: SQLite, the default. One file (plus an optional
+  volatile file) per deployment; maintenance, backups and bulk import work on it.
+- `api.db.postgres.PostgresDatabase`: PostgreSQL through an asyncpg pool, for
+  running several bot and API replicas against one shared datastore. Selected
+  by pointing DATABASE_URL at a `postgres://` / `postgresql://` URL (needs the
+  `postgres` extra: `pip install viel-ai[postgres]`).
+
+`get_database()` picks the backend from the URL. Both publish the same
+`ChangeEvent`s and write the same `changes` feed, so caches, the change-feed
+watcher and `AsyncDatabase` work unchanged on either.
+
+`StorageBase` holds what the backends share: the BotConfig snapshot, the
+entity-cache reads of the message hot path, change-feed polling and the caption
+shortcuts. A backend supplies the queries underneath.
+"""
+
+import threading
+import traceback
+import weakref
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Protocol, Tuple, runtime_checkable
+
+from api.db import enrichments, events
+from api.db.events import ORIGIN, ChangeEvent, ChangeFeedWatcher, bus
+from api.db.message_context import DEFAULT_PRESET_NAME, MessageContext
+from api.db.write_behind import MISSING
+from api.models.models import BotConfig
+
+POSTGRES_SCHEMES = ("postgres://", "postgresql://")
+
+
+def is_postgres_url(url: str) -> bool:
+    return url.startswith(POSTGRES_SCHEMES)
+
+
+@runtime_checkable
+class Storage(Protocol):
+    """Everything outside api/db may call on a database, whichever backend it is."""
+
+    # --- Lifecycle, transactions and the change feed ---
+    def transaction(self) -> ContextManager["Storage"]: ...
+    def flush(self) -> None: ...
+    def close(self) -> None: ...
+    def latest_change_id(self) -> int: ...
+    def list_changes(self, after_id: int = 0, limit: int = 100) -> List[Dict[str, Any]]: ...
+    def poll_changes(self) -> List[events.ChangeEvent]: ...
+    def prune_changes(self, max_age_days: float) -> int: ...
+    def watch_changes(self, interval: float = 2.0) -> None: ...
+    def get_pool_stats(self) -> Dict[str, Any]: ...
+    def get_cache_stats(self) -> Dict[str, Any]: ...
+
+    # --- Config ---
+    def set_config(self, key: str, value: Any) -> None: ...
+    def get_config(self, key: str) -> Optional[Any]: ...
+    def list_configs(self) -> Dict[str, Any]: ...
+    def delete_config(self, key: str) -> None: ...
+    def get_bot_config(self) -> BotConfig: ...
+    def peek_bot_config(self) -> Any: ...
+
+    # --- Servers ---
+    def create_server(self, server_id: str, server_name: str, description: Optional[str] = None, instruction: Optional[str] = None) -> None: ...
+    def get_server(self, server_id: str) -> Optional[Dict[str, Any]]: ...
+    def update_server(self, server_id: str, **kwargs) -> None: ...
+    def delete_server(self, server_id: str) -> None: ...
+    def list_servers(self) -> List[Dict[str, Any]]: ...
+    def page_servers(self, limit: Optional[int] = None, cursor: Optional[str] = None, prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]: ...
+
+    # --- Channels ---
+    def create_channel(self, channel_id: str, server_id: str, server_name: str, data: Dict[str, Any]) -> None: ...
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]: ...
+    def peek_channel(self, channel_id: str) -> Any: ...
+    def update_channel(self, channel_id: str, **kwargs) -> None: ...
+    def delete_channel(self, channel_id: str) -> None: ...
+    def list_channels(self) -> List[Dict[str, Any]]: ...
+    def list_channels_for_server(self, server_id: str) -> List[Dict[str, Any]]: ...
+    def find_system_channel_id(self) -> Optional[str]: ...
+    def list_channels_whitelisting(self, character_name: str) -> List[str]: ...
+    def page_channels_for_server(self, server_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]: ...
+
+    # --- Characters & triggers ---
+    def create_character(self, name: str, data: Dict[str, Any], triggers: Optional[List[str]] = None) -> int: ...
+    def get_character(self, name: str) -> Optional[Dict[str, Any]]: ...
+    def get_characters(self, names: List[str]) -> List[Dict[str, Any]]: ...
+    def peek_character(self, name: str) -> Any: ...
+    def peek_characters(self, names: List[str]) -> Any: ...
+    def update_character(self, name: str, **kwargs) -> None: ...
+    def rename_character(self, name: str, new_name: str) -> None: ...
+    def delete_character(self, name: str) -> None: ...
+    def list_characters(self) -> List[Dict[str, Any]]: ...
+    def page_character_summaries(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 prefix: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]: ...
+    def update_character_triggers(self, character_id: int, triggers: List[str]) -> None: ...
+
+    # --- Presets ---
+    def create_preset(self, name: str, description: str, prompt_template: str) -> int: ...
+    def get_preset(self, name: str) -> Optional[Dict[str, Any]]: ...
+    def update_preset(self, name: str, **kwargs) -> None: ...
+    def delete_preset(self, name: str) -> None: ...
+    def list_presets(self) -> List[Dict[str, Any]]: ...
+
+    # --- Message context ---
+    def load_message_context(self, channel_id: str, author: Optional[str] = None) -> MessageContext: ...
+    def peek_message_context(self, channel_id: str, author: Optional[str] = None) -> Any: ...
+
+    # --- Search and enrichments ---
+    def search(self, text: str, types: Optional[List[str]] = None, limit: int = 20) -> List[Dict[str, Any]]: ...
+    def get_enrichment(self, message_id: int, kind: str, source: Optional[str] = None) -> Optional[str]: ...
+    def set_enrichment(self, message_id: int, kind: str, text: str, source: Optional[str] = None) -> None: ...
+    def delete_enrichment(self, message_id: int, kind: str, source: Optional[str] = None) -> None: ...
+    def prune_enrichments(self, max_age_days: float = ..., max_bytes: int = ...) -> Dict[str, int]: ...
+    def get_enrichment_stats(self) -> Dict[str, Any]: ...
+    def get_caption(self, message_id: str) -> Optional[str]: ...
+    def set_caption(self, message_id: str, caption: str) -> None: ...
+    def delete_caption(self, message_id: str) -> None: ...
+
+    # --- Message archive ---
+    def archive_message(self, record: Dict[str, Any]) -> None: ...
+    def delete_archived_messages(self, message_ids: List[int]) -> None: ...
+    def get_archived_message(self, message_id: int) -> Optional[Dict[str, Any]]: ...
+    def get_archived_messages(self, channel_id: int, limit: int = ..., before: Optional[int] = None,
+                              after: Optional[int] = None) -> List[Dict[str, Any]]: ...
+    def search_messages(self, text: str, channel_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]: ...
+    def get_archive_stats(self) -> Dict[str, Any]: ...
+
+
+# ------------------------------------------------------
+# BotConfig snapshots
+# ------------------------------------------------------
+
+class _ConfigSnapshotCache:
+    """
+    Process-wide cache of the validated BotConfig, one snapshot per database.
+    The bot thread and the API routers hold separate Database objects, so the
+    snapshot lives at module level and is shared by every instance on the same path.
+
+    A config change rebuilds the snapshot right away, in the thread that published
+    the change (the writer, or the change-feed watcher for other processes), and
+    readers keep the previous snapshot until the new one is stored. Readers on an
+    event loop therefore never wait on the config query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, BotConfig] = {}
+        self._generations: Dict[str, int] = {}
+        # path -> list_configs of a live instance on that path, to rebuild from
+        self._loaders: Dict[str, "weakref.WeakMethod[Callable[[], Dict[str, Any]]]"] = {}
+
+    def register(self, path: str, list_configs: Callable[[], Dict[str, Any]]):
+        with self._lock:
+            if path not in self._loaders or self._loaders[path]() is None:
+                self._loaders[path] = weakref.WeakMethod(list_configs)
+
+    def get(self, path: str) -> Optional[BotConfig]:
+        return self._snapshots.get(path)
+
+    def generation(self, path: str) -> int:
+        return self._generations.get(path, 0)
+
+    def store(self, path: str, snapshot: BotConfig, generation: int):
+        """Stores a snapshot unless the config changed while it was being built."""
+        with self._lock:
+            if self._generations.get(path, 0) == generation:
+                self._snapshots[path] = snapshot
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._generations[path] = self._generations.get(path, 0) + 1
+            self._snapshots.pop(path, None)
+
+    def refresh(self, path: str):
+        """Rebuilds the snapshot of `path`; drops it instead if it can't be rebuilt here."""
+        with self._lock:
+            generation = self._generations[path] = self._generations.get(path, 0) + 1
+            loader = self._loaders.get(path)
+            list_configs = loader() if loader is not None else None
+            if list_configs is None or path not in self._snapshots:
+                self._snapshots.pop(path, None) # Nobody has read it yet: load on first use
+                return
+        try:
+            snapshot = BotConfig(**list_configs())
+        except Exception as e:
+            print(f"Could not rebuild the config snapshot of {path}: {e}\n{traceback.format_exc()}")
+            self.invalidate(path)
+            return
+        self.store(path, snapshot, generation)
+
+
+_config_snapshots = _ConfigSnapshotCache()
+
+
+def _on_config_changes(changes: List[ChangeEvent]):
+    # Once per commit or feed poll, however many keys it changed
+    for source in dict.fromkeys(event.source for event in changes):
+        _config_snapshots.refresh(source)
+
+
+# Config edits from any Database instance (or another process) rebuild the snapshot.
+bus.subscribe_batch(events.CONFIG_CHANGED, _on_config_changes)
+
+
+# ------------------------------------------------------
+# Shared cached reads
+# ------------------------------------------------------
+
+class StorageBase:
+    """
+    The backend-independent half of a storage backend. Subclasses set `_cache_key`
+    (the `ChangeEvent.source` of their events), `_entities` (`caches_for(_cache_key)`),
+    `_feed_lock`, `_feed_watcher` and `_feed_cursor`, and implement
+    `list_configs()`, `list_changes()`, the enrichment methods, `_in_unit()`,
+    `_read_snapshot()` and the `_read_channel`, `_read_character`,
+    `_read_characters` and `_read_preset` queries.
+    """
+
+    _cache_key: str
+
+    def _in_unit(self) -> bool:
+        raise NotImplementedError
+
+    def _read_snapshot(self) -> ContextManager[Any]:
+        """A context manager yielding a connection whose reads all see one consistent snapshot."""
+        raise NotImplementedError
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Returns size and hit-rate counters of the channel and character caches."""
+        return self._entities.get_stats()
+
+    # --- Change feed ---
+    def poll_changes(self) -> List[ChangeEvent]:
+        """
+        Publishes changes committed by other processes since the last poll on the
+        local bus and returns them. Changes made by this process were already
+        published when they were committed.
+        """
+        with self._feed_lock:
+            rows, self._feed_cursor = self._read_changes(self._feed_cursor)
+        remote = [
+            ChangeEvent(row["topic"], row["key"], self._cache_key, row["id"], row["origin"])
+            for row in rows if row["origin"] != ORIGIN
+        ]
+        bus.publish_all(remote)
+        return remote
+
+    def _read_changes(self, cursor: Any) -> Tuple[List[Dict[str, Any]], Any]:
+        """
+        The changes after `cursor` and the cursor to continue from. Here the cursor
+        is the last id read: SQLite commits one write at a time, so ids are commit order.
+        """
+        rows = self.list_changes(cursor, limit=1000)
+        return rows, rows[-1]["id"] if rows else cursor
+
+    def watch_changes(self, interval: float = 2.0):
+        """Starts (once) a background thread that polls the change feed."""
+        with self._feed_lock:
+            if self._feed_watcher is None or not self._feed_watcher.is_alive():
+                self._feed_watcher = ChangeFeedWatcher(self.poll_changes, interval)
+                self._feed_watcher.start()
+
+    # --- Config ---
+    def get_bot_config(self) -> BotConfig:
+        """
+        Returns the shared, immutable BotConfig snapshot.
+        The config table is only re-read after set_config/delete_config changed it,
+        so hot-path callers can call this on every message for free.
+        """
+        snapshot = _config_snapshots.get(self._cache_key)
+        if snapshot is None:
+            _config_snapshots.register(self._cache_key, self.list_configs)
+            generation = _config_snapshots.generation(self._cache_key)
+            snapshot = BotConfig(**self.list_configs())
+            _config_snapshots.store(self._cache_key, snapshot, generation)
+        return snapshot
+
+    def peek_bot_config(self) -> Any:
+        """Returns the config snapshot, or MISSING if it has to be loaded first."""
+        snapshot = _config_snapshots.get(self._cache_key)
+        return MISSING if snapshot is None else snapshot
+
+    # --- Channels ---
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        """Read a channel's data by its ID (served from the entity cache when possible)."""
+        if self._in_unit():
+            return self._read_channel(channel_id)
+        cache = self._entities.channels
+        channel = cache.get(channel_id)
+        if channel is not MISSING:
+            return channel
+        version = cache.version()
+        channel = self._read_channel(channel_id)
+        cache.store(channel_id, channel, version)
+        return channel
+
+    def peek_channel(self, channel_id: str) -> Any:
+        """Returns the cached channel (None if known not to exist) or MISSING, without querying."""
+        return self._entities.channels.get(channel_id, count_miss=False)
+
+    # --- Characters ---
+    def get_character(self, name: str) -> Optional[Dict[str, Any]]:
+        """Read a character's data and triggers by name (served from the entity cache when possible)."""
+        if self._in_unit():
+            return self._read_character(name)
+        cache = self._entities.characters
+        character = cache.get(name)
+        if character is not MISSING:
+            return character
+        version = cache.version()
+        character = self._read_character(name)
+        cache.store(name, character, version)
+        return character
+
+    def get_characters(self, names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Read several characters (with triggers), e.g. a channel whitelist. Cached
+        characters are served from memory and the rest are loaded in one query.
+        Results follow the order of `names`; names with no character are skipped.
+        """
+        unique_names = list(dict.fromkeys(names))
+        if not unique_names:
+            return []
+        if self._in_unit():
+            found = self._read_characters(unique_names)
+            return [found[name] for name in unique_names if name in found]
+
+        cache = self._entities.characters
+        found = {}
+        missing = []
+        for name in unique_names:
+            character = cache.get(name)
+            if character is MISSING:
+                missing.append(name)
+            elif character is not None:
+                found[name] = character
+        if missing:
+            version = cache.version()
+            loaded = self._read_characters(missing)
+            for name in missing:
+                cache.store(name, loaded.get(name), version)
+            found.update(loaded)
+        return [found[name] for name in unique_names if name in found]
+
+    def peek_character(self, name: str) -> Any:
+        """Returns the cached character (None if known not to exist) or MISSING, without querying."""
+        return self._entities.characters.get(name, count_miss=False)
+
+    def peek_characters(self, names: List[str]) -> Any:
+        """Like get_characters(), but only from the cache: MISSING unless every name is cached."""
+        cache = self._entities.characters
+        unique_names = list(dict.fromkeys(names))
+        if not all(name in cache for name in unique_names):
+            return MISSING
+        found = [cache.get(name, count_miss=False) for name in unique_names]
+        if any(character is MISSING for character in found):
+            return MISSING # Evicted in between
+        return [character for character in found if character is not None]
+
+    # --- Presets ---
+    def get_preset(self, name: str) -> Optional[Dict[str, Any]]:
+        """Read a preset by its unique name (served from the entity cache when possible)."""
+        if self._in_unit():
+            return self._read_preset(name)
+        cache = self._entities.presets
+        preset = cache.get(name)
+        if preset is not MISSING:
+            return preset
+        version = cache.version()
+        preset = self._read_preset(name)
+        cache.store(name, preset, version)
+        return preset
+
+    # --- Message context ---
+    def load_message_context(self, channel_id: str, author: Optional[str] = None) -> MessageContext:
+        """
+        Everything the pipeline needs to answer a message in `channel_id`: the
+        channel, its whitelisted characters (with triggers), the default character,
+        the Default preset and the config snapshot.
+        Served from the entity caches when they hold everything; otherwise the
+        records are read together in one read transaction, so the context is
+        consistent even while the dashboard is saving.
+        """
+        context = self.peek_message_context(channel_id, author)
+        if context is not MISSING:
+            return context
+
+        config = self.get_bot_config()
+        caches = self._entities
+        cacheable = not self._in_unit()
+        versions = (caches.channels.version(), caches.characters.version(), caches.presets.version())
+        with self._read_snapshot() as conn:
+            channel = self._read_channel(channel_id, conn)
+            names = self._context_names(channel, config)
+            found = self._read_characters(names, conn)
+            preset = self._read_preset(DEFAULT_PRESET_NAME, conn)
+
+        if cacheable:
+            caches.channels.store(channel_id, channel, versions[0])
+            for name in names:
+                caches.characters.store(name, found.get(name), versions[1])
+            caches.presets.store(DEFAULT_PRESET_NAME, preset, versions[2])
+        return self._message_context(channel_id, author, config, channel, found, preset)
+
+    def peek_message_context(self, channel_id: str, author: Optional[str] = None) -> Any:
+        """Like load_message_context(), but only from the caches: MISSING unless everything is cached."""
+        config = self.peek_bot_config()
+        if config is MISSING:
+            return MISSING
+        caches = self._entities
+        channel = caches.channels.get(channel_id, count_miss=False)
+        if channel is MISSING:
+            return MISSING
+        names = self._context_names(channel, config)
+        if not all(name in caches.characters for name in names) or DEFAULT_PRESET_NAME not in caches.presets:
+            return MISSING
+        found = {}
+        for name in names:
+            character = caches.characters.get(name, count_miss=False)
+            if character is MISSING:
+                return MISSING # Evicted in between
+            if character is not None:
+                found[name] = character
+        preset = caches.presets.get(DEFAULT_PRESET_NAME, count_miss=False)
+        if preset is MISSING:
+            return MISSING
+        return self._message_context(channel_id, author, config, channel, found, preset)
+
+    @staticmethod
+    def _context_names(channel: Optional[Dict[str, Any]], config: BotConfig) -> List[str]:
+        whitelist = (channel or {}).get("data", {}).get("whitelist") or []
+        return list(dict.fromkeys(whitelist + [config.default_character]))
+
+    @staticmethod
+    def _message_context(channel_id: str, author: Optional[str], config: BotConfig, channel: Optional[Dict[str, Any]],
+                         found: Dict[str, Dict[str, Any]], preset: Optional[Dict[str, Any]]) -> MessageContext:
+        whitelist = (channel or {}).get("data", {}).get("whitelist") or []
+        return MessageContext(
+            channel_id=channel_id,
+            author=author,
+            config=config,
+            channel=channel,
+            characters=tuple(found[name] for name in dict.fromkeys(whitelist) if name in found),
+            default_character=found.get(config.default_character),
+            preset=preset,
+        )
+
+    # --- Captions ---
+    # Image captions are enrichments of kind "image" with no particular source.
+    def get_caption(self, message_id: str) -> Optional[str]:
+        """Read the image caption for a given message ID."""
+        return self.get_enrichment(message_id, enrichments.IMAGE)
+
+    def set_caption(self, message_id: str, caption: str):
+        """Create or update the image caption for a message ID."""
+        self.set_enrichment(message_id, enrichments.IMAGE, caption)
+
+    def delete_caption(self, message_id: str):
+        """Delete the image caption for a message ID."""
+        self.delete_enrichment(message_id, enrichments.IMAGE)
@@ -0,0 +1,206 @@
+# api/db/write_behind.py
+"""
+Write-behind buffering for append-heavy tables.
+
+Instead of one transaction (and one fsync) per row, writes are parked in memory
+and flushed by a background thread as a single `executemany` transaction every
+`interval` seconds, or sooner once `max_batch` rows are waiting. Repeated writes
+to the same key are coalesced, reads of a pending key are served from the buffer,
+and everything left is flushed on `close()` or at interpreter exit.
+
+When a batch fails, its rows are retried one by one, so one bad row (a
+constraint violation, a value the driver rejects) can't hold back the rest.
+A row that fails on its own `max_attempts` times is dropped and logged.
+
+The buffer knows nothing about SQL: the owner passes a `flush(upserts, deletes)`
+callable that writes one batch in one transaction.
+"""
+
+import atexit
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+DEFAULT_INTERVAL = float(os.getenv("DATABASE_WRITE_BEHIND_INTERVAL", "1.0"))
+DEFAULT_MAX_BATCH = int(os.getenv("DATABASE_WRITE_BEHIND_MAX_BATCH", "500"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("DATABASE_WRITE_BEHIND_MAX_ATTEMPTS", "3"))
+
+# Marks a key whose pending write is a delete.
+_DELETED = object()
+# Returned by get() for keys the buffer knows nothing about.
+MISSING = object()
+
+FlushFunc = Callable[[List[Tuple[Hashable, Any]], List[Hashable]], None]
+
+
+class WriteBehindBuffer:
+    """Coalescing write buffer flushed in batches by a daemon thread."""
+
+    def __init__(self, name: str, flush: FlushFunc, interval: float = DEFAULT_INTERVAL, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.name = name
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_attempts = max(1, max_attempts)
+        self._flush_func = flush
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Hashable, Any] = {}
+        self._in_flight: Dict[Hashable, Any] = {}
+        # Failed single-row writes per key, until the row is written, replaced or dropped
+        self._attempts: Dict[Hashable, int] = {}
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.stats = {
+            "writes": 0, "coalesced": 0, "flushes": 0, "rows_flushed": 0, "flush_errors": 0,
+            "row_errors": 0, "dropped": 0,
+        }
+        self._thread = threading.Thread(target=self._run, name=f"viel-write-behind-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Writes ---
+    def put(self, key: Hashable, value: Any):
+        self._enqueue(key, value)
+
+    def delete(self, key: Hashable):
+        self._enqueue(key, _DELETED)
+
+    def _enqueue(self, key: Hashable, value: Any):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Write-behind buffer '{self.name}' is closed")
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[key] = value
+            self._attempts.pop(key, None) # A new value gets a fresh set of attempts
+            self.stats["writes"] += 1
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    # --- Reads ---
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the pending value for `key`, None if its pending write is a delete,
+        or MISSING if nothing is buffered and the caller should read the table.
+        """
+        with self._lock:
+            for layer in (self._pending, self._in_flight):
+                if key in layer:
+                    value = layer[key]
+                    return None if value is _DELETED else value
+        return MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+    # --- Flushing ---
+    def flush(self):
+        """Writes everything pending now, in the calling thread."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Error flushing write-behind buffer '{self.name}' ({len(batch)} rows): {e}; retrying row by row")
+                with self._lock:
+                    self.stats["flush_errors"] += 1
+                self._flush_rows(batch)
+                return
+            with self._lock:
+                self._in_flight = {}
+                for key in batch:
+                    self._attempts.pop(key, None)
+                self.stats["flushes"] += 1
+                self.stats["rows_flushed"] += len(batch)
+
+    def _write(self, batch: Dict[Hashable, Any]):
+        upserts = [(key, value) for key, value in batch.items() if value is not _DELETED]
+        deletes = [key for key, value in batch.items() if value is _DELETED]
+        self._flush_func(upserts, deletes)
+
+    def _flush_rows(self, batch: Dict[Hashable, Any]):
+        """
+        Writes a failed batch one row at a time. Rows that fail again go back to
+        the queue, or are dropped after `max_attempts` failures. Raises the last
+        error if any row is left for the next flush.
+        """
+        written, retry, dropped = 0, {}, []
+        error = None
+        for key, value in batch.items():
+            try:
+                self._write({key: value})
+                written += 1
+                with self._lock:
+                    self._attempts.pop(key, None)
+            except Exception as e:
+                error = e
+                with self._lock:
+                    self.stats["row_errors"] += 1
+                    attempts = self._attempts[key] = self._attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    dropped.append(key)
+                    print(f"Dropped write to {key!r} from write-behind buffer '{self.name}' after {attempts} failed attempts: {e}")
+                else:
+                    retry[key] = value
+        with self._lock:
+            for key in dropped:
+                self._attempts.pop(key, None)
+            # Back in line for the next attempt, unless newer writes replaced them
+            for key, value in retry.items():
+                if key in self._pending:
+                    self._attempts.pop(key, None)
+                else:
+                    self._pending[key] = value
+            self._in_flight = {}
+            self.stats["rows_flushed"] += written
+            self.stats["dropped"] += len(dropped)
+        if retry:
+            raise error
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except Exception:
+                pass # Already logged; retried on the next tick
+
+    def close(self):
+        """
+        Stops the background thread and flushes whatever is still pending. Nothing
+        flushes after this, so rows that fail get their remaining attempts right
+        away; whatever still fails is dropped and logged.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.interval + 5)
+        # Every failed flush uses up an attempt of each row it puts back
+        for _ in range(self.max_attempts):
+            try:
+                self.flush()
+                break
+            except Exception:
+                continue
+        with self._lock:
+            lost, self._pending = self._pending, {}
+            self.stats["dropped"] += len(lost)
+        for key in lost:
+            print(f"Dropped write to {key!r} from write-behind buffer '{self.name}': still failing at close")
+        atexit.unregister(self.close)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "pending": len(self._pending) + len(self._in_flight)}
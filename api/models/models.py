@@ -1,12 +1,15 @@
 from __future__ import annotations
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 # ------------------------------------------------------
 # Config (maps to the 'config' table)
 # ------------------------------------------------------
 
 class BotConfig(BaseModel):
+    # Frozen: one validated instance is shared by every reader (see Database.get_bot_config)
+    model_config = ConfigDict(frozen=True)
+
     default_character: str
     ai_endpoint: str
     base_llm: str
@@ -21,6 +24,7 @@ class BotConfig(BaseModel):
     multimodal_ai_model: Optional[str] = None
     dm_list : Optional[List[str]] = None # List of discord username that the bot is allowed to DM to
     concurrency : Optional[int] = 1
+    coalesce_ms : int = 0 # Messages to the same characters in a channel within this window get one reply (0 = off)
 
 # ------------------------------------------------------
 # Servers (maps to the 'servers' table)
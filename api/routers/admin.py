@@ -0,0 +1,85 @@
+# routers/admin.py
+"""
+Database administration endpoints.
+
+- GET /stats: File, page and per-table sizes, cache hit rates, connection counters
+  and message-archive totals.
+- POST /maintenance: Runs retention, vacuum and optimize now (see api/db/maintenance.py).
+- GET /backups: Lists the stored backups, newest first.
+- POST /backup: Takes an online backup now (see api/db/backup.py).
+
+Maintenance and backups are SQLite-only; with the PostgreSQL backend they answer
+501 and /stats reports caches, connections and the archive only.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+
+from api.db import backup, maintenance
+from api.db.async_database import AsyncDatabase
+from api.db.database import Database, get_database
+
+# --- Initialize Database Client ---
+db = get_database()
+adb = AsyncDatabase.wrap(db)
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin"]
+)
+
+
+def _require_sqlite():
+    if not isinstance(db, Database):
+        raise HTTPException(status_code=501, detail="Only available with the SQLite backend")
+
+
+@router.get("/stats")
+async def get_stats():
+    """Storage sizes plus cache and connection statistics."""
+    stats = {}
+    if isinstance(db, Database):
+        # dbstat walks every page, so keep it off the shared database thread
+        stats = await asyncio.to_thread(maintenance.get_stats, db)
+    stats["caches"] = db.get_cache_stats()
+    stats["pool"] = db.get_pool_stats()
+    stats["archive"] = await adb.get_archive_stats()
+    stats["async"] = adb.get_stats()
+    return stats
+
+
+@router.post("/maintenance")
+async def run_maintenance(
+    vacuum: bool = Query(True, description="Return free pages to the filesystem (incremental vacuum)"),
+    full_vacuum: bool = Query(False, description="Rewrite the whole file; needed once for files created before incremental vacuum")
+):
+    """Run database maintenance now and return its report."""
+    _require_sqlite()
+    try:
+        # Runs on its own thread and connection: vacuum steps pause between batches
+        return await asyncio.to_thread(maintenance.run_maintenance, db, vacuum, full_vacuum)
+    except maintenance.MaintenanceBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Maintenance failed: {e}")
+
+
+@router.get("/backups")
+async def list_backups():
+    """Stored backups, newest first."""
+    _require_sqlite()
+    return {"directory": backup.backup_dir(db), "backups": backup.list_backups(db)}
+
+
+@router.post("/backup")
+async def create_backup():
+    """Take a verified online backup now; the bot keeps running while it is copied."""
+    _require_sqlite()
+    try:
+        # Own thread and connection; page batches with pauses in between
+        return await asyncio.to_thread(backup.create_backup, db)
+    except backup.BackupBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Backup failed: {e}")
@@ -0,0 +1,98 @@
+# routers/bulk.py
+"""
+Bulk export/import endpoints (NDJSON, streamed in both directions).
+
+- GET /export: Streams every server, channel, preset and character as NDJSON.
+- POST /import: Loads an NDJSON body in chunked transactions and returns a report.
+
+See api/db/bulk.py for the record format and the equivalent command line tool.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from api.db.async_database import AsyncDatabase
+from api.db.bulk import CONFLICT_POLICIES, IMPORT_CHUNK_SIZE, RECORD_TYPES, BulkImporter, BulkImportError, ImportReport, iter_export
+from api.db.database import Database, get_database
+from api.routers.characters import parse_character_card
+
+# --- Initialize Database Client ---
+db = get_database()
+adb = AsyncDatabase.wrap(db)
+
+router = APIRouter(
+    prefix="/api/bulk",
+    tags=["Bulk"]
+)
+
+
+def _require_sqlite():
+    # Export and import read and write SQLite directly (see api/db/bulk.py)
+    if not isinstance(db, Database):
+        raise HTTPException(status_code=501, detail="Bulk export/import needs the SQLite backend")
+
+
+def _parse_types(types: Optional[str]) -> list:
+    if not types:
+        return list(RECORD_TYPES)
+    wanted = [t.strip() for t in types.split(",") if t.strip()]
+    unknown = [t for t in wanted if t not in RECORD_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown record type(s): {', '.join(unknown)}")
+    return wanted
+
+
+@router.get("/export")
+async def export_records(types: Optional[str] = Query(None, description="Comma-separated: server,channel,preset,character")):
+    """Stream the selected record types as NDJSON, one page of rows at a time."""
+    _require_sqlite()
+    wanted = _parse_types(types)
+    return StreamingResponse(
+        iter_export(db, wanted),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="viel-export.ndjson"'}
+    )
+
+
+def _log_progress(report: ImportReport):
+    created = sum(report.created.values())
+    print(f"Bulk import: {report.lines} lines read, {created} created, {report.error_count} errors")
+
+
+@router.post("/import")
+async def import_records(
+    request: Request,
+    on_conflict: str = Query("skip", description="What to do with existing names: skip, replace or error"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=10000)
+):
+    """
+    Import an NDJSON body. The body is read incrementally and written in chunks,
+    so large libraries never sit in memory. Untyped lines are parsed as character cards.
+    """
+    _require_sqlite()
+    if on_conflict not in CONFLICT_POLICIES:
+        raise HTTPException(status_code=400, detail=f"on_conflict must be one of {', '.join(CONFLICT_POLICIES)}")
+
+    importer = BulkImporter(db, on_conflict=on_conflict, chunk_size=chunk_size,
+                            progress=_log_progress, card_parser=parse_character_card)
+    buffered = b""
+    lines = []
+    try:
+        async for chunk in request.stream():
+            buffered += chunk
+            *complete, buffered = buffered.split(b"\n")
+            lines.extend(complete)
+            if len(lines) >= chunk_size:
+                await adb.run(importer.feed, lines)
+                lines = []
+        if buffered:
+            lines.append(buffered)
+        await adb.run(importer.feed, lines)
+        report = await adb.run(importer.finish)
+    except BulkImportError as e:
+        raise HTTPException(status_code=409, detail=f"{e} (after {importer.report.lines} lines)")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Bulk import failed after {importer.report.lines} lines: {e}")
+    return report.to_dict()
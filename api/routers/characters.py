@@ -3,7 +3,7 @@
 Character-related API endpoints, powered by the database.
 
 This file manages the full lifecycle of characters via RESTful endpoints:
-- GET /: Lists all characters in a lightweight format for grids/UIs.
+- GET /: Lists characters in a lightweight format for grids/UIs (paginated, filterable by name prefix).
 - POST /: Creates a new character from a structured JSON object (the primary creation method).
 - GET /{name}: Retrieves the full details of a single character.
 - PUT /{name}: Updates an existing character's data and triggers.
@@ -13,8 +13,8 @@ This file manages the full lifecycle of characters via RESTful endpoints:
 """
 
 import asyncio
-from fastapi import APIRouter, Body, Path, HTTPException, Request, UploadFile, File, status
-from typing import List, Annotated
+from fastapi import APIRouter, Body, Path, HTTPException, Query, Request, Response, UploadFile, File, status
+from typing import List, Annotated, Optional
 
 # --- Model and Database Imports ---
 # These Pydantic models define the structure of data for requests and responses.
@@ -25,15 +25,18 @@ from api.models.models import (
     CharacterUpdate,    # The required structure for PUT /{name} requests
     CharacterListItem   # The lightweight structure for GET / responses
 )
-from api.db.database import Database
+from api.db.database import Database, get_database
+from api.db.async_database import AsyncDatabase
 
 # This is the global bot instance managed by your discord router
 from api.bot_state import bot_state
 from src.utils.image_uploader import upload_image_to_system_channel
 
 # --- Initialize Database Client ---
-# This creates a single instance of the Database class for the router to use.
-db = Database()
+# Shared, process-wide Database instance (schema migrations run only once).
+db = get_database()
+# Awaitable view of the same database; calls run on the shared DB thread
+adb = AsyncDatabase.wrap(db)
 
 
 router = APIRouter(
@@ -106,26 +109,26 @@ def parse_character_card(raw_data: dict) -> tuple[str, dict]:
 # --- Primary CRUD Endpoints ---
 
 @router.get("/", response_model=List[CharacterListItem])
-async def list_characters():
+async def list_characters(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to list every character"),
+    cursor: Optional[str] = Query(None, description="The X-Next-Cursor value from the previous page"),
+    prefix: Optional[str] = Query(None, description="Only names starting with this prefix")
+):
     """
-    List all available characters with their name, avatar, and info.
-    Uses the lightweight CharacterListItem model for efficiency.
+    List characters with their name, avatar, and info, ordered by name.
+    Only those three fields are read from the database. When another page
+    exists, its cursor is returned in the X-Next-Cursor header.
     """
     try:
-        characters = db.list_characters()
-        result = []
-        for char in characters:
-            char_data = char.get("data", {})
-            result.append(
-                CharacterListItem(
-                    name=char.get("name", ""),
-                    avatar=char_data.get("avatar") or "",
-                    info=char_data.get("info") or ""
-                )
-            )
-        return result
+        characters, next_cursor = await adb.page_character_summaries(limit=limit, cursor=cursor, prefix=prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return characters
 
 
 @router.post("/", response_model=Character, status_code=status.HTTP_201_CREATED)
@@ -136,13 +139,13 @@ async def create_character(
     Create a new character from a structured JSON object.
     This is the primary endpoint for creating characters from the UI form.
     """
-    if db.get_character(name=character.name):
+    if await adb.get_character(name=character.name):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Character '{character.name}' already exists."
         )
     try:
-        db.create_character(
+        await adb.create_character(
             name=character.name,
             data=character.data.model_dump(),
             triggers=character.triggers
@@ -154,7 +157,7 @@ async def create_character(
         )
 
     # Fetch and return the newly created character to confirm success
-    new_character = db.get_character(name=character.name)
+    new_character = await adb.get_character(name=character.name)
     if not new_character:
         raise HTTPException(status_code=500, detail="Failed to retrieve character after creation.")
     return new_character
@@ -163,7 +166,7 @@ async def create_character(
 @router.get("/{character_name}", response_model=Character)
 async def get_character(character_name: str = Path(..., description="Name of the character")):
     """Get a character's full configuration from the database."""
-    character = db.get_character(name=character_name)
+    character = await adb.get_character(name=character_name)
     if not character:
         raise HTTPException(status_code=404, detail=f"Character '{character_name}' not found")
     return character
@@ -175,20 +178,25 @@ async def update_character(
     character_update: CharacterUpdate = Body(..., description="The full character data and triggers to update")
 ):
     """Update an existing character's data and triggers in the database."""
-    existing_char = db.get_character(name=character_name)
+    existing_char = await adb.get_character(name=character_name)
     if not existing_char:
         raise HTTPException(status_code=404, detail=f"Character '{character_name}' not found")
 
+    def save_character():
+        # Data and triggers change together in one transaction
+        with db.transaction() as tx:
+            # Step 1: Update the main character data (persona, examples, etc.)
+            tx.update_character(name=character_name, data=character_update.data.model_dump())
+
+            # Step 2: Update the triggers by replacing them completely
+            # This requires the character's database ID.
+            tx.update_character_triggers(character_id=existing_char['id'], triggers=character_update.triggers)
+
     try:
-        # Step 1: Update the main character data (persona, examples, etc.)
-        db.update_character(name=character_name, data=character_update.data.model_dump())
-        
-        # Step 2: Update the triggers by replacing them completely
-        # This requires the character's database ID.
-        db.update_character_triggers(character_id=existing_char['id'], triggers=character_update.triggers)
-        
+        await adb.run(save_character)
+
         # Step 3: Fetch and return the fully updated character object
-        updated_character = db.get_character(name=character_name)
+        updated_character = await adb.get_character(name=character_name)
         return updated_character
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update character: {e}")
@@ -197,11 +205,11 @@ async def update_character(
 @router.delete("/{character_name}")
 async def delete_character(character_name: str = Path(..., description="Name of the character")):
     """Delete a character from the database."""
-    if not db.get_character(name=character_name):
+    if not await adb.get_character(name=character_name):
         raise HTTPException(status_code=404, detail=f"Character '{character_name}' not found")
     
     try:
-        db.delete_character(name=character_name)
+        await adb.delete_character(name=character_name)
         return {"message": f"Character '{character_name}' deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete character: {e}")
@@ -219,13 +227,13 @@ async def create_character_from_import(request: Request):
         raw_data = await request.json()
         name, data_dict = parse_character_card(raw_data)
         
-        if db.get_character(name=name):
+        if await adb.get_character(name=name):
             raise HTTPException(status_code=409, detail=f"Character '{name}' already exists.")
             
         # Card imports don't have triggers, so an empty list is passed
-        db.create_character(name=name, data=data_dict, triggers=[])
+        await adb.create_character(name=name, data=data_dict, triggers=[])
         
-        new_character = db.get_character(name=name)
+        new_character = await adb.get_character(name=name)
         if not new_character:
             raise HTTPException(status_code=500, detail="Failed to retrieve character after creation.")
             
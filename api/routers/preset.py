@@ -7,10 +7,13 @@ from pydantic import BaseModel
 
 # --- Model and Database Imports ---
 from api.models.models import Preset  # This model includes the 'id'
-from api.db.database import Database
+from api.db.database import Database, get_database
+from api.db.async_database import AsyncDatabase
 
 # --- Initialize Database Client ---
-db = Database()
+db = get_database()
+# Awaitable view of the same database; calls run on the shared DB thread
+adb = AsyncDatabase.wrap(db)
 
 router = APIRouter(
     prefix="/api/presets",
@@ -30,7 +33,7 @@ class PresetBody(BaseModel):
 async def list_presets():
     """List all available presets from the database."""
     try:
-        return db.list_presets()
+        return await adb.list_presets()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
@@ -39,20 +42,20 @@ async def list_presets():
 async def create_preset(preset_data: PresetBody = Body(..., description="The new preset's data")):
     """Create a new preset in the database."""
     # Check for conflicts first
-    if db.get_preset(name=preset_data.name):
+    if await adb.get_preset(name=preset_data.name):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Preset with name '{preset_data.name}' already exists."
         )
     try:
         # Create the preset in the database
-        db.create_preset(
+        await adb.create_preset(
             name=preset_data.name,
             description=preset_data.description,
             prompt_template=preset_data.prompt_template
         )
         # Fetch the newly created preset to return the full object with its ID
-        new_preset = db.get_preset(name=preset_data.name)
+        new_preset = await adb.get_preset(name=preset_data.name)
         if not new_preset:
             raise HTTPException(status_code=500, detail="Failed to retrieve preset after creation.")
         return new_preset
@@ -63,7 +66,7 @@ async def create_preset(preset_data: PresetBody = Body(..., description="The new
 @router.get("/{preset_name}", response_model=Preset)
 async def get_preset(preset_name: str = Path(..., description="The unique name of the preset")):
     """Get a specific preset's configuration by its name."""
-    preset = db.get_preset(name=preset_name)
+    preset = await adb.get_preset(name=preset_name)
     if not preset:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -79,7 +82,7 @@ async def update_preset(
 ):
     """Update an existing preset's data, ignoring any name changes."""
     # Ensure the preset to be updated exists
-    if not db.get_preset(name=preset_name):
+    if not await adb.get_preset(name=preset_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Preset '{preset_name}' not found"
@@ -96,10 +99,10 @@ async def update_preset(
 
         # Now, `update_data` only contains fields like 'description' and 'prompt_template'.
         # The `name` argument is supplied only by `preset_name` from the URL.
-        db.update_preset(name=preset_name, **update_data)
+        await adb.update_preset(name=preset_name, **update_data)
         
         # Fetch and return the updated preset using the original name from the path
-        return db.get_preset(name=preset_name)
+        return await adb.get_preset(name=preset_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update preset: {e}")
 
@@ -108,14 +111,14 @@ async def update_preset(
 async def delete_preset(preset_name: str = Path(..., description="The name of the preset to delete")):
     """Delete a preset from the database."""
     # Check if the preset exists before trying to delete
-    if not db.get_preset(name=preset_name):
+    if not await adb.get_preset(name=preset_name):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Preset '{preset_name}' not found"
         )
 
     try:
-        db.delete_preset(name=preset_name)
+        await adb.delete_preset(name=preset_name)
         return None  # Return an empty response for 204 No Content
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete preset: {e}")
\ No newline at end of file
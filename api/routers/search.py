@@ -0,0 +1,57 @@
+# routers/search.py
+"""Full-text search across characters, presets, captions and archived messages."""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from api.db.async_database import AsyncDatabase
+from api.db.database import get_database
+from api.db.search import SEARCH_TYPES
+
+# --- Initialize Database Client ---
+db = get_database()
+adb = AsyncDatabase.wrap(db)
+
+router = APIRouter(
+    prefix="/api/search",
+    tags=["Search"]
+)
+
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1, description="Words to search for; end a word with * for prefix matching"),
+    types: Optional[str] = Query(None, description="Comma-separated: character,preset,caption"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Ranked search. Every hit has a type, key (character/preset name or message id),
+    title, a snippet with matches wrapped in <mark>, and its bm25 rank (lower is better).
+    """
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_TYPES)
+    unknown = [t for t in wanted if t not in SEARCH_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type(s): {', '.join(unknown)}")
+    try:
+        results = await adb.search(q, types=wanted, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+    return {"query": q, "results": results}
+
+
+@router.get("/messages")
+async def search_messages(
+    q: str = Query(..., min_length=1, description="Words to search for; end a word with * for prefix matching"),
+    channel_id: Optional[int] = Query(None, description="Only search this channel"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Ranked search over the message archive. Every hit is the archived message
+    plus a snippet with matches wrapped in <mark> and its rank (lower is better).
+    """
+    try:
+        results = await adb.search_messages(q, channel_id=channel_id, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+    return {"query": q, "results": results}
@@ -1,16 +1,19 @@
 # routers/servers.py
 """Server and channel-related API endpoints, powered by the database."""
 
-from fastapi import APIRouter, Body, Path, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Body, Path, HTTPException, Query, Response, status
+from typing import List, Optional
 
 # --- Model and Database Imports ---
 from api.models.models import Server, Channel, ChannelData
-from api.db.database import Database
+from api.db.database import Database, get_database
+from api.db.async_database import AsyncDatabase
 from pydantic import BaseModel
 
 # --- Initialize Database Client ---
-db = Database()
+db = get_database()
+# Awaitable view of the same database; calls run on the shared DB thread
+adb = AsyncDatabase.wrap(db)
 
 router = APIRouter(
     prefix="/api/servers",
@@ -20,23 +23,33 @@ router = APIRouter(
 # --- Server Endpoints ---
 
 @router.get("/", response_model=List[Server])
-async def list_servers():
-    """List all servers available in the database."""
+async def list_servers(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to list every server"),
+    cursor: Optional[str] = Query(None, description="The X-Next-Cursor value from the previous page"),
+    prefix: Optional[str] = Query(None, description="Only server names starting with this prefix")
+):
+    """List servers ordered by name. The next page's cursor is returned in the X-Next-Cursor header."""
     try:
-        return db.list_servers()
+        servers, next_cursor = await adb.page_servers(limit=limit, cursor=cursor, prefix=prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return servers
 
 @router.post("/", response_model=Server, status_code=status.HTTP_201_CREATED)
 async def create_server(server: Server = Body(..., description="Server data to create")):
     """Create a new server record in the database."""
-    if db.get_server(server.server_id):
+    if await adb.get_server(server.server_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Server with ID '{server.server_id}' already exists."
         )
     try:
-        db.create_server(
+        await adb.create_server(
             server_id=server.server_id,
             server_name=server.server_name,
             description=server.description,
@@ -49,7 +62,7 @@ async def create_server(server: Server = Body(..., description="Server data to c
 @router.get("/{server_id}", response_model=Server)
 async def get_server(server_id: str = Path(..., description="The unique ID of the server")):
     """Get a specific server's configuration."""
-    server = db.get_server(server_id)
+    server = await adb.get_server(server_id)
     if not server:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Server '{server_id}' not found")
     return server
@@ -60,10 +73,10 @@ async def delete_server(server_id: str = Path(..., description="The unique ID of
     Delete a server and all its associated channels from the database.
     This action is irreversible due to cascading deletes.
     """
-    if not db.get_server(server_id):
+    if not await adb.get_server(server_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Server '{server_id}' not found")
     try:
-        db.delete_server(server_id)
+        await adb.delete_server(server_id)
         return None # Return empty response for 204
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete server: {e}")
@@ -82,10 +95,10 @@ async def create_channel(
     request: CreateChannelRequest = Body(..., description="The new channel's ID and configuration")
 ):
     """Create a new channel configuration within a specific server."""
-    server = db.get_server(server_id)
+    server = await adb.get_server(server_id)
     if not server:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Server '{server_id}' not found")
-    if db.get_channel(request.channel_id):
+    if await adb.get_channel(request.channel_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Channel with ID '{request.channel_id}' already exists."
@@ -94,23 +107,35 @@ async def create_channel(
     try:
         # Use by_alias=True to correctly handle the 'global' field name
         channel_data_dict = request.data.model_dump(by_alias=True)
-        db.create_channel(
+        await adb.create_channel(
             channel_id=request.channel_id,
             server_id=server_id,
             server_name=server["server_name"],
             data=channel_data_dict
         )
         # Fetch the newly created channel to return the full object
-        return db.get_channel(request.channel_id)
+        return await adb.get_channel(request.channel_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create channel: {e}")
 
 @router.get("/{server_id}/channels", response_model=List[Channel])
-async def list_channels_in_server(server_id: str = Path(..., description="The unique ID of the server")):
-    """List all channels in a specific server."""
-    if not db.get_server(server_id):
+async def list_channels_in_server(
+    response: Response,
+    server_id: str = Path(..., description="The unique ID of the server"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to list every channel"),
+    cursor: Optional[str] = Query(None, description="The X-Next-Cursor value from the previous page"),
+    prefix: Optional[str] = Query(None, description="Only channel names starting with this prefix")
+):
+    """List the channels in a specific server, ordered by channel name."""
+    if not await adb.get_server(server_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Server '{server_id}' not found")
-    return db.list_channels_for_server(server_id)
+    try:
+        channels, next_cursor = await adb.page_channels_for_server(server_id, limit=limit, cursor=cursor, prefix=prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return channels
 
 @router.get("/{server_id}/channels/{channel_id}", response_model=Channel)
 async def get_channel(
@@ -118,7 +143,7 @@ async def get_channel(
     channel_id: str = Path(..., description="The unique channel ID")
 ):
     """Get a specific channel's configuration."""
-    channel = db.get_channel(channel_id)
+    channel = await adb.get_channel(channel_id)
     if not channel or channel['server_id'] != server_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Channel '{channel_id}' not found in server '{server_id}'")
     return channel
@@ -130,15 +155,15 @@ async def update_channel(
     channel_data: ChannelData = Body(..., description="The updated channel data")
 ):
     """Update an existing channel's configuration."""
-    existing_channel = db.get_channel(channel_id)
+    existing_channel = await adb.get_channel(channel_id)
     if not existing_channel or existing_channel['server_id'] != server_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Channel '{channel_id}' not found in server '{server_id}'")
 
     try:
         # Use by_alias=True to correctly handle the 'global' field name
         channel_data_dict = channel_data.model_dump(by_alias=True)
-        db.update_channel(channel_id, data=channel_data_dict)
-        return db.get_channel(channel_id)
+        await adb.update_channel(channel_id, data=channel_data_dict)
+        return await adb.get_channel(channel_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update channel: {e}")
 
@@ -148,12 +173,12 @@ async def delete_channel(
     channel_id: str = Path(..., description="The unique channel ID")
 ):
     """Delete a channel's configuration."""
-    existing_channel = db.get_channel(channel_id)
+    existing_channel = await adb.get_channel(channel_id)
     if not existing_channel or existing_channel['server_id'] != server_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Channel '{channel_id}' not found in server '{server_id}'")
 
     try:
-        db.delete_channel(channel_id)
+        await adb.delete_channel(channel_id)
         return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete channel: {e}")
\ No newline at end of file
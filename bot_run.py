@@ -4,29 +4,38 @@ from discord import app_commands
 import traceback
 from typing import Optional
 
-from api.db.database import Database
+from api.db.database import get_database
+from api.db.storage import Storage
+from api.db.async_database import AsyncDatabase
 from api.models.models import BotConfig
 from src.models.dimension import ActiveChannel
+import src.controller.archive as archive
 import src.controller.observer as observer
+import src.controller.reply_targets as reply_targets
 import src.controller.pipeline as pipeline
 from src.plugins.manager import PluginManager
 
 # --- Helper to load config from DB ---
-def get_bot_config(db: Database) -> BotConfig:
-    """Fetches all config key-values from the DB and returns a BotConfig object."""
-    return BotConfig(**db.list_configs())
+def get_bot_config(db: Storage) -> BotConfig:
+    """Returns the shared BotConfig snapshot (only rebuilt when the config changes)."""
+    return db.get_bot_config()
 
 
 class Viel(discord.Client):
     def __init__(self, *, intents: discord.Intents):
         super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
-        self.db = Database()
-        self.config = get_bot_config(self.db)
-        self.queue = asyncio.Queue()
+        self.db = get_database()
+        # Coroutines use this so sqlite3 I/O never blocks the gateway loop
+        self.adb = AsyncDatabase.wrap(self.db)
         self.plugin_manager = PluginManager(plugin_package_path="src.plugins")
         self.auto_reply_count = 0
 
+    @property
+    def config(self) -> BotConfig:
+        """The current config snapshot; edits made through the API show up immediately."""
+        return get_bot_config(self.db)
+
     async def setup_hook(self):
         """This is called when the bot is preparing to connect."""
         # --- Context Menus ---
@@ -52,7 +61,13 @@ class Viel(discord.Client):
         # Sync commands globally. For development, you might sync to a specific guild.
         await self.tree.sync()
 
-        self.think_task = asyncio.create_task(pipeline.think(self, self.db, self.queue, self.plugin_manager))
+        # Config/character/channel edits made through the API reach this process's caches
+        self.db.watch_changes()
+        # Loaded once off the loop; config changes rebuild it where they are published
+        await self.adb.get_bot_config()
+
+        # Fair, event-driven dispatch of observer work (see src/controller/scheduler.py)
+        self.scheduler = pipeline.create_scheduler(self, self.db, self.plugin_manager)
 
     async def on_ready(self):
         print(f"Discord Bot is logged in as {self.user} (ID: {self.user.id})")
@@ -63,9 +78,22 @@ class Viel(discord.Client):
         print("Discord Bot is up and running.")
 
     async def on_message(self, message: discord.Message):
+        # Remembered and archived first, exactly as sent
+        reply_targets.remember(message)
+        await archive.on_message(self, message)
         # We pass the bot instance (self) and db instance (self.db) to the observer
         await observer.bot_behavior(message, self)
 
+    # --- Message archive: edits and deletes, cached or not ---
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        await archive.on_raw_message_edit(self, payload)
+
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        await archive.on_raw_message_delete(self, payload)
+
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        await archive.on_raw_bulk_message_delete(self, payload)
+
     # --- Context Menu Callbacks ---
     async def edit_message_context(self, interaction: discord.Interaction, message: discord.Message):
         if not message.webhook_id and message.author != self.user:
@@ -110,9 +138,6 @@ class Viel(discord.Client):
             if not token:
                 raise ValueError("Discord key is not set in the database.")
             
-            # Start background tasks
-            #asyncio.create_task(pipeline.think(self.db, self.queue))
-            
             # Run the bot
             super().run(token, *args, **kwargs)
         except Exception as e:
@@ -157,7 +182,7 @@ class EditMessageModal(discord.ui.Modal, title='Edit Message'):
             print(traceback.format_exc())
 
 class EditCaptionModal(discord.ui.Modal, title='Edit Image Caption'):
-    def __init__(self, original_message: discord.Message, db: Database):
+    def __init__(self, original_message: discord.Message, db: Storage):
         super().__init__()
         self.original_message = original_message
         self.db = db
@@ -183,7 +208,7 @@ class EditCaptionModal(discord.ui.Modal, title='Edit Image Caption'):
 
 # --- Slash Command Groups ---
 class CoreCommands(app_commands.Group):
-    def __init__(self, db: Database):
+    def __init__(self, db: Storage):
         super().__init__(name="aktiva", description="Main bot commands")
         self.db = db
 
@@ -204,7 +229,7 @@ class CoreCommands(app_commands.Group):
         await interaction.response.send_message(f"Channel '{interaction.channel.name}' has been successfully registered!", ephemeral=True)
 
 class ConfigCommands(app_commands.Group):
-    def __init__(self, db: Database):
+    def __init__(self, db: Storage):
         super().__init__(name="config", description="Channel configuration commands")
         self.db = db
 
@@ -227,7 +252,7 @@ class ConfigCommands(app_commands.Group):
         await interaction.response.send_message(f"Global note for this channel has been set.", ephemeral=True)
 
 class WhitelistCommands(app_commands.Group):
-    def __init__(self, db: Database):
+    def __init__(self, db: Storage):
         super().__init__(name="whitelist", description="Manage character whitelist for this channel")
         self.db = db
 
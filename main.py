@@ -10,8 +10,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 # --- Local Imports ---
-from api.routers import characters, servers, config, discord as discord_router, preset
-from api.db.database import Database
+from api.routers import characters, servers, config, discord as discord_router, preset, bulk, search, admin
+from api.db import backup, maintenance
+from api.db.database import Database, get_database, close_databases
 from src.plugins.manager import PluginManager
 
 # --- Default Data for First-Time Setup ---
@@ -60,7 +61,7 @@ async def initialize_database():
     This function runs once on application startup.
     """
     print("Checking database initialization status...")
-    db = Database()
+    db = get_database()
 
     # Use a flag in the config table to see if we've run this before.
     if db.get_config("db_initialized"):
@@ -126,6 +127,22 @@ app = FastAPI(
 async def startup_event():
     """Run the database initialization when the app starts."""
     await initialize_database()
+    db = get_database()
+    # Pick up edits made by the bot process (or another API worker / replica) sharing the database
+    db.watch_changes()
+    if isinstance(db, Database): # PostgreSQL does its own vacuuming; back it up with pg_dump
+        # Daily retention, vacuum and optimize (DATABASE_MAINTENANCE_HOUR)
+        maintenance.start_scheduler(db)
+        # Online backups every DATABASE_BACKUP_INTERVAL_HOURS
+        backup.start_scheduler(db)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled database connections so the WAL is checkpointed cleanly."""
+    maintenance.stop_scheduler()
+    backup.stop_scheduler()
+    close_databases()
 
 # Include routers
 app.include_router(characters.router)
@@ -133,6 +150,9 @@ app.include_router(servers.router)
 app.include_router(config.router)
 app.include_router(discord_router.router)
 app.include_router(preset.router)
+app.include_router(bulk.router)
+app.include_router(search.router)
+app.include_router(admin.router)
 
 # Set up CORS
 app.add_middleware(
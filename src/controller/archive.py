@@ -0,0 +1,74 @@
+# src/controller/archive.py
+"""
+Feeds the local message archive (api/db/archive.py) from the gateway.
+
+Only channels registered with the bot are archived (see archive.SCOPE); the
+check is a channel-cache lookup. Edits and deletes are handled through the raw
+events, which fire for every message, not only the ones still in discord.py's
+message cache, and go through the same check.
+"""
+
+import traceback
+from typing import Any, Dict
+
+import discord
+
+from api.db import archive
+
+
+def message_record(message: discord.Message) -> Dict[str, Any]:
+    """The archive record of a message, as sent (before the observer rewrites its content)."""
+    reference = message.reference
+    return {
+        "message_id": message.id,
+        "channel_id": message.channel.id,
+        "guild_id": message.guild.id if message.guild else None,
+        "author_id": message.author.id,
+        "author_name": message.author.display_name,
+        "is_bot": message.author.bot or bool(message.webhook_id),
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "reply_to": reference.message_id if reference else None,
+        "created_at": int(message.created_at.timestamp()),
+        "edited_at": int(message.edited_at.timestamp()) if message.edited_at else None,
+    }
+
+
+async def is_archived(bot, channel_id: int) -> bool:
+    """Whether messages in `channel_id` go into the archive."""
+    if not archive.ENABLED:
+        return False
+    if archive.SCOPE == "all":
+        return True
+    return await bot.adb.get_channel(str(channel_id)) is not None
+
+
+async def on_message(bot, message: discord.Message) -> None:
+    if not await is_archived(bot, message.channel.id):
+        return
+    try:
+        await bot.adb.archive_message(message_record(message))
+    except Exception as e:
+        print(f"Could not archive message {message.id}: {e}\n{traceback.format_exc()}")
+
+
+async def on_raw_message_edit(bot, payload: discord.RawMessageUpdateEvent) -> None:
+    if not await is_archived(bot, payload.channel_id):
+        return
+    try:
+        # The payload carries the whole edited message, so the row is simply replaced
+        await bot.adb.archive_message(message_record(payload.message))
+    except Exception as e:
+        print(f"Could not archive edit of message {payload.message_id}: {e}\n{traceback.format_exc()}")
+
+
+async def on_raw_message_delete(bot, payload: discord.RawMessageDeleteEvent) -> None:
+    if not await is_archived(bot, payload.channel_id):
+        return
+    await bot.adb.delete_archived_messages([payload.message_id])
+
+
+async def on_raw_bulk_message_delete(bot, payload: discord.RawBulkMessageDeleteEvent) -> None:
+    if not await is_archived(bot, payload.channel_id):
+        return
+    await bot.adb.delete_archived_messages(list(payload.message_ids))
@@ -7,23 +7,26 @@ import uuid
 from typing import Optional
 
 # Adjust import paths to match your project structure
-from api.db.database import Database
+from api.db.storage import Storage
+from api.db.async_database import AsyncDatabase
+from api.db import enrichments
 from api.models.models import BotConfig
 from src.utils.image_eval import describe_image
 from src.utils.web_eval import fetch_body
 from src.utils.discord_utils import extract_valid_urls
 
 
-def get_bot_config(db: Database) -> BotConfig:
-    """Helper to fetch all config key-values from the DB and return a BotConfig object."""
-    return BotConfig(**db.list_configs())
+def get_bot_config(db: Storage) -> BotConfig:
+    """Helper to return the shared BotConfig snapshot for this database."""
+    return db.get_bot_config()
 
 
 class _HistoryFormatter:
     """Internal class to fetch and format Discord message history for an AI model."""
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Storage):
         self.db = db
+        self.adb = AsyncDatabase.wrap(db)
         self.bot_config = get_bot_config(db)
 
     async def format_history(self, context: discord.abc.Messageable, limit: int = 100) -> str:
@@ -72,9 +75,8 @@ class _HistoryFormatter:
         if not message.attachments:
             return None
 
-        message_id_str = str(message.id)
         # 1. Always check the database first for an existing caption
-        caption = self.db.get_caption(message_id_str)
+        caption = await self.adb.get_enrichment(message.id, enrichments.IMAGE)
         if caption and "<ERROR>" not in caption:
             return caption
 
@@ -100,7 +102,7 @@ class _HistoryFormatter:
             
             # Save the new caption to the database for future use
             if new_caption and "<ERROR>" not in new_caption:
-                self.db.set_caption(message_id_str, new_caption)
+                await self.adb.set_enrichment(message.id, enrichments.IMAGE, new_caption)
             
             return new_caption
         finally:
@@ -110,16 +112,16 @@ class _HistoryFormatter:
     
     async def _get_link_caption(self, message: discord.Message) -> Optional[str]:
         """Gets a summary of links in a message. Checks database first."""
-        message_id_str = str(message.id)
-        # Check database first
-        caption = self.db.get_caption(message_id_str)
-        if caption:
-            return caption
-
         links = extract_valid_urls(message.content)
         if not links:
             return None
 
+        # Check database first; keyed by the links so an edited message is re-fetched
+        source = "\n".join(links)
+        caption = await self.adb.get_enrichment(message.id, enrichments.LINK, source)
+        if caption:
+            return caption
+
         tasks = [fetch_body(link) for link in links]
         captions = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -130,7 +132,7 @@ class _HistoryFormatter:
         new_caption = "<site_content>\n" + "\n".join(clean_captions) + "\n</site_content>"
 
         if new_caption and "<ERROR>" not in new_caption:
-            self.db.set_caption(message_id_str, new_caption)
+            await self.adb.set_enrichment(message.id, enrichments.LINK, new_caption, source)
 
         return new_caption
         
@@ -148,7 +150,7 @@ class _HistoryFormatter:
         return history[last_reset + len("[RESET]"):].strip() if last_reset != -1 else history.strip()
 
 # --- Public API Function ---
-async def get_history(context: discord.abc.Messageable, db: Database, limit: int = 100) -> str:
+async def get_history(context: discord.abc.Messageable, db: Storage, limit: int = 100) -> str:
     """
     The main entry point for fetching and formatting message history.
     It initializes and uses the internal _HistoryFormatter class.
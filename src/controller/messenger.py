@@ -6,9 +6,11 @@ import os
 from typing import List, Optional
 
 # Adjust import paths as needed
+from src.controller import reply_targets
 from src.models.queue import QueueItem
 from src.models.aicharacter import ActiveCharacter
 from api.models.models import BotConfig
+from api.db.async_database import AsyncDatabase
 from src.utils.image_embed import ImageGalleryView
 from src.utils.discord_utils import is_valid_url, is_local_file
 
@@ -19,9 +21,13 @@ class DiscordMessenger:
     def __init__(self, bot, message_chunk_size: int = 1999):
         self.bot = bot
         self.db = bot.db
-        self.bot_config = BotConfig(**self.db.list_configs())
         self.message_chunk_size = message_chunk_size
 
+    @property
+    def bot_config(self) -> BotConfig:
+        """The current config snapshot, so config edits apply without a restart."""
+        return self.db.get_bot_config()
+
     async def send_message(self, character: ActiveCharacter, message: discord.Message, queue_item: QueueItem):
         """Main method to route and send a message based on the queue item."""
         sanitized_item = self._sanitize_queue_item(queue_item)
@@ -87,7 +93,7 @@ class DiscordMessenger:
         # Use character data, fall back to default character's avatar if needed
         avatar_url = character.avatar
         if not avatar_url or str(avatar_url).lower() == "none":
-            default_char = self.db.get_character(self.bot_config.default_character)
+            default_char = await AsyncDatabase.wrap(self.db).get_character(self.bot_config.default_character)
             if default_char:
                 avatar_url = default_char.get('data', {}).get('avatar')
 
@@ -122,7 +128,9 @@ class DiscordMessenger:
             # send_kwargs["content"] = f"> {reply_to.author.mention}\n{content}"
             pass
 
-        await webhook.send(**send_kwargs)
+        # wait=True returns the sent message, so replies to it resolve without a fetch
+        sent = await webhook.send(wait=True, **send_kwargs)
+        reply_targets.remember(sent)
 
     async def _send_dm_message(self, queue_item: QueueItem, character: ActiveCharacter, author: discord.User):
         """Send message as a direct message."""
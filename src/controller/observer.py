@@ -1,16 +1,18 @@
 # src/controller/observer.py
 
-import re
 import discord
 # Adjust import paths as needed
+from src.controller import reply_targets, triggers
 from src.models.dimension import ActiveChannel
+from src.models.queue import BOT_TRIGGER, CHANNEL_TRIGGER, DM, MENTION, REPLY, TRIGGER, WorkItem
 from typing import TYPE_CHECKING
 
 
 async def bot_behavior(message: discord.Message, bot) -> None:
     """
     Observes incoming messages and decides if the bot should process them.
-    If a message is deemed relevant, it is placed on the processing queue.
+    If a message is deemed relevant, a WorkItem recording why is submitted to the
+    scheduler. The message itself is left untouched.
     """
     # 1. Basic Pre-checks
     # Ignore messages from the bot itself
@@ -20,87 +22,72 @@ async def bot_behavior(message: discord.Message, bot) -> None:
     # 2. Handle Direct Messages (DMs)
     if isinstance(message.channel, discord.DMChannel):
         print(f"DM received from {message.author.display_name}. Queuing for default character.")
-        await bot.queue.put(message)
+        bot.scheduler.submit(WorkItem(message, DM))
         return
 
     # 3. Handle Guild Messages
-    # Fetch the channel configuration from the database
-    channel = ActiveChannel.from_id(str(message.channel.id), bot.db)
+    # Fetch the channel configuration from the database (off the event loop).
+    # The matcher cache version is taken first, so a matcher built from a channel
+    # that changed meanwhile is not cached.
+    trigger_version = triggers.index.version()
+    channel_record = await bot.adb.get_channel(str(message.channel.id))
 
-    if not channel:
+    if not channel_record:
         return # Channel is not registered, so we ignore it.
+    channel = ActiveChannel(channel_record, bot.db)
 
     # # Reset the auto-reply counter if a human speaks
     # if not message.webhook_id:
     #     bot.auto_reply_count = 0
 
+    # One pass over the message with the channel's compiled triggers; the result
+    # travels with the message so the pipeline doesn't match again
+    matcher = await triggers.load_matcher(channel, bot.adb, trigger_version)
+    matched = matcher.match(message.content)
+
+    def work(reason: str, reply_to: str = None) -> WorkItem:
+        names = set(matched) | ({reply_to} if reply_to else set())
+        return WorkItem(message, reason, channel_record, [name for name in matcher.names if name in names], reply_to)
+
     # --- Determine if the bot should activate ---
 
     # A. Activated by direct mention
     if bot.user in message.mentions:
         print(f"Bot was mentioned by {message.author.display_name}. Queuing message.")
-        await bot.queue.put(message)
+        bot.scheduler.submit(work(MENTION))
         return
 
     # B. Activated by replying to a whitelisted character
     if message.reference and message.reference.message_id:
-        try:
-            replied_to_message = await message.channel.fetch_message(message.reference.message_id)
-            bot_name = replied_to_message.author.display_name
-            if bot_name in channel.whitelist:
-                print(f"User replied to whitelisted bot '{bot_name}'. Queuing message.")
-                message.content = f"[Replying To {bot_name}]\n{message.content}"
-                await bot.queue.put(message)
-                return
-        except discord.NotFound:
-            pass # Replied-to message might have been deleted
+        # Resolved from the gateway payload or local caches; REST only as a last resort
+        bot_name = await reply_targets.resolve_author(bot, message)
+        if bot_name in channel.whitelist:
+            print(f"User replied to whitelisted bot '{bot_name}'. Queuing message.")
+            bot.scheduler.submit(work(REPLY, bot_name))
+            return
 
-    
-# C. Activated by a user message containing a trigger word for a WHITELISTED character
+    # C. Activated by a user message containing a trigger word for a WHITELISTED character
     if not message.webhook_id:
-        if not channel.whitelist:
-            return  # Stop processing immediately.
-
-        characters_to_check = []
-        for name in channel.whitelist:
-            char_data = bot.db.get_character(name)
-            if char_data:
-                characters_to_check.append(char_data)
-
-        message_lower = message.content.lower()
-
-        current_channel_ref = "#" + channel.name.lower()
-
-        for char in characters_to_check:
-            # Grab triggers + the character's own name
-            name_trigger = char.get("name", "").lower()
-            triggers = [t.lower() for t in char.get("triggers", [])]
-
-            extended_triggers = triggers + ([name_trigger] if name_trigger else [])
-
-            for trigger in extended_triggers:
-                if not trigger:
-                    continue
+        # The first whitelisted character hit either way decides how the message is queued
+        for name in matcher.names:
+            # 1. Normal conversational trigger (word inside message)
+            if name in matched:
+                print(
+                    f"User message contained trigger '{matched[name]}' for whitelisted character '{name}'. Queuing message."
+                )
+                bot.scheduler.submit(work(TRIGGER))
+                bot.auto_reply_count = 0
+                return
 
-                # 1. Normal conversational trigger (word inside message)
-                if re.search(r'\b' + re.escape(trigger) + r'\b', message_lower):
-                    print(
-                        f"User message contained trigger '{trigger}' for whitelisted character '{char['name']}'. Queuing message."
-                    )
-                    await bot.queue.put(message)
-                    bot.auto_reply_count = 0
-                    return 
-                
-                # 2. Perma-channel trigger (Exact Match)
-                # Matches ONLY if the trigger is exactly the channel name with hash (e.g., "#general")
-                elif trigger == current_channel_ref:
-                    print(
-                        f"Current channel '{current_channel_ref}' matches trigger for character '{char['name']}'. Queuing message."
-                    )
-                    message.content = f"[Replying To {char['name']}]\n{message.content}"
-                    await bot.queue.put(message)
-                    bot.auto_reply_count = 0
-                    return
+            # 2. Perma-channel trigger (Exact Match)
+            # Matches ONLY if the trigger is exactly the channel name with hash (e.g., "#general")
+            if name in matcher.channel_triggered:
+                print(
+                    f"Current channel '#{channel.name.lower()}' matches trigger for character '{name}'. Queuing message."
+                )
+                bot.scheduler.submit(work(CHANNEL_TRIGGER, name))
+                bot.auto_reply_count = 0
+                return
 
     # D. Activated by another bot's message (bot-to-bot interaction)
     if message.webhook_id:
@@ -112,34 +99,12 @@ async def bot_behavior(message: discord.Message, bot) -> None:
             print(f"Global auto-reply cap of {cap} reached. Ignoring bot message from '{message.author.display_name}'.")
             return
             
-        # --- FIXED LOGIC STARTS HERE ---
-        # Now, respect the channel's whitelist for bot-to-bot messages
-        if not channel.whitelist:
-            return # No whitelisted characters, nothing to do.
-
-        characters_to_check = []
-        for name in channel.whitelist:
-            char_data = bot.db.get_character(name)
-            if char_data:
-                characters_to_check.append(char_data)
-
-        message_lower = message.content.lower()
-
-        for char in characters_to_check:
-            # Grab triggers + the character's own name (same as user logic)
-            name_trigger = char.get("name", "").lower()
-            triggers = [t.lower() for t in char.get("triggers", [])]
-            extended_triggers = triggers + ([name_trigger] if name_trigger else [])
-
-            for trigger in extended_triggers:
-                if not trigger:
-                    continue
-                # Use the same precise regex check
-                if re.search(r'\b' + re.escape(trigger) + r'\b', message_lower):
-                    print(
-                        f"Bot '{message.author.display_name}' used trigger '{trigger}' for whitelisted character '{char['name']}'. Queuing message."
-                    )
-                    # Increment the GLOBAL counter for bot-to-bot talk
-                    bot.auto_reply_count += 1
-                    await bot.queue.put(message)
-                    return # Stop after the first match
\ No newline at end of file
+        # Only whitelisted characters are matched, so bot-to-bot talk respects the whitelist
+        if matched:
+            name, trigger = next(iter(matched.items()))
+            print(
+                f"Bot '{message.author.display_name}' used trigger '{trigger}' for whitelisted character '{name}'. Queuing message."
+            )
+            # Increment the GLOBAL counter for bot-to-bot talk
+            bot.auto_reply_count += 1
+            bot.scheduler.submit(work(BOT_TRIGGER))
@@ -1,64 +1,47 @@
 # src/controller/think.py
 
 import asyncio
-import re
 import traceback
 import discord
+from typing import Optional
+from src.controller import triggers
 from src.controller.messenger import DiscordMessenger
+from src.controller.scheduler import Scheduler
 from src.models.aicharacter import ActiveCharacter
 from src.models.dimension import ActiveChannel
 from src.models.prompts import PromptEngineer
-from src.models.queue import QueueItem
+from src.models.queue import DM, MENTION, QueueItem, WorkItem
 from src.plugins.manager import PluginManager
 from src.utils.llm_new import generate_response
 from api.models.models import BotConfig
-from api.db.database import Database
+from api.db.storage import Storage
+from api.db.async_database import AsyncDatabase
+from api.db.message_context import MessageContext
 
 # --- HELPER FUNCTIONS FOR MULTI-CHARACTER LOGIC ---
 
-def find_all_triggered_characters(message: discord.Message, channel: ActiveChannel, db: Database) -> list[ActiveCharacter]:
+def find_all_triggered_characters(message: discord.Message, channel: ActiveChannel, db: Storage, whitelisted: Optional[list[dict]] = None) -> list[ActiveCharacter]:
     """
     Scans a message to find ALL whitelisted characters triggered by keywords.
     Instead of returning names, it returns a list of instantiated ActiveCharacter objects.
+    Pass `whitelisted` (the channel's character records) if they are already loaded.
     """
     if not channel.whitelist:
         return []
-
-    triggered_characters = []
-    # Use a set to prevent adding the same character twice if multiple of their triggers match
-    triggered_names = set() 
-    message_lower = message.content.lower()
-
-    for name in channel.whitelist:
-        char_data = db.get_character(name)
-        if not char_data or char_data['name'] in triggered_names:
-            continue
-
-        name_trigger = char_data.get("name", "").lower()
-        raw_triggers = char_data.get("triggers") or []
-        triggers = [t.lower() for t in raw_triggers]
-        extended_triggers = triggers + ([name_trigger] if name_trigger else [])
-
-        for trigger in extended_triggers:
-            if not trigger:
-                continue
-            # Use whole-word matching for better accuracy
-            if re.search(r'\b' + re.escape(trigger) + r'\b', message_lower):
-                # We found a match, so create the character object and add it
-                triggered_characters.append(ActiveCharacter(char_data, db))
-                triggered_names.add(char_data['name'])
-                break # Move to the next character in the whitelist
-
-    return triggered_characters
+    # Compiled once per channel whitelist (see triggers.py); `whitelisted` only fills a cache miss
+    matcher = triggers.matcher_for(channel, db, whitelisted)
+    return [ActiveCharacter(matcher.record(name), db) for name in matcher.match(message.content)]
 
 
 async def _generate_and_send_for_character(
     character: ActiveCharacter, # Now we pass the full object
-    viel, db: Database, 
+    viel, db: Storage, 
     message: discord.Message, 
     channel: ActiveChannel,
     messenger: DiscordMessenger,
-    plugin_manager: PluginManager
+    plugin_manager: PluginManager,
+    context: Optional[MessageContext] = None,
+    reply_to: Optional[str] = None
 ):
     """
     Contains the core logic for generating and sending a message for ONE character.
@@ -69,7 +52,7 @@ async def _generate_and_send_for_character(
 
     print(f"Processing chat for {character.name} in {channel.name}...")
     
-    prompter = PromptEngineer(character, message, channel, plugin_manager, messenger)
+    prompter = PromptEngineer(character, message, channel, plugin_manager, messenger, context)
     prompt = await prompter.create_prompt()
 
     queue_item = QueueItem(
@@ -77,7 +60,8 @@ async def _generate_and_send_for_character(
         bot=character.name,
         user=message.author.display_name,
         stop=prompter.stopping_strings,
-        message=message
+        message=message,
+        reply_to=reply_to
     )
     
     queue_item = await generate_response(queue_item, db)
@@ -89,41 +73,63 @@ async def _generate_and_send_for_character(
     await messenger.send_message(character, message, queue_item)
 
 
+def resolve_characters(item: WorkItem, channel: ActiveChannel, db: Storage, context: MessageContext) -> list[ActiveCharacter]:
+    """
+    The characters that answer a work item: the ones the observer matched, or for
+    items it could not match (DMs), a fresh trigger scan. Falls back to the default
+    character for DMs and mentions.
+    """
+    whitelisted = list(context.characters)
+    if item.characters is None:
+        characters = find_all_triggered_characters(item.message, channel, db, whitelisted)
+    else:
+        records = {char["name"]: char for char in whitelisted}
+        characters = [ActiveCharacter(records[name], db) for name in item.characters if name in records]
+
+    # If no triggers were found, check for fallbacks (mentions, DMs, etc.)
+    if not characters and item.reason in (DM, MENTION) and context.default_character:
+        characters.append(ActiveCharacter(context.default_character, db))
+    return characters
+
+
 # --- CORRECT WORKER FUNCTION ---
-async def process_message(viel, db: Database, message: discord.Message, messenger: DiscordMessenger, queue: asyncio.Queue, plugin_manager:PluginManager):
+async def process_message(viel, db: Storage, item: WorkItem, messenger: DiscordMessenger, plugin_manager:PluginManager):
+    message = item.message
+
+    # All DB access below goes through the DB thread so the gateway loop never blocks
+    adb = AsyncDatabase.wrap(db)
     try:
-        bot_config = BotConfig(**db.list_configs())
+        # Whitelisted characters, default character, preset and config in one go
+        # (the channel record comes from the observer for guild messages)
+        context = await adb.load_message_context(str(message.channel.id), message.author.name)
 
         # --- 1. Load Channel ---
         is_dm = isinstance(message.channel, discord.DMChannel)
         if is_dm:
-            if message.author.name not in (bot_config.dm_list or []):
+            if not context.dm_allowed:
                 await message.channel.send("🚫 You do not have permission to talk to this bot in DM.")
                 return
-            channel = ActiveChannel.from_dm(message.channel, message.author, db)
+            if context.channel:
+                channel = ActiveChannel(context.channel, db)
+            else:
+                channel = await adb.run(ActiveChannel.from_dm, message.channel, message.author, db)
         else:
-            channel = ActiveChannel.from_id(str(message.channel.id), db)
+            record = item.channel or context.channel
+            channel = ActiveChannel(record, db) if record else None
 
         if not channel:
             return
 
+        if item.coalesced:
+            print(f"Answering a burst of {item.coalesced + 1} messages in {channel.name} with one reply.")
         await message.add_reaction('✨')
 
         # --- 2. Determine ALL Characters to Respond ---
-        responding_characters = find_all_triggered_characters(message, channel, db)
-        
-        # If no triggers were found, check for fallbacks (mentions, DMs, etc.)
-        if not responding_characters:
-            is_mention = message.guild and message.guild.me in message.mentions
-            if (is_dm or is_mention) and bot_config.default_character:
-                char_data = db.get_character(bot_config.default_character)
-                if char_data:
-                    # Create the default character and add it to our list
-                    responding_characters.append(ActiveCharacter(char_data, db))
+        responding_characters = resolve_characters(item, channel, db, context)
 
         if not responding_characters:
             # If still no one to respond, SOMETHING IS WRONG
-            print("Something Is Wrong, Observer Found But Pipeline Don't")
+            print(f"Something Is Wrong, Observer Found ({item.reason}) But Pipeline Don't")
             try:
                 await message.remove_reaction('✨', viel.user)
             except discord.NotFound: 
@@ -134,7 +140,7 @@ async def process_message(viel, db: Database, message: discord.Message, messenge
         generation_tasks = []
         for character in responding_characters:
             task = _generate_and_send_for_character(
-                character, viel, db, message, channel, messenger, plugin_manager
+                character, viel, db, message, channel, messenger, plugin_manager, context, item.reply_to
             )
             generation_tasks.append(task)
         
@@ -152,47 +158,21 @@ async def process_message(viel, db: Database, message: discord.Message, messenge
         try:
             await message.add_reaction('❌')
         except: pass
-    
-    finally:
-        # Mark the single queue item as done after all characters have responded.
-        queue.task_done()
 
-# --- MANAGER FUNCTION (This part was already correct) ---
-async def think(viel, db: Database, queue: asyncio.Queue, plugin_manager:PluginManager) -> None:
+# --- SCHEDULER ---
+def create_scheduler(viel, db: Storage, plugin_manager: PluginManager) -> Scheduler:
+    """The scheduler the observer submits work to; `concurrency` and `coalesce_ms` are re-read from the config snapshot."""
     messenger = DiscordMessenger(viel)
-    
-    # Keep track of running tasks
-    background_tasks = set()
-
-    print("🧠 AI Core started. Waiting for messages...")
 
-    while True:
-        # 1. Clean up finished tasks
-        background_tasks = {t for t in background_tasks if not t.done()}
+    async def worker(item: WorkItem):
+        await process_message(viel, db, item, messenger, plugin_manager)
 
-        # 2. Get dynamic config
-        try:
-            bot_config = BotConfig(**db.list_configs())
-            concurrency_limit = bot_config.concurrency
-            if concurrency_limit < 1: 
-                concurrency_limit = 1
-        except Exception:
-            concurrency_limit = 1
-
-        # 3. Check Concurrency Limit
-        if len(background_tasks) >= concurrency_limit:
-            await asyncio.wait(background_tasks, return_when=asyncio.FIRST_COMPLETED)
-            continue 
-
-        # 4. Get Message
-        message: discord.Message = await queue.get()
-
-        # 5. Spawn Worker
-        task = asyncio.create_task(
-            process_message(viel, db, message, messenger, queue,plugin_manager)
-        )
-        
-        background_tasks.add(task)
+    print("🧠 AI Core started. Waiting for messages...")
+    return Scheduler(
+        worker,
+        limit=lambda: db.get_bot_config().concurrency,
+        coalesce=lambda: db.get_bot_config().coalesce_ms / 1000,
+    )
 
 def clean_up(queue_item: QueueItem) -> QueueItem:
     """
@@ -0,0 +1,112 @@
+# src/controller/reply_targets.py
+"""
+Finds who a reply is addressed to without a REST call whenever possible.
+
+The observer needs the display name of the replied-to message's author to
+decide whether a whitelisted character was addressed. Sources, cheapest first:
+1. `message.reference.resolved`, which Discord sends along with most replies;
+2. discord.py's own message cache;
+3. `recent_authors`, a bounded LRU of message id -> author display name filled
+   from every incoming message and every webhook message the bot sends;
+4. the local message archive (api/db/archive.py);
+5. `fetch_message`, as the last resort.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import discord
+
+# Message ids remembered by recent_authors.
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "4096"))
+
+_SOURCES = ("resolved", "client_cache", "recent", "archive", "rest", "not_found")
+
+
+class RecentAuthors:
+    """A thread-safe LRU of message id -> author display name."""
+
+    def __init__(self, max_entries: int = REPLY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._names: "OrderedDict[int, str]" = OrderedDict()
+        self.lookups = {source: 0 for source in _SOURCES}
+
+    def remember(self, message_id: int, author_name: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._names[message_id] = author_name
+            self._names.move_to_end(message_id)
+            while len(self._names) > self.max_entries:
+                self._names.popitem(last=False)
+
+    def get(self, message_id: int) -> Optional[str]:
+        with self._lock:
+            name = self._names.get(message_id)
+            if name is not None:
+                self._names.move_to_end(message_id)
+            return name
+
+    def count(self, source: str):
+        with self._lock:
+            self.lookups[source] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._names), "max_entries": self.max_entries, "lookups": dict(self.lookups)}
+
+
+recent_authors = RecentAuthors()
+
+
+def remember(message: discord.Message):
+    """Records the author of a message the bot saw or sent."""
+    recent_authors.remember(message.id, message.author.display_name)
+
+
+async def resolve_author(bot, message: discord.Message) -> Optional[str]:
+    """Display name of the author of the message `message` replies to, or None if it is gone."""
+    reference = message.reference
+    if reference is None or reference.message_id is None:
+        return None
+
+    # 1. Sent along with the reply
+    resolved = reference.resolved
+    if isinstance(resolved, discord.Message):
+        recent_authors.count("resolved")
+        return resolved.author.display_name
+    if isinstance(resolved, discord.DeletedReferencedMessage):
+        recent_authors.count("not_found")
+        return None
+
+    # 2. discord.py's message cache
+    cached = reference.cached_message
+    if cached is not None:
+        recent_authors.count("client_cache")
+        return cached.author.display_name
+
+    # 3. Messages seen or sent recently
+    name = recent_authors.get(reference.message_id)
+    if name is not None:
+        recent_authors.count("recent")
+        return name
+
+    # 4. The local archive
+    archived = await bot.adb.get_archived_message(reference.message_id)
+    if archived:
+        recent_authors.count("archive")
+        recent_authors.remember(reference.message_id, archived["author_name"])
+        return archived["author_name"]
+
+    # 5. Ask Discord
+    try:
+        replied_to = await message.channel.fetch_message(reference.message_id)
+    except discord.NotFound:
+        recent_authors.count("not_found")
+        return None # Replied-to message might have been deleted
+    recent_authors.count("rest")
+    remember(replied_to)
+    return replied_to.author.display_name
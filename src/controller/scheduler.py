@@ -0,0 +1,221 @@
+# src/controller/scheduler.py
+"""
+Fair scheduling of observer work items onto generation workers.
+
+- A global limit on running workers, read from the config's `concurrency`. It
+  resizes live: a config change wakes the scheduler, which starts more work at
+  once when the limit grew, and lets running work finish when it shrank.
+- One FIFO sub-queue per channel. Channels with waiting work take turns
+  (round-robin), so a burst in one channel queues behind itself, not in front
+  of everyone else.
+- A per-channel cap on running work (SCHEDULER_CHANNEL_LIMIT; 0 = half the
+  global limit, at least 1), so one channel can't hold every slot while a quiet
+  channel waits for a long generation to finish.
+- Optional burst coalescing (the config's `coalesce_ms`, 0 = off). An item is
+  held for that long; if another message for the same channel and characters
+  arrives meanwhile, the newer one replaces it and the wait restarts, up to
+  SCHEDULER_COALESCE_MAX_WINDOWS windows after the first message. Items still
+  waiting in a channel queue are replaced the same way. Three quick messages
+  then cost one generation that answers the last of them (the earlier ones are
+  in the channel history it reads).
+
+Nothing polls: work starts when an item is submitted, when a worker finishes,
+when a held burst is released, or when the config changes.
+"""
+
+import asyncio
+import os
+import traceback
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+from api.db import events
+from api.db.events import bus
+from src.models.queue import WorkItem
+
+# Maximum running work items per channel (0 = half the global limit, at least 1).
+CHANNEL_LIMIT = int(os.getenv("SCHEDULER_CHANNEL_LIMIT", "0"))
+# A burst is released at the latest this many coalescing windows after its first message.
+COALESCE_MAX_WINDOWS = float(os.getenv("SCHEDULER_COALESCE_MAX_WINDOWS", "4"))
+
+Worker = Callable[[WorkItem], Awaitable[Any]]
+
+
+class Scheduler:
+    """Round-robin per-channel queues drained by at most `limit()` concurrent workers."""
+
+    def __init__(self, worker: Worker, limit: Callable[[], int], channel_limit: int = CHANNEL_LIMIT,
+                 coalesce: Callable[[], float] = lambda: 0.0):
+        self._worker = worker
+        self._limit = limit
+        self._channel_limit = channel_limit
+        self._coalesce = coalesce
+        # Bursts being held back: burst key -> [latest item, first arrival, release timer]
+        self._held: Dict[tuple, list] = {}
+        self._queues: Dict[Hashable, Deque[WorkItem]] = {}
+        # Channels with queued work that may start more, in turn order (an ordered set)
+        self._turns: "OrderedDict[Hashable, None]" = OrderedDict()
+        self._in_flight: Dict[Hashable, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._unsubscribe = bus.subscribe(events.CONFIG_CHANGED, self._on_config_change)
+        self.stats = {
+            "submitted": 0, "started": 0, "finished": 0, "errors": 0, "coalesced": 0,
+            "total_wait": 0.0, "max_wait": 0.0, "max_queued": 0,
+        }
+
+    # --- Limits ---
+    def limit(self) -> int:
+        try:
+            return max(1, int(self._limit() or 1))
+        except Exception:
+            return 1
+
+    def channel_limit(self, limit: Optional[int] = None) -> int:
+        if self._channel_limit > 0:
+            return self._channel_limit
+        return max(1, (limit or self.limit()) // 2)
+
+    def coalesce_window(self) -> float:
+        """Seconds a burst is held back (0 = coalescing off)."""
+        try:
+            return max(0.0, float(self._coalesce() or 0))
+        except Exception:
+            return 0.0
+
+    # --- Submitting ---
+    def submit(self, item: WorkItem):
+        """
+        Queues `item` on its channel and starts it right away if a slot is free, or
+        with coalescing on, folds it into its burst.
+        """
+        self._loop = self._loop or asyncio.get_running_loop()
+        self.stats["submitted"] += 1
+        window = self.coalesce_window()
+        if window <= 0:
+            self._enqueue(item)
+            return
+
+        # A queued item of the same burst hasn't started yet: answer this one instead
+        burst = item.burst_key()
+        queue = self._queues.get(item.message.channel.id, ())
+        for i, queued in enumerate(queue):
+            if queued.burst_key() == burst:
+                queue[i] = item.absorb(queued)
+                self.stats["coalesced"] += 1
+                return
+
+        now = self._loop.time()
+        held = self._held.get(burst)
+        if held is None:
+            held = self._held[burst] = [item, now, None]
+        else:
+            held[0] = item.absorb(held[0])
+            held[2].cancel()
+            self.stats["coalesced"] += 1
+        delay = min(window, held[1] + window * COALESCE_MAX_WINDOWS - now)
+        held[2] = self._loop.call_later(max(0.0, delay), self._release, burst)
+
+    def _release(self, burst: tuple):
+        held = self._held.pop(burst, None)
+        if held is not None:
+            self._enqueue(held[0])
+
+    def _enqueue(self, item: WorkItem):
+        key = item.message.channel.id
+        self._queues.setdefault(key, deque()).append(item)
+        self._turns.setdefault(key, None)
+        self.stats["max_queued"] = max(self.stats["max_queued"], self.queued())
+        self._dispatch()
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def held(self) -> int:
+        return len(self._held)
+
+    def running(self) -> int:
+        return sum(self._in_flight.values())
+
+    # --- Dispatching ---
+    def _dispatch(self):
+        """Starts queued work, one item per channel per turn, until the limit is reached."""
+        limit = self.limit()
+        channel_limit = self.channel_limit(limit)
+        running = self.running()
+        skipped = []
+        while running < limit and self._turns:
+            key, _ = self._turns.popitem(last=False)
+            if self._in_flight.get(key, 0) >= channel_limit:
+                skipped.append(key)
+                continue
+            self._start(key, self._queues[key].popleft())
+            running += 1
+            if self._queues[key]:
+                self._turns[key] = None # Back of the line
+            else:
+                del self._queues[key]
+        # Channels at their cap keep their place in line
+        for key in reversed(skipped):
+            self._turns[key] = None
+            self._turns.move_to_end(key, last=False)
+
+    def _start(self, key: Hashable, item: WorkItem):
+        wait = item.wait()
+        self.stats["started"] += 1
+        self.stats["total_wait"] += wait
+        self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        task = asyncio.create_task(self._run(key, item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, item: WorkItem):
+        try:
+            await self._worker(item)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Error in scheduled work for channel {key}: {e}\n{traceback.format_exc()}")
+        finally:
+            self.stats["finished"] += 1
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            self._dispatch()
+
+    def _on_config_change(self, event: events.ChangeEvent):
+        # Published from whichever thread wrote the config; the limit may have changed
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch)
+
+    # --- Shutdown ---
+    async def close(self, timeout: Optional[float] = None):
+        """Stops taking config wakeups, drops held bursts and waits (up to `timeout`) for running work."""
+        self._unsubscribe()
+        for _, _, timer in self._held.values():
+            timer.cancel()
+        self._held.clear()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    # --- Stats ---
+    def get_stats(self) -> Dict[str, Any]:
+        started = self.stats["started"]
+        return {
+            "limit": self.limit(),
+            "channel_limit": self.channel_limit(),
+            "coalesce_ms": round(self.coalesce_window() * 1000),
+            "running": self.running(),
+            "queued": self.queued(),
+            "held": self.held(),
+            "queued_by_channel": {str(key): len(queue) for key, queue in self._queues.items()},
+            "running_by_channel": {str(key): count for key, count in self._in_flight.items()},
+            "submitted": self.stats["submitted"],
+            "started": started,
+            "finished": self.stats["finished"],
+            "errors": self.stats["errors"],
+            "coalesced": self.stats["coalesced"],
+            "max_queued": self.stats["max_queued"],
+            "avg_wait_ms": round(self.stats["total_wait"] / started * 1000, 3) if started else None,
+            "max_wait_ms": round(self.stats["max_wait"] * 1000, 3),
+        }
@@ -0,0 +1,197 @@
+# src/controller/triggers.py
+"""
+Per-channel trigger matching for the observer and the pipeline.
+
+A `TriggerMatcher` folds every trigger (and name) of a channel's whitelisted
+characters into one compiled regex, so a message is scanned once no matter how
+many characters and triggers the channel has. Matching keeps the old rules:
+lowercased text, whole words (`\\b` on both sides), every character whose
+trigger appears anywhere in the message.
+
+Matchers are cached per channel and dropped when the channel (its whitelist or
+name) or one of its characters changes, through the same change events that
+keep the entity caches fresh. Chatter that triggers nobody costs one regex
+search against a cached pattern.
+"""
+
+import copy
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from api.db.events import ChangeEvent, bus
+
+
+class TriggerMatcher:
+    """All triggers of one channel's whitelist, compiled into a single pattern."""
+
+    def __init__(self, characters: List[Dict[str, Any]], channel_name: str = "", whitelist: Optional[List[str]] = None):
+        # Character names in whitelist order; results come back in this order
+        self.names: List[str] = [char["name"] for char in characters]
+        # Names the cache listens for: whitelisted ones that don't exist yet too
+        self.watched = set(self.names) | set(whitelist or [])
+        self._records = {char["name"]: char for char in characters}
+        self._position = {name: i for i, name in enumerate(self.names)}
+
+        owners: Dict[str, List[str]] = {}
+        channel_ref = "#" + channel_name.lower() if channel_name else None
+        self.channel_triggered: List[str] = []
+        for char in characters:
+            name = char["name"]
+            for trigger in [t.lower() for t in (char.get("triggers") or [])] + [name.lower()]:
+                if not trigger:
+                    continue
+                owners.setdefault(trigger, [])
+                if name not in owners[trigger]:
+                    owners[trigger].append(name)
+                # Perma-channel trigger: the trigger is exactly "#<this channel>"
+                if trigger == channel_ref and name not in self.channel_triggered:
+                    self.channel_triggered.append(name)
+        self._owners = owners
+
+        # Longest first, so at each position the alternation tries the longest trigger
+        # first; shorter triggers that also match there are found through _implied.
+        ordered = sorted(owners, key=len, reverse=True)
+        self._implied: Dict[str, List[str]] = {trigger: [] for trigger in ordered}
+        for trigger in ordered:
+            for shorter in ordered:
+                if len(shorter) < len(trigger) and trigger.startswith(shorter) \
+                        and _word_boundary(trigger[len(shorter) - 1], trigger[len(shorter)]):
+                    self._implied[trigger].append(shorter)
+
+        alternation = "|".join(re.escape(trigger) for trigger in ordered)
+        # _any: does anything match at all (the common, negative case)
+        # _scan: zero-width, so overlapping triggers are all seen in one pass
+        self._any = re.compile(r"\b(?:" + alternation + r")\b") if ordered else None
+        self._scan = re.compile(r"(?=\b(" + alternation + r")\b)") if ordered else None
+
+    def match(self, text: str) -> Dict[str, str]:
+        """Whitelisted characters triggered by `text` (name -> a matching trigger), in whitelist order."""
+        if self._any is None:
+            return {}
+        text = text.lower()
+        if not self._any.search(text):
+            return {}
+        found: Dict[str, str] = {}
+        for m in self._scan.finditer(text):
+            trigger = m.group(1)
+            for hit in [trigger] + self._implied[trigger]:
+                for name in self._owners[hit]:
+                    found.setdefault(name, hit)
+            if len(found) == len(self.names):
+                break
+        return {name: found[name] for name in sorted(found, key=self._position.__getitem__)}
+
+    def record(self, name: str) -> Dict[str, Any]:
+        """A copy of the character record this matcher was built from."""
+        return copy.deepcopy(self._records[name])
+
+
+def _word_boundary(before: str, after: str) -> bool:
+    """True if `\\b` holds between the characters `before` and `after`."""
+    return _is_word(before) != _is_word(after)
+
+
+def _is_word(char: str) -> bool:
+    return bool(re.match(r"\w", char))
+
+
+# ------------------------------------------------------
+# Per-channel cache
+# ------------------------------------------------------
+
+class TriggerIndex:
+    """Channel id -> TriggerMatcher, invalidated by channel and character changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matchers: Dict[str, TriggerMatcher] = {}
+        # Bumped by every invalidation; builds that started before a bump are discarded.
+        self._version = 0
+        self.hits = 0
+        self.builds = 0
+
+    def version(self) -> int:
+        """Take this before reading the channel and the characters to build a matcher from."""
+        return self._version
+
+    def get(self, channel_id: str) -> Optional[TriggerMatcher]:
+        with self._lock:
+            matcher = self._matchers.get(channel_id)
+            self.hits += int(matcher is not None)
+            return matcher
+
+    def build(self, channel, characters: List[Dict[str, Any]], version: int) -> TriggerMatcher:
+        """Compiles a matcher for `channel` (an ActiveChannel) and caches it unless it went stale."""
+        matcher = TriggerMatcher(characters, channel.name, channel.whitelist)
+        with self._lock:
+            self.builds += 1
+            if version == self._version:
+                self._matchers[channel.channel_id] = matcher
+        return matcher
+
+    def invalidate_channel(self, channel_id: Optional[str]):
+        with self._lock:
+            self._version += 1
+            if channel_id is None:
+                self._matchers.clear()
+            else:
+                self._matchers.pop(channel_id, None)
+
+    def invalidate_character(self, name: Optional[str]):
+        with self._lock:
+            self._version += 1
+            if name is None:
+                self._matchers.clear()
+                return
+            for channel_id in [cid for cid, matcher in self._matchers.items() if name in matcher.watched]:
+                del self._matchers[channel_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._matchers), "hits": self.hits, "builds": self.builds}
+
+
+index = TriggerIndex()
+
+
+def matcher_for(channel, db, characters: Optional[List[Dict[str, Any]]] = None,
+                version: Optional[int] = None) -> TriggerMatcher:
+    """
+    The cached matcher of an ActiveChannel. On a miss it is built from `characters`
+    if given, else from characters loaded from `db`. It is cached only with the
+    `version` (index.version()) taken before the channel was read: without it, the
+    channel or the characters may predate a change.
+    """
+    matcher = index.get(channel.channel_id)
+    if matcher is not None:
+        return matcher
+    if characters is None:
+        characters = db.get_characters(channel.whitelist) if channel.whitelist else []
+    if version is None:
+        return TriggerMatcher(characters, channel.name, channel.whitelist)
+    return index.build(channel, characters, version)
+
+
+async def load_matcher(channel, adb, version: int) -> TriggerMatcher:
+    """
+    matcher_for() for coroutines: a miss loads the characters through the
+    AsyncDatabase. `version` is index.version(), taken before the channel was read.
+    """
+    matcher = index.get(channel.channel_id)
+    if matcher is None:
+        characters = await adb.get_characters(channel.whitelist) if channel.whitelist else []
+        matcher = index.build(channel, characters, version)
+    return matcher
+
+
+def _on_channel_change(event: ChangeEvent):
+    index.invalidate_channel(event.key)
+
+
+def _on_character_change(event: ChangeEvent):
+    index.invalidate_character(event.key)
+
+
+bus.subscribe("channel.*", _on_channel_change)
+bus.subscribe("character.*", _on_character_change)
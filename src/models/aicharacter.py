@@ -2,9 +2,9 @@ from __future__ import annotations
 from typing import Optional, List, Dict, Any
 
 # Assuming your database class is in a file that can be imported
-# from api.db.database import Database
+# from api.db.storage import Storage
 # For standalone testing, we'll include a placeholder.
-from api.db.database import Database  # Adjust this import path to match your project structure
+from api.db.storage import Storage  # Adjust this import path to match your project structure
 
 
 class ActiveCharacter:
@@ -14,7 +14,7 @@ class ActiveCharacter:
     the corresponding character data from the database.
     """
 
-    def __init__(self, character_data: Dict[str, Any], db: Database):
+    def __init__(self, character_data: Dict[str, Any], db: Storage):
         """
         Initializes an ActiveCharacter instance from a dictionary of character data.
         This constructor should typically be called by the `from_message` classmethod.
@@ -35,7 +35,7 @@ class ActiveCharacter:
         self.info: Optional[str] = data.get('info', None)
 
     @classmethod
-    def from_message(cls, text: str, db: Database) -> Optional[ActiveCharacter]:
+    def from_message(cls, text: str, db: Storage) -> Optional[ActiveCharacter]:
         """
         Returns the character whose name or trigger appears earliest in the text.
         """
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import Optional, List, Dict, Any
 import discord
-from api.db.database import Database
+from api.db.storage import Storage
 
 # A constant ID for your virtual DM server
 DM_SERVER_ID = "DM_VIRTUAL_SERVER"
@@ -11,7 +11,7 @@ class ActiveChannel:
     Represents the configuration for a specific, active channel.
     """
 
-    def __init__(self, channel_record: Dict[str, Any], db: Database):
+    def __init__(self, channel_record: Dict[str, Any], db: Storage):
         self.db = db
         
         self.channel_id: str = channel_record['channel_id']
@@ -27,20 +27,26 @@ class ActiveChannel:
         self.is_system_channel: bool = data.get('is_system_channel', False)
 
     @classmethod
-    def from_id(cls, channel_id: str, db: Database) -> Optional[ActiveChannel]:
+    def from_id(cls, channel_id: str, db: Storage) -> Optional[ActiveChannel]:
         channel_record = db.get_channel(channel_id)
         if channel_record:
             return cls(channel_record, db)
         return None
 
     @classmethod
-    def from_dm(cls, dm_channel: discord.DMChannel, user: discord.User, db: Database) -> ActiveChannel:
+    def from_dm(cls, dm_channel: discord.DMChannel, user: discord.User, db: Storage) -> ActiveChannel:
         """
         Gets a DM channel from the DB. 
         Uses the explicit 'user' object to ensure we get the correct name.
         """
         
-        # 1. Ensure the Virtual DM Server exists
+        # 1. Try to find this specific DM channel (usually answered by the entity cache)
+        channel_id = str(dm_channel.id)
+        channel_record = db.get_channel(channel_id)
+        if channel_record:
+            return cls(channel_record, db)
+
+        # 2. Ensure the Virtual DM Server exists
         # The Foreign Key constraint requires the server to exist BEFORE the channel is created.
         server = db.get_server(DM_SERVER_ID)
         if not server:
@@ -52,34 +58,29 @@ class ActiveChannel:
                 instruction=""
             )
 
-        # 2. Try to find this specific DM channel
-        channel_id = str(dm_channel.id)
+        # 3. It doesn't exist yet, so create it
+        print(f"New DM detected. Registering channel {channel_id} to database.")
+        
+        user_name = user.name
+        
+        new_data = {
+            "name": f"DM with {user_name}",
+            "description": f"Private Direct Message history with {user_name}",
+            "global": None,
+            "instruction": None, 
+            "whitelist": [],
+            "is_system_channel": False
+        }
+        
+        db.create_channel(
+            channel_id=channel_id, 
+            server_id=DM_SERVER_ID, 
+            server_name="Direct Messages", 
+            data=new_data
+        )
+        
         channel_record = db.get_channel(channel_id)
 
-        # 3. If it doesn't exist, create it
-        if not channel_record:
-            print(f"New DM detected. Registering channel {channel_id} to database.")
-            
-            user_name = user.name
-            
-            new_data = {
-                "name": f"DM with {user_name}",
-                "description": f"Private Direct Message history with {user_name}",
-                "global": None,
-                "instruction": None, 
-                "whitelist": [],
-                "is_system_channel": False
-            }
-            
-            db.create_channel(
-                channel_id=channel_id, 
-                server_id=DM_SERVER_ID, 
-                server_name="Direct Messages", 
-                data=new_data
-            )
-            
-            channel_record = db.get_channel(channel_id)
-
         return cls(channel_record, db)
 
     def save(self):
@@ -1,5 +1,6 @@
 import copy
 import discord
+from typing import Optional
 from jinja2 import Environment
 
 # Adjust these import paths to match your project structure
@@ -7,7 +8,9 @@ from src.models.aicharacter import ActiveCharacter
 from src.models.dimension import ActiveChannel
 from src.plugins.manager import PluginManager
 from src.controller.history import get_history 
-from api.db.database import Database
+from api.db.storage import Storage
+from api.db.async_database import AsyncDatabase
+from api.db.message_context import DEFAULT_PRESET_NAME, MessageContext
 
 # --- A sensible default template ---
 # This template will be saved to the database if it doesn't exist.
@@ -51,15 +54,18 @@ A history reference to your speaking quirks and behavior:
 
 
 class PromptEngineer:
-    def __init__(self, bot: ActiveCharacter, message: discord.Message, channel: ActiveChannel,plugin_manager:PluginManager, messenger):
+    def __init__(self, bot: ActiveCharacter, message: discord.Message, channel: ActiveChannel,plugin_manager:PluginManager, messenger,
+                 context: Optional[MessageContext] = None):
         self.bot = bot
         self.user_name = str(message.author.display_name)
         self.message = message
         self.channel = channel
         self.messenger = messenger
+        # Records already loaded for this message (see load_message_context)
+        self.context = context
         
         # Get the database instance from one of the active models
-        self.db: Database = bot.db
+        self.db: Storage = bot.db
         
         self.plugin_manager = plugin_manager 
         self.jinja_env = Environment(trim_blocks=True, lstrip_blocks=True) # Recommended settings for prompt templates
@@ -72,8 +78,6 @@ class PromptEngineer:
         If the preset does not exist, it creates it with a default template
         and then returns it.
         """
-        DEFAULT_PRESET_NAME = "Default"
-        
         try:
             preset = self.db.get_preset(name=DEFAULT_PRESET_NAME)
 
@@ -154,7 +158,10 @@ class PromptEngineer:
         final_context = {**base_context, "plugins": plugin_outputs}
 
         # --- STEP 5: Final Render ---
-        prompt_template_str = self.get_template_from_preset()
+        if self.context and self.context.preset:
+            prompt_template_str = self.context.preset.get('prompt_template') or DEFAULT_PROMPT_TEMPLATE
+        else:
+            prompt_template_str = await AsyncDatabase.wrap(self.db).run(self.get_template_from_preset)
         template = self.jinja_env.from_string(prompt_template_str)
         final_prompt = template.render(final_context)
         print(f"=====================\nFINAL PROMPT\n=======================\n{final_prompt}")
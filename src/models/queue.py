@@ -1,6 +1,58 @@
 from dataclasses import *
+import time
+from typing import Any, Dict, List, Optional
 import discord
 
+# Why the observer accepted a message (WorkItem.reason)
+DM = "dm"
+MENTION = "mention"
+REPLY = "reply"                 # A reply to a whitelisted character
+TRIGGER = "trigger"             # A user message containing a character's trigger
+CHANNEL_TRIGGER = "channel"     # A character whose trigger is "#<this channel>"
+BOT_TRIGGER = "bot_trigger"     # Another character's message containing a trigger
+
+# Strongest first: a coalesced burst keeps the strongest reason of its messages
+REASON_PRIORITY = (DM, MENTION, REPLY, TRIGGER, CHANNEL_TRIGGER, BOT_TRIGGER)
+
+
+@dataclass
+class WorkItem:
+    """What the observer puts on the queue: a message plus everything it already worked out."""
+    message: discord.Message
+    reason: str
+    channel: Optional[Dict[str, Any]] = None  # Channel record (None for DMs: the pipeline resolves those)
+    characters: Optional[List[str]] = None    # Responding character names, in whitelist order (None: not matched yet)
+    reply_to: Optional[str] = None            # Character the message is addressed to (replies, perma-channels)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    coalesced: int = 0                        # Earlier messages of a burst this item answers for
+
+    def wait(self) -> float:
+        """Seconds since the item (or the first message of its burst) was queued."""
+        return time.monotonic() - self.enqueued_at
+
+    def burst_key(self) -> tuple:
+        """Items with the same key may be coalesced: same channel, same responding characters."""
+        return (self.message.channel.id, tuple(self.characters) if self.characters is not None else None)
+
+    def absorb(self, earlier: "WorkItem") -> "WorkItem":
+        """
+        Takes the place of `earlier`, an item of the same burst; returns self.
+        Keeps the stronger of the two reasons, and `earlier`'s reply target if
+        this item has none, so a reply followed by a trigger is still answered
+        as a reply.
+        """
+        self.coalesced += earlier.coalesced + 1
+        self.enqueued_at = min(self.enqueued_at, earlier.enqueued_at)
+        if _priority(earlier.reason) < _priority(self.reason):
+            self.reason = earlier.reason
+        if self.reply_to is None:
+            self.reply_to = earlier.reply_to
+        return self
+
+
+def _priority(reason: str) -> int:
+    return REASON_PRIORITY.index(reason) if reason in REASON_PRIORITY else len(REASON_PRIORITY)
+
 
 @dataclass
 class QueueItem:
@@ -15,4 +67,5 @@ class QueueItem:
     prefill:str = None
     message:discord.Message = None
     plugin:str = None
-    default:bool = False
\ No newline at end of file
+    default:bool = False
+    reply_to:str = None
@@ -49,9 +49,7 @@ class ImageGenPlugin(BasePlugin):
             )
 
             # However you store API keys — adjust for your setup:
-            all_db_configs = db.list_configs()
-            # Pydantic will use default values for any keys not found in the DB
-            config = BotConfig(**all_db_configs)
+            config = db.get_bot_config()
             token = config.ai_key
             if not token:
                 return {"image": "[No AI Gen Token Provided]"}
@@ -8,9 +8,8 @@ from api.db.database import Database
 from api.models.models import BotConfig
 
 def get_bot_config(db: Database) -> BotConfig:
-    """Helper to fetch all config key-values from the DB and return a BotConfig object."""
-    all_db_configs = db.list_configs()
-    return BotConfig(**all_db_configs)
+    """Helper to return the shared BotConfig snapshot for this database."""
+    return db.get_bot_config()
 
 async def describe_image(image_path: str, db: Database) -> str:
     """
@@ -37,10 +37,8 @@ def find_system_channel_id(bot: Viel) -> Optional[str]:
     """Synchronous helper to find the system channel ID."""
     if not bot:
         return None
-    for channel_data in bot.db.list_channels():
-        if channel_data.get('data', {}).get('is_system_channel', False):
-            return channel_data['channel_id']
-    return None
+    # Indexed lookup on the generated is_system_channel column
+    return bot.db.find_system_channel_id()
 
 def upload_image_to_system_channel(
     image_bytes: bytes, 
@@ -4,17 +4,16 @@ from openai import AsyncOpenAI
 
 # Adjust these import paths to match your project structure
 from src.models.queue import QueueItem
-from api.db.database import Database
+from api.db.storage import Storage
+from api.db.async_database import AsyncDatabase
 from api.models.models import BotConfig # We need a Pydantic model for config
 from src.models.aicharacter import ActiveCharacter
 
-def get_bot_config(db: Database) -> BotConfig:
-    """Fetches all config key-values from the DB and returns a BotConfig object."""
-    all_db_configs = db.list_configs()
-    # Pydantic validates and provides default values for any missing keys
-    return BotConfig(**all_db_configs)
+def get_bot_config(db: Storage) -> BotConfig:
+    """Returns the shared BotConfig snapshot (only rebuilt when the config changes)."""
+    return db.get_bot_config()
 
-async def generate_response(task: QueueItem, db: Database):
+async def generate_response(task: QueueItem, db: Storage):
     """
     Generates an AI response for a given task using configuration from the database.
     Conditionally adds an assistant prefill message if enabled in the config.
@@ -32,6 +31,8 @@ async def generate_response(task: QueueItem, db: Database):
         
         # The user's most recent message is cleaned and used in the user role
         user_message = clean_string(task.message.content)
+        if task.reply_to:
+            user_message = f"[Replying To {task.reply_to}]\n{user_message}"
 
         # --- PREFILL LOGIC ---
         # Start with the base messages for the API call
@@ -91,7 +92,7 @@ async def generate_response(task: QueueItem, db: Database):
     return task
 
 
-async def generate_blank(system: str, user: str, db: Database) -> str:
+async def generate_blank(system: str, user: str, db: Storage) -> str:
     """Generates a response from a simple system/user prompt pair."""
     bot_config = get_bot_config(db)
     try:
@@ -114,12 +115,12 @@ async def generate_blank(system: str, user: str, db: Database) -> str:
         return f"//[OOC: Error in generate_blank: {e}]"
 
 
-async def generate_in_character(character_name: str, system_addon: str, user: str, assistant: str, db: Database) -> str:
+async def generate_in_character(character_name: str, system_addon: str, user: str, assistant: str, db: Storage) -> str:
     """Generates a response 'in character' by dynamically loading the character from the DB."""
     bot_config = get_bot_config(db)
     try:
         # Fetch the character data from the database
-        char_data = db.get_character(character_name)
+        char_data = await AsyncDatabase.wrap(db).get_character(character_name)
         if not char_data:
             return f"//[OOC: Error: Character '{character_name}' not found in database.]"
 
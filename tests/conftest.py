@@ -0,0 +1,79 @@
+# tests/conftest.py
+"""
+Shared fixtures.
+
+`storage` runs a test once per backend: SQLite in a temporary file, and
+PostgreSQL in a fresh database created for the test. The PostgreSQL leg needs
+asyncpg and a server; point TEST_POSTGRES_URL at any database on it, e.g.
+`postgresql://postgres@localhost/postgres`, or the leg is skipped.
+"""
+
+import asyncio
+import os
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+
+from api.db.database import Database
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+def _admin(sql: str):
+    async def run():
+        conn = await asyncpg.connect(TEST_POSTGRES_URL)
+        try:
+            await conn.execute(sql)
+        finally:
+            await conn.close()
+    asyncio.run(run())
+
+
+def _postgres_url(database: str) -> str:
+    parts = urlsplit(TEST_POSTGRES_URL)
+    return urlunsplit(parts._replace(path="/" + database))
+
+
+def _open_postgres():
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    if asyncpg is None:
+        pytest.skip("asyncpg is not installed")
+    database = f"viel_test_{uuid.uuid4().hex[:12]}"
+    try:
+        _admin(f'CREATE DATABASE "{database}"')
+    except Exception as e:
+        pytest.skip(f"PostgreSQL at TEST_POSTGRES_URL is not available: {e}")
+
+    from api.db.postgres import PostgresDatabase
+    return PostgresDatabase(_postgres_url(database)), database
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def storage(request, tmp_path):
+    """A fresh, empty database on each backend."""
+    if request.param == "sqlite":
+        db = Database(str(tmp_path / "viel.db"))
+        yield db
+        db.close()
+        return
+
+    db, database = _open_postgres()
+    yield db
+    db.close()
+    _admin(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+
+
+@pytest.fixture
+def configured(storage):
+    """`storage` with the config keys BotConfig requires."""
+    storage.set_config("default_character", "Viel")
+    storage.set_config("ai_endpoint", "http://localhost:5001/v1")
+    storage.set_config("base_llm", "test-model")
+    return storage
@@ -0,0 +1,74 @@
+# tests/test_backup.py
+import os
+import threading
+import time
+
+import pytest
+
+from api.db import backup
+from api.db.backup import BackupBusy, BackupError, create_backup, list_backups
+from api.db.database import Database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Backups are SQLite-only; they go to tmp_path/backups."""
+    monkeypatch.setattr(backup, "BACKUP_DIR", "")
+    db = Database(str(tmp_path / "viel.db"))
+    db.create_character("Viel", {"persona": "cheerful"}, ["vee"])
+    yield db
+    db.close()
+
+
+def test_backup_is_a_readable_copy(db):
+    report = create_backup(db)
+
+    assert report["check"] == "ok"
+    assert report["pages"] > 0
+    copy = Database(report["path"])
+    try:
+        assert copy.get_character("Viel")["triggers"] == ["vee"]
+    finally:
+        copy.close()
+
+
+def test_rotation_keeps_the_newest(db):
+    names = []
+    for _ in range(4):
+        names.append(create_backup(db, keep=2)["name"])
+        time.sleep(0.002) # Backup names are unique per millisecond
+
+    assert [b["name"] for b in list_backups(db)] == names[:1:-1]
+    assert sorted(os.listdir(backup.backup_dir(db))) == sorted(names[2:])
+
+
+def test_failed_check_discards_the_copy(db, monkeypatch):
+    monkeypatch.setattr(backup, "_check", lambda path: "*** in database main ***")
+
+    with pytest.raises(BackupError):
+        create_backup(db)
+    assert os.listdir(backup.backup_dir(db)) == [] # Neither a backup nor a .partial file
+
+
+def test_concurrent_backup_is_refused(db, monkeypatch):
+    copying, release = threading.Event(), threading.Event()
+    copy_database = backup.copy_database
+
+    def slow_copy(source, dest, **kwargs):
+        copying.set()
+        release.wait(5)
+        return copy_database(source, dest, **kwargs)
+
+    monkeypatch.setattr(backup, "copy_database", slow_copy)
+    reports = []
+    first = threading.Thread(target=lambda: reports.append(create_backup(db)))
+    first.start()
+    try:
+        assert copying.wait(5)
+        with pytest.raises(BackupBusy):
+            create_backup(db)
+    finally:
+        release.set()
+        first.join(5)
+    assert len(reports) == 1
+    assert len(list_backups(db)) == 1
@@ -0,0 +1,118 @@
+# tests/test_bulk.py
+import json
+
+import pytest
+
+from api.db.bulk import BulkImportError, import_records, iter_export
+from api.db.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Bulk import and export are SQLite-only."""
+    db = Database(str(tmp_path / "viel.db"))
+    yield db
+    db.close()
+
+
+def lines(*records) -> list:
+    return [json.dumps(record) for record in records]
+
+
+def server(server_id: str, name: str = "Server") -> dict:
+    return {"type": "server", "server_id": server_id, "server_name": name}
+
+
+def channel(channel_id: str, server_id: str = "s1", **data) -> dict:
+    return {"type": "channel", "channel_id": channel_id, "server_id": server_id, "server_name": "Server", "data": data}
+
+
+def character(name: str, triggers=(), **data) -> dict:
+    return {"type": "character", "name": name, "data": data, "triggers": list(triggers)}
+
+
+def test_dangling_channel_rejects_only_itself(db):
+    records = [server("s1")] + [channel(f"c{i}") for i in range(5)]
+    records.insert(2, channel("orphan", server_id="missing"))
+
+    report = import_records(db, lines(*records))
+
+    assert report.created["channel"] == 5
+    assert report.error_count == 1
+    assert report.errors[0]["line"] == 3
+    assert "orphan" in report.errors[0]["error"]
+    assert {c["channel_id"] for c in db.list_channels()} == {f"c{i}" for i in range(5)}
+
+
+def test_skip_keeps_existing_records(db):
+    db.create_character("Viel", {"mood": "old"}, ["vee"])
+
+    report = import_records(db, lines(character("Viel", ["new"], mood="new"), character("Ann")))
+
+    assert report.created["character"] == 1
+    assert report.skipped["character"] == 1
+    assert db.get_character("Viel")["data"] == {"mood": "old"}
+    assert db.get_character("Viel")["triggers"] == ["vee"]
+
+
+def test_replace_overwrites_data_and_triggers(db):
+    db.create_character("Viel", {"mood": "old"}, ["vee", "viel"])
+
+    report = import_records(db, lines(character("Viel", ["v"], mood="new")), on_conflict="replace")
+
+    assert report.updated["character"] == 1
+    assert db.get_character("Viel")["data"] == {"mood": "new"}
+    assert db.get_character("Viel")["triggers"] == ["v"]
+
+
+def test_error_policy_raises_on_conflict(db):
+    db.create_character("Viel", {"mood": "old"})
+
+    with pytest.raises(BulkImportError):
+        import_records(db, lines(character("Viel", mood="new")), on_conflict="error")
+    assert db.get_character("Viel")["data"] == {"mood": "old"}
+
+
+def test_last_record_wins_within_a_chunk(db):
+    report = import_records(db, lines(character("Viel", mood="first"), character("Viel", ["v"], mood="second")))
+
+    assert report.created["character"] == 1
+    assert report.skipped["character"] == 1
+    assert db.get_character("Viel")["data"] == {"mood": "second"}
+    assert db.get_character("Viel")["triggers"] == ["v"]
+
+
+def test_conflicts_across_chunks_follow_the_policy(db):
+    records = lines(character("Viel", mood="first"), character("Ann"), character("Viel", mood="second"))
+
+    report = import_records(db, records, chunk_size=2)
+    assert report.chunks == 2
+    assert report.skipped["character"] == 1
+    assert db.get_character("Viel")["data"] == {"mood": "first"}
+
+    report = import_records(db, records, on_conflict="replace", chunk_size=2)
+    assert report.updated["character"] == 3
+    assert db.get_character("Viel")["data"] == {"mood": "second"}
+
+
+def test_export_then_import_round_trips(db, tmp_path):
+    db.create_server("s1", "Server", "A server", "Be nice")
+    db.create_channel("c1", "s1", "Server", {"name": "general", "whitelist": ["Viel"]})
+    db.create_preset("Default", "Plain", "{{prompt}}")
+    db.create_character("Viel", {"persona": "cheerful"}, ["vee", "viel"])
+    db.create_character("Ann", {"persona": "dry"})
+    exported = "".join(iter_export(db, page_size=1))
+
+    copy = Database(str(tmp_path / "copy.db"))
+    try:
+        report = import_records(copy, exported.splitlines())
+        assert report.error_count == 0
+        assert copy.list_servers() == db.list_servers()
+        assert copy.list_channels() == db.list_channels()
+        assert [copy.get_preset("Default")[k] for k in ("description", "prompt_template")] == ["Plain", "{{prompt}}"]
+        for name in ("Viel", "Ann"):
+            original, imported = db.get_character(name), copy.get_character(name)
+            assert (imported["data"], imported["triggers"]) == (original["data"], original["triggers"])
+        assert "".join(iter_export(copy)) == exported
+    finally:
+        copy.close()
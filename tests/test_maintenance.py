@@ -0,0 +1,43 @@
+# tests/test_maintenance.py
+import os
+
+import pytest
+
+from api.db import enrichments, maintenance
+from api.db.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Maintenance is SQLite-only; new files use incremental auto-vacuum."""
+    db = Database(str(tmp_path / "viel.db"), volatile_path="")
+    yield db
+    db.close()
+
+
+def test_maintenance_prunes_and_frees_pages(db, monkeypatch):
+    for i in range(3):
+        db.create_character(f"char{i}", {"persona": "test"})
+    for message_id in range(20):
+        db.set_enrichment(message_id, enrichments.LINK, os.urandom(4096).hex()) # ~8 KiB, barely compressible
+    db.flush()
+    with db._get_connection() as conn:
+        conn.execute("UPDATE enrichments SET created_at = created_at - 200 * 86400 WHERE message_id < 5")
+        conn.execute("UPDATE changes SET created_at = datetime('now', '-30 days')")
+        sizes = [row[0] for row in conn.execute("SELECT length(payload) FROM enrichments ORDER BY message_id DESC")]
+
+    monkeypatch.setattr(enrichments, "MAX_AGE_DAYS", 90)
+    monkeypatch.setattr(enrichments, "MAX_BYTES", sum(sizes[:10])) # Room for the newest 10
+    monkeypatch.setattr(maintenance, "CHANGES_MAX_AGE_DAYS", 7)
+    monkeypatch.setattr(maintenance, "VACUUM_STEP_PAUSE", 0)
+
+    report = maintenance.run_maintenance(db)
+
+    assert report["enrichments_pruned"] == {"expired": 5, "over_budget": 5}
+    assert report["changes_pruned"] == 3
+    assert report["pages_freed"]["main"] > 0
+    assert maintenance.page_stats(db)["main"]["auto_vacuum"] == "incremental"
+    assert maintenance.page_stats(db)["main"]["free_pages"] == 0
+    with db._get_connection() as conn:
+        kept = [row[0] for row in conn.execute("SELECT message_id FROM enrichments ORDER BY message_id")]
+    assert kept == list(range(10, 20))
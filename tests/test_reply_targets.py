@@ -0,0 +1,95 @@
+# tests/test_reply_targets.py
+import asyncio
+import types
+from unittest import mock
+
+import discord
+import pytest
+
+from src.controller import reply_targets
+from src.controller.reply_targets import RecentAuthors, resolve_author
+
+
+def discord_message(message_id: int, author: str) -> mock.Mock:
+    message = mock.Mock(spec=discord.Message)
+    message.id = message_id
+    message.author.display_name = author
+    return message
+
+
+class StubBot:
+    """A bot whose archive and REST lookups are counted; every source knows nothing unless told."""
+
+    def __init__(self, archived=None, remote=None):
+        self.archived = archived or {}
+        self.remote = remote or {}
+        self.fetches = []
+        self.adb = types.SimpleNamespace(get_archived_message=self.get_archived_message)
+
+    async def get_archived_message(self, message_id):
+        return self.archived.get(message_id)
+
+    async def fetch_message(self, message_id):
+        self.fetches.append(message_id)
+        if message_id not in self.remote:
+            raise discord.NotFound(mock.Mock(status=404, reason="Not Found"), "Unknown Message")
+        return discord_message(message_id, self.remote[message_id])
+
+    def reply(self, message_id: int, resolved=None, cached=None) -> types.SimpleNamespace:
+        reference = types.SimpleNamespace(message_id=message_id, resolved=resolved, cached_message=cached)
+        return types.SimpleNamespace(reference=reference, channel=types.SimpleNamespace(fetch_message=self.fetch_message))
+
+
+@pytest.fixture
+def recent(monkeypatch):
+    authors = RecentAuthors(max_entries=16)
+    monkeypatch.setattr(reply_targets, "recent_authors", authors)
+    return authors
+
+
+@pytest.mark.parametrize("source", ["resolved", "client_cache", "recent", "archive"])
+def test_earlier_sources_avoid_rest(recent, source):
+    bot = StubBot(archived={1: {"author_name": "Viel"}} if source == "archive" else None, remote={1: "Wrong"})
+    if source == "recent":
+        recent.remember(1, "Viel")
+    message = bot.reply(
+        1,
+        resolved=discord_message(1, "Viel") if source == "resolved" else None,
+        cached=discord_message(1, "Viel") if source == "client_cache" else None,
+    )
+
+    assert asyncio.run(resolve_author(bot, message)) == "Viel"
+    assert bot.fetches == []
+    assert recent.get_stats()["lookups"][source] == 1
+
+
+def test_rest_is_the_last_resort_and_is_remembered(recent):
+    bot = StubBot(remote={1: "Viel"})
+
+    assert asyncio.run(resolve_author(bot, bot.reply(1))) == "Viel"
+    assert asyncio.run(resolve_author(bot, bot.reply(1))) == "Viel"
+    assert bot.fetches == [1]
+    lookups = recent.get_stats()["lookups"]
+    assert (lookups["rest"], lookups["recent"]) == (1, 1)
+
+
+def test_deleted_reply_target(recent):
+    bot = StubBot()
+    deleted = mock.Mock(spec=discord.DeletedReferencedMessage)
+
+    assert asyncio.run(resolve_author(bot, bot.reply(1, resolved=deleted))) is None
+    assert asyncio.run(resolve_author(bot, bot.reply(2))) is None
+    assert bot.fetches == [2]
+    assert recent.get_stats()["lookups"]["not_found"] == 2
+
+
+def test_recent_authors_evicts_least_recently_used():
+    authors = RecentAuthors(max_entries=2)
+    authors.remember(1, "Viel")
+    authors.remember(2, "Ann")
+    assert authors.get(1) == "Viel" # Now the most recently used
+    authors.remember(3, "Bob")
+
+    assert authors.get(2) is None
+    assert (authors.get(1), authors.get(3)) == ("Viel", "Bob")
+    assert authors.get_stats()["size"] == 2
@@ -0,0 +1,183 @@
+# tests/test_scheduler.py
+import asyncio
+import types
+
+from api.db import events
+from api.db.events import ChangeEvent, bus
+from src.controller.scheduler import Scheduler
+from src.models.queue import REPLY, TRIGGER, WorkItem
+
+
+def message(channel_id: int, content: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(channel=types.SimpleNamespace(id=channel_id), content=content)
+
+
+def run_burst(items, coalesce_ms: int = 20):
+    """Submits `items` back to back with coalescing on; returns the items the worker was given."""
+    answered = []
+
+    async def worker(item: WorkItem):
+        answered.append(item)
+
+    async def main():
+        scheduler = Scheduler(worker, limit=lambda: 4, coalesce=lambda: coalesce_ms / 1000)
+        for item in items:
+            scheduler.submit(item)
+        await asyncio.sleep(coalesce_ms / 1000 * 5)
+        await scheduler.close(timeout=1)
+
+    asyncio.run(main())
+    return answered
+
+
+def test_burst_keeps_the_reply_target_and_reason():
+    reply = WorkItem(message(1, "what do you think?"), REPLY, characters=["Viel"], reply_to="Viel")
+    trigger = WorkItem(message(1, "viel, answer me"), TRIGGER, characters=["Viel"])
+
+    answered = run_burst([reply, trigger])
+
+    assert len(answered) == 1
+    item = answered[0]
+    assert item.message.content == "viel, answer me" # The latest message is answered
+    assert item.reason == REPLY
+    assert item.reply_to == "Viel"
+    assert item.coalesced == 1
+
+
+def test_later_reply_target_wins():
+    first = WorkItem(message(1, "a"), REPLY, characters=["Viel"], reply_to="Viel")
+    second = WorkItem(message(1, "b"), REPLY, characters=["Viel"], reply_to="Ann")
+
+    (item,) = run_burst([first, second])
+
+    assert item.reply_to == "Ann"
+
+
+def test_other_channels_are_not_coalesced():
+    answered = run_burst([
+        WorkItem(message(1, "a"), TRIGGER, characters=["Viel"]),
+        WorkItem(message(2, "b"), TRIGGER, characters=["Viel"]),
+    ])
+
+    assert sorted(item.message.content for item in answered) == ["a", "b"]
+
+
+class GatedWorker:
+    """A worker that records what it started and holds each item until released."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+
+    async def __call__(self, item: WorkItem):
+        self.started.append(item.message.content)
+        gate = self.gates[item.message.content] = asyncio.Event()
+        await gate.wait()
+
+    async def release(self, content: str):
+        self.gates[content].set()
+        await asyncio.sleep(0.01) # Let the worker finish and the scheduler start the next item
+
+
+def work(channel_id: int, content: str) -> WorkItem:
+    return WorkItem(message(channel_id, content), TRIGGER, characters=["Viel"])
+
+
+def test_busy_channel_cannot_starve_a_quiet_one():
+    async def main():
+        worker = GatedWorker()
+        scheduler = Scheduler(worker, limit=lambda: 2) # Channel cap defaults to limit // 2 = 1
+        for i in range(5):
+            scheduler.submit(work(1, f"busy {i}"))
+        scheduler.submit(work(2, "quiet"))
+        await asyncio.sleep(0.01)
+
+        assert worker.started == ["busy 0", "quiet"]
+        stats = scheduler.get_stats()
+        assert stats["channel_limit"] == 1
+        assert stats["running_by_channel"] == {"1": 1, "2": 1}
+        assert stats["queued_by_channel"] == {"1": 4}
+
+        await worker.release("quiet") # A free slot, but channel 1 is at its cap
+        assert worker.started == ["busy 0", "quiet"]
+        for i in range(5):
+            await worker.release(f"busy {i}")
+        assert worker.started == ["busy 0", "quiet"] + [f"busy {i}" for i in range(1, 5)]
+        await scheduler.close(timeout=1)
+
+    asyncio.run(main())
+
+
+def test_channels_take_turns():
+    async def main():
+        worker = GatedWorker()
+        scheduler = Scheduler(worker, limit=lambda: 1)
+        for content in ("a1", "a2", "a3"):
+            scheduler.submit(work(1, content))
+        for content in ("b1", "b2"):
+            scheduler.submit(work(2, content))
+        await asyncio.sleep(0.01)
+        for content in ("a1", "a2", "b1", "a3", "b2"):
+            await worker.release(content)
+        await scheduler.close(timeout=1)
+        return worker.started
+
+    assert asyncio.run(main()) == ["a1", "a2", "b1", "a3", "b2"]
+
+
+def test_lower_concurrency_stops_new_starts_at_once():
+    async def main():
+        config = {"concurrency": 3}
+        worker = GatedWorker()
+        scheduler = Scheduler(worker, limit=lambda: config["concurrency"], channel_limit=3)
+        for i in range(3):
+            scheduler.submit(work(i, f"run {i}"))
+        await asyncio.sleep(0.01)
+        assert len(worker.started) == 3
+
+        config["concurrency"] = 1
+        bus.publish(ChangeEvent(events.CONFIG_CHANGED, "concurrency", "test"))
+        scheduler.submit(work(3, "waits"))
+        await worker.release("run 0")
+        await worker.release("run 1")
+        assert worker.started == ["run 0", "run 1", "run 2"] # Still 1 running, at the new limit
+        await worker.release("run 2")
+        assert worker.started[-1] == "waits"
+
+        # Raising it starts queued work on the config wakeup, without waiting for a finish
+        scheduler.submit(work(4, "more 1"))
+        scheduler.submit(work(5, "more 2"))
+        config["concurrency"] = 3
+        bus.publish(ChangeEvent(events.CONFIG_CHANGED, "concurrency", "test"))
+        await asyncio.sleep(0.01)
+        assert worker.started[-2:] == ["more 1", "more 2"]
+        for content in ("waits", "more 1", "more 2"):
+            await worker.release(content)
+        await scheduler.close(timeout=1)
+
+    asyncio.run(main())
+
+
+def test_stats_report_queue_depth_and_waits():
+    async def main():
+        worker = GatedWorker()
+        scheduler = Scheduler(worker, limit=lambda: 1)
+        for content in ("a1", "a2"):
+            scheduler.submit(work(1, content))
+        scheduler.submit(work(2, "b1"))
+        await asyncio.sleep(0.01)
+
+        stats = scheduler.get_stats()
+        assert (stats["running"], stats["queued"], stats["max_queued"]) == (1, 2, 2)
+        assert stats["queued_by_channel"] == {"1": 1, "2": 1}
+
+        await asyncio.sleep(0.05)
+        for content in ("a1", "a2", "b1"):
+            await worker.release(content)
+        stats = scheduler.get_stats()
+        assert (stats["submitted"], stats["started"], stats["finished"], stats["queued"]) == (3, 3, 3, 0)
+        assert stats["max_wait_ms"] >= 50
+        assert 0 < stats["avg_wait_ms"] <= stats["max_wait_ms"]
+        await scheduler.close(timeout=1)
+
+    asyncio.run(main())
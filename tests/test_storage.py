@@ -0,0 +1,363 @@
+# tests/test_storage.py
+"""
+The Storage contract, run against every backend (see the `storage` fixture).
+Anything the routers, the bot or the caches rely on should behave the same on
+SQLite and on PostgreSQL.
+"""
+
+import threading
+import time
+
+import pytest
+
+from api.db import events
+from api.db.database import Database, encode_cursor
+from api.db.events import bus
+from api.db.write_behind import MISSING
+
+
+def character(name: str, persona: str = "", info: str = "") -> dict:
+    return {"name": name, "persona": persona, "info": info, "avatar": f"{name.lower()}.png"}
+
+
+def channel_data(name: str, whitelist=None, **extra) -> dict:
+    return {"name": name, "whitelist": whitelist or [], **extra}
+
+
+def drain(pages):
+    """Follows a paginated listing to the end; returns every row."""
+    rows, cursor = pages(None)
+    while cursor:
+        more, cursor = pages(cursor)
+        rows += more
+    return rows
+
+
+# ------------------------------------------------------
+# Config
+# ------------------------------------------------------
+
+def test_config_crud(storage):
+    storage.set_config("temperature", 0.7)
+    storage.set_config("dm_list", ["alice", "bob"])
+    assert storage.get_config("temperature") == 0.7
+    assert storage.get_config("dm_list") == ["alice", "bob"]
+    assert storage.list_configs() == {"temperature": 0.7, "dm_list": ["alice", "bob"]}
+
+    storage.set_config("temperature", 1.1)
+    storage.delete_config("dm_list")
+    assert storage.list_configs() == {"temperature": 1.1}
+    assert storage.get_config("dm_list") is None
+
+
+def test_config_snapshot_is_shared_and_rebuilt_on_change(configured):
+    assert configured.peek_bot_config() is MISSING
+    snapshot = configured.get_bot_config()
+    assert snapshot.base_llm == "test-model"
+    assert configured.get_bot_config() is snapshot
+    assert configured.peek_bot_config() is snapshot
+
+    configured.set_config("base_llm", "other-model")
+    # Rebuilt by the change event, before set_config returned
+    rebuilt = configured.peek_bot_config()
+    assert rebuilt is not MISSING and rebuilt is not snapshot
+    assert rebuilt.base_llm == "other-model"
+    assert configured.get_bot_config() is rebuilt
+
+
+def test_config_snapshot_follows_writes_from_other_threads(configured):
+    configured.get_bot_config()
+    writer = threading.Thread(target=configured.set_config, args=("concurrency", 7))
+    writer.start()
+    writer.join()
+    assert configured.peek_bot_config().concurrency == 7
+
+
+def test_config_snapshot_is_rebuilt_once_per_commit(configured, monkeypatch):
+    reads = []
+    list_configs = type(configured).list_configs
+
+    def counting(self):
+        reads.append(1)
+        return list_configs(self)
+
+    monkeypatch.setattr(type(configured), "list_configs", counting)
+    configured.get_bot_config()
+    assert len(reads) == 1
+
+    with configured.transaction() as tx:
+        for i in range(12):
+            tx.set_config(f"extra_{i}", i)
+        tx.set_config("concurrency", 3)
+    assert len(reads) == 2
+    assert configured.peek_bot_config().concurrency == 3
+
+    # A feed poll that brings in several keys from another process also rebuilds once
+    monkeypatch.setattr("api.db.storage.ORIGIN", "another-process")
+    configured.poll_changes()
+    configured.set_config("temperature", 0.3)
+    configured.set_config("concurrency", 5)
+    reads.clear()
+    assert len(configured.poll_changes()) == 2
+    assert len(reads) == 1
+
+
+# ------------------------------------------------------
+# Servers and channels
+# ------------------------------------------------------
+
+def test_server_crud_and_cascade(storage):
+    storage.create_server("s1", "Alpha", description="first")
+    storage.create_channel("c1", "s1", "Alpha", channel_data("general"))
+    assert storage.get_server("s1")["description"] == "first"
+
+    storage.update_server("s1", server_name="Alpha Prime")
+    assert storage.get_server("s1")["server_name"] == "Alpha Prime"
+    assert [s["server_id"] for s in storage.list_servers()] == ["s1"]
+
+    storage.delete_server("s1")
+    assert storage.get_server("s1") is None
+    assert storage.get_channel("c1") is None # Cascaded
+
+
+def test_channel_crud(storage):
+    storage.create_server("s1", "Alpha")
+    storage.create_channel("c1", "s1", "Alpha", channel_data("general", ["Viel"], is_system_channel=True))
+    storage.create_channel("c2", "s1", "Alpha", channel_data("random"))
+
+    assert storage.get_channel("c1")["data"]["whitelist"] == ["Viel"]
+    assert storage.find_system_channel_id() == "c1"
+    assert sorted(c["channel_id"] for c in storage.list_channels_for_server("s1")) == ["c1", "c2"]
+
+    storage.update_channel("c2", data=channel_data("random", ["Viel"]))
+    assert storage.get_channel("c2")["data"]["whitelist"] == ["Viel"]
+    assert storage.list_channels_whitelisting("Viel") == ["c1", "c2"]
+
+    storage.delete_channel("c2")
+    assert storage.get_channel("c2") is None
+    assert [c["channel_id"] for c in storage.list_channels()] == ["c1"]
+
+
+# ------------------------------------------------------
+# Characters and presets
+# ------------------------------------------------------
+
+def test_character_crud_and_triggers(storage):
+    viel_id = storage.create_character("Viel", character("Viel"), triggers=["viel", "v"])
+    storage.create_character("Ann", character("Ann"))
+
+    assert storage.get_character("Viel")["triggers"] == ["viel", "v"]
+    assert [c["name"] for c in storage.get_characters(["Ann", "Nobody", "Viel"])] == ["Ann", "Viel"]
+
+    storage.update_character_triggers(viel_id, ["vee"])
+    storage.update_character("Ann", data=character("Ann", info="updated"))
+    assert storage.get_character("Viel")["triggers"] == ["vee"]
+    assert storage.get_character("Ann")["data"]["info"] == "updated"
+
+    storage.delete_character("Ann")
+    assert storage.get_character("Ann") is None
+    assert [c["name"] for c in storage.list_characters()] == ["Viel"]
+
+
+def test_whitelist_follows_character_rename_and_delete(storage):
+    storage.create_server("s1", "Alpha")
+    storage.create_character("Viel", character("Viel"))
+    storage.create_character("Ann", character("Ann"))
+    storage.create_channel("c1", "s1", "Alpha", channel_data("general", ["Viel", "Ann"]))
+    storage.create_channel("c2", "s1", "Alpha", channel_data("random", ["Ann"]))
+    assert storage.get_channel("c1")["data"]["whitelist"] == ["Viel", "Ann"] # Now cached
+
+    storage.rename_character("Ann", "Anna")
+    assert storage.get_channel("c1")["data"]["whitelist"] == ["Viel", "Anna"]
+    assert storage.get_channel("c2")["data"]["whitelist"] == ["Anna"]
+    assert storage.list_channels_whitelisting("Anna") == ["c1", "c2"]
+    assert storage.list_channels_whitelisting("Ann") == []
+
+    storage.delete_character("Anna")
+    assert storage.get_channel("c1")["data"]["whitelist"] == ["Viel"]
+    assert storage.get_channel("c2")["data"]["whitelist"] == []
+
+
+def test_preset_crud(storage):
+    storage.create_preset("Default", "the default", "{{persona}}")
+    assert storage.get_preset("Default")["prompt_template"] == "{{persona}}"
+    storage.update_preset("Default", description="changed")
+    assert storage.get_preset("Default")["description"] == "changed"
+    assert [p["name"] for p in storage.list_presets()] == ["Default"]
+    storage.delete_preset("Default")
+    assert storage.get_preset("Default") is None
+
+
+def test_transaction_rolls_back_as_a_unit(storage):
+    with pytest.raises(RuntimeError):
+        with storage.transaction() as tx:
+            tx.create_character("Viel", character("Viel"))
+            tx.set_config("temperature", 0.5)
+            raise RuntimeError("abort")
+    assert storage.get_character("Viel") is None
+    assert storage.get_config("temperature") is None
+
+    with storage.transaction() as tx:
+        tx.create_character("Viel", character("Viel"))
+        tx.set_config("temperature", 0.5)
+    assert storage.get_character("Viel") is not None
+    assert storage.get_config("temperature") == 0.5
+
+
+def test_message_context(configured):
+    configured.create_server("s1", "Alpha")
+    configured.create_character("Viel", character("Viel"), triggers=["viel"])
+    configured.create_character("Ann", character("Ann"))
+    configured.create_preset("Default", "the default", "{{persona}}")
+    configured.create_channel("c1", "s1", "Alpha", channel_data("general", ["Ann"]))
+
+    context = configured.load_message_context("c1", "bob")
+    assert [c["name"] for c in context.characters] == ["Ann"]
+    assert context.default_character["name"] == "Viel"
+    assert context.preset["name"] == "Default"
+    # Everything is cached now
+    assert configured.peek_message_context("c1", "bob") == context
+
+
+# ------------------------------------------------------
+# Pagination and search
+# ------------------------------------------------------
+
+def test_pagination(storage):
+    names = [f"char{i:02d}" for i in range(25)] + ["zed"]
+    for name in names:
+        storage.create_character(name, character(name))
+    for i in range(7):
+        storage.create_server(f"s{i}", f"Server {i}")
+    for i in range(5):
+        storage.create_channel(f"c{i}", "s0", "Server 0", channel_data(f"chan{i}"))
+
+    first, cursor = storage.page_character_summaries(limit=10)
+    assert [c["name"] for c in first] == names[:10]
+    assert first[0]["avatar"] == "char00.png"
+    assert cursor is not None
+    assert [c["name"] for c in drain(lambda cur: storage.page_character_summaries(limit=10, cursor=cur))] == names
+    assert [c["name"] for c in drain(lambda cur: storage.page_character_summaries(limit=4, cursor=cur, prefix="char1"))] \
+        == [f"char1{i}" for i in range(10)]
+
+    servers = drain(lambda cur: storage.page_servers(limit=3, cursor=cur))
+    assert [s["server_id"] for s in servers] == [f"s{i}" for i in range(7)]
+
+    channels = drain(lambda cur: storage.page_channels_for_server("s0", limit=2, cursor=cur))
+    assert [c["data"]["name"] for c in channels] == [f"chan{i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json",
+    encode_cursor({"name": "char01"}),
+    encode_cursor(["Server 1"]), # Servers sort on (server_name, server_id)
+    encode_cursor([{"x": 1}, "s1"]),
+    encode_cursor(["Server 1", True]),
+])
+def test_malformed_cursor_raises_value_error(storage, cursor):
+    storage.create_server("s1", "Server 1")
+    with pytest.raises(ValueError):
+        storage.page_servers(limit=10, cursor=cursor)
+    with pytest.raises(ValueError):
+        storage.page_character_summaries(limit=10, cursor=encode_cursor([{"x": 1}]))
+
+
+def test_search(storage):
+    storage.create_character("Viel", character("Viel", persona="A cheerful android librarian"))
+    storage.create_character("Ann", character("Ann", persona="A grumpy sea captain"))
+    storage.create_preset("Library", "for librarians", "You are a librarian.")
+
+    hits = storage.search("librarian")
+    assert {(hit["type"], hit["key"]) for hit in hits} == {("character", "Viel"), ("preset", "Library")}
+    assert [hit["key"] for hit in storage.search("captain", types=["character"])] == ["Ann"]
+    assert [hit["key"] for hit in storage.search("capt*", types=["character"])] == ["Ann"]
+    assert storage.search("nothing matches this") == []
+    assert storage.search("   ") == []
+
+
+# ------------------------------------------------------
+# Change feed
+# ------------------------------------------------------
+
+def test_writes_are_recorded_and_published(storage):
+    published = []
+    unsubscribe = bus.subscribe("*", lambda event: published.append((event.topic, event.key)))
+    try:
+        start = storage.latest_change_id()
+        storage.create_server("s1", "Alpha")
+        storage.create_character("Viel", character("Viel"))
+        storage.create_channel("c1", "s1", "Alpha", channel_data("general", ["Viel"]))
+        storage.set_config("temperature", 0.5)
+    finally:
+        unsubscribe()
+
+    expected = [
+        (events.SERVER_UPDATED, "s1"),
+        (events.CHARACTER_UPDATED, "Viel"),
+        (events.CHANNEL_UPDATED, "c1"),
+        (events.CHANNEL_WHITELIST_CHANGED, "c1"),
+        (events.CONFIG_CHANGED, "temperature"),
+    ]
+    assert published == expected
+    rows = storage.list_changes(start)
+    assert [(row["topic"], row["key"]) for row in rows] == expected
+    assert storage.latest_change_id() == rows[-1]["id"]
+
+
+def test_failed_writes_publish_nothing(storage):
+    storage.create_character("Viel", character("Viel"))
+    start = storage.latest_change_id()
+    published = []
+    unsubscribe = bus.subscribe("*", published.append)
+    try:
+        with pytest.raises(Exception):
+            storage.create_character("Viel", character("Viel")) # Duplicate name
+    finally:
+        unsubscribe()
+    assert published == []
+    assert storage.list_changes(start) == []
+
+
+def test_poll_changes_publishes_other_processes_changes(storage, monkeypatch):
+    storage.create_character("Viel", character("Viel"))
+    assert storage.get_character("Viel")["data"]["info"] == "" # Now cached
+    assert storage.poll_changes() == [] # Our own changes were published on commit
+
+    # Every row now looks like it came from another process
+    monkeypatch.setattr("api.db.storage.ORIGIN", "another-process")
+    storage.update_character("Viel", data=character("Viel", info="remote"))
+    polled = storage.poll_changes()
+    assert [(event.topic, event.key) for event in polled] == [(events.CHARACTER_UPDATED, "Viel")]
+    assert storage.poll_changes() == [] # The cursor moved past it
+
+
+def test_poll_changes_waits_for_transactions_still_open(storage, monkeypatch):
+    if isinstance(storage, Database):
+        pytest.skip("SQLite commits one write at a time")
+    monkeypatch.setattr("api.db.storage.ORIGIN", "another-process")
+    storage.poll_changes()
+
+    opened, release = threading.Event(), threading.Event()
+
+    def slow_write():
+        with storage.transaction() as tx:
+            tx.set_config("slow", 1)
+            opened.set()
+            release.wait(10)
+
+    writer = threading.Thread(target=slow_write)
+    writer.start()
+    opened.wait(10)
+    storage.set_config("fast", 1) # Gets a later id, commits first
+    assert [event.key for event in storage.poll_changes()] == []
+    release.set()
+    writer.join()
+    assert [event.key for event in storage.poll_changes()] == ["slow", "fast"]
+
+
+def test_prune_changes(storage):
+    storage.set_config("temperature", 0.5)
+    assert storage.prune_changes(max_age_days=1) == 0
+    time.sleep(1.1) # SQLite timestamps have second resolution
+    assert storage.prune_changes(max_age_days=0) == 1
+    assert storage.list_changes() == []
@@ -0,0 +1,33 @@
+# tests/test_triggers.py
+import asyncio
+import types
+
+from api.db import events
+from api.db.events import ChangeEvent, bus
+from src.controller import triggers
+
+
+class FakeAsyncDatabase:
+    def __init__(self, characters):
+        self.characters = characters
+
+    async def get_characters(self, names):
+        return [char for char in self.characters if char["name"] in names]
+
+
+def channel(channel_id: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(channel_id=channel_id, name="general", whitelist=["Viel"])
+
+
+def test_matcher_built_across_a_change_is_not_cached():
+    adb = FakeAsyncDatabase([{"name": "Viel", "triggers": ["vee"]}])
+    version = triggers.index.version()
+    # The channel was read with `version`; then its whitelist changed
+    bus.publish(ChangeEvent(events.CHANNEL_WHITELIST_CHANGED, "race", "test"))
+    matcher = asyncio.run(triggers.load_matcher(channel("race"), adb, version))
+    assert list(matcher.match("hey vee")) == ["Viel"]
+    assert triggers.index.get("race") is None
+
+    version = triggers.index.version()
+    asyncio.run(triggers.load_matcher(channel("race"), adb, version))
+    assert triggers.index.get("race") is not None
@@ -0,0 +1,101 @@
+# tests/test_write_behind.py
+import pytest
+
+from api.db.write_behind import MISSING, WriteBehindBuffer
+
+
+class FlakyTable:
+    """A flush function that rejects any batch containing a poison key."""
+
+    def __init__(self, poison=()):
+        self.poison = set(poison)
+        self.rows = {}
+
+    def __call__(self, upserts, deletes):
+        if any(key in self.poison for key, _ in upserts):
+            raise ValueError("constraint violation")
+        self.rows.update(upserts)
+        for key in deletes:
+            self.rows.pop(key, None)
+
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+
+    def make(flush, **kwargs):
+        buffer = WriteBehindBuffer("test", flush, interval=3600, **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_poison_row_does_not_block_the_batch(make_buffer):
+    table = FlakyTable(poison={"bad"})
+    buffer = make_buffer(table, max_attempts=2)
+    for i in range(5):
+        buffer.put(i, f"row {i}")
+    buffer.put("bad", "row")
+
+    with pytest.raises(ValueError):
+        buffer.flush()
+    assert table.rows == {i: f"row {i}" for i in range(5)}
+    assert buffer.get("bad") == "row" # Still queued for another attempt
+
+    buffer.flush() # Second failure: dropped
+    assert buffer.get("bad") is MISSING
+    stats = buffer.get_stats()
+    assert stats["dropped"] == 1
+    assert stats["row_errors"] == 2
+    assert stats["pending"] == 0
+
+    buffer.put(9, "later")
+    buffer.flush()
+    assert table.rows[9] == "later"
+
+
+def test_rewrite_resets_attempts(make_buffer):
+    table = FlakyTable(poison={"key"})
+    buffer = make_buffer(table, max_attempts=2)
+    buffer.put("key", "bad value")
+    with pytest.raises(ValueError):
+        buffer.flush()
+
+    table.poison.clear()
+    buffer.put("key", "good value")
+    buffer.flush()
+    assert table.rows == {"key": "good value"}
+    assert buffer.get_stats()["dropped"] == 0
+
+
+def test_close_retries_rows_put_back_by_a_failed_flush(make_buffer):
+    failures = {"left": 1}
+
+    def busy_once(upserts, deletes):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("database is locked")
+        table.rows.update(upserts)
+
+    table = FlakyTable()
+    buffer = make_buffer(busy_once, max_attempts=3)
+    buffer.put("key", "value")
+    buffer.close()
+    assert table.rows == {"key": "value"}
+    assert buffer.get_stats()["dropped"] == 0
+
+
+def test_close_drops_rows_that_keep_failing(make_buffer):
+    table = FlakyTable(poison={"bad"})
+    buffer = make_buffer(table, max_attempts=3)
+    buffer.put("good", 1)
+    buffer.put("bad", 2)
+    buffer.close()
+    assert table.rows == {"good": 1}
+    stats = buffer.get_stats()
+    assert stats["dropped"] == 1
+    assert stats["row_errors"] == 3
+    assert stats["pending"] == 0